@@ -1,12 +1,22 @@
 import streamlit as st
-import pandas as pd
 # Eliminar 'get_filtered_data' de la importación
-from utils.data_loader import load_data
+from utils.data_loader import load_data_stale_while_revalidate, start_data_refresh, get_snapshot_status
 from utils.data_processing import (
     plot_satisfaction_by_category,
+    get_cached_figure,
     identify_problem_areas,
-    get_satisfaction_columns
+    get_satisfaction_columns,
+    get_comedor_scorecard,
+    get_answer_distribution,
+    show_paginated_table,
+    show_period_comparison,
+    CATEGORIES,
+    COL_DESCRIPTIONS,
+    GENERAL_CATEGORY
 )
+from utils.alerts import get_alerts, ALERT_Z_THRESHOLD
+from utils.archive import archive_source_toggle, archive_distribution
+from utils.warmup import start_warmup
 import time
 
 # Configuración de la página
@@ -17,6 +27,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Precalentar las cachés compartidas (solo la primera ejecución del proceso lanza el hilo)
+warmup_status = start_warmup()
+
 # Título y descripción
 st.title("Dashboard de Análisis - Encuesta de Satisfacción de Entrega de Mercados")
 st.markdown("""
@@ -28,12 +41,10 @@ Navegue entre las pestañas de la barra lateral para explorar distintos aspectos
 """)
 
 # --- Carga de Datos ---
-@st.cache_data(show_spinner="Cargando datos de Google Sheets...") # Añadir spinner aquí
-def get_data():
-    df = load_data()
-    return df
-
-df = get_data() # Usar 'df' directamente como nombre del DataFrame principal
+# Stale-while-revalidate: se muestra la última copia de los datos de inmediato y, si está vencida,
+# se recarga en segundo plano; solo la primera carga (sin copia previa) espera a Google Sheets.
+with st.spinner("Cargando datos de Google Sheets..."):
+    df, data_loaded_at, data_refreshing = load_data_stale_while_revalidate()
 
 if df is None or df.empty:
     st.error("Home.py: No se pudieron cargar los datos iniciales desde load_data(). La aplicación no puede continuar.")
@@ -41,16 +52,45 @@ if df is None or df.empty:
 else:
     st.success(f"Datos cargados. Total de registros: {len(df)}")
 
+st.badge(f"Datos al {data_loaded_at:%Y-%m-%d %H:%M}", icon=":material/schedule:", color="gray")
+
+@st.fragment(run_every=2)
+def watch_data_refresh():
+    # Cuando termina la recarga en segundo plano, se vuelve a ejecutar la página con los datos nuevos
+    loaded_at, refreshing = get_snapshot_status()
+    if refreshing:
+        st.caption("🔄 Actualizando datos en segundo plano...")
+    elif loaded_at != data_loaded_at:
+        st.rerun()
+
+if data_refreshing:
+    watch_data_refresh()
+
+# Scorecard por comedor: se materializa una vez por versión de datos y lo consultan todas las páginas
+scorecard = get_comedor_scorecard(df)
+
 # --- Barra Lateral (Sin Filtros) ---
 st.sidebar.title("Navegación")
 st.sidebar.info("Seleccione una sección para ver el análisis detallado.")
 st.sidebar.metric("Total de encuestas analizadas", len(df)) # Mostrar total de registros
+# Fuente de los promedios y la distribución de respuestas (datos actuales o archivo histórico)
+archive = archive_source_toggle()
 
 # Botón para refrescar datos
 if st.sidebar.button("Refrescar Datos"):
     st.cache_data.clear() # Limpiar caché de load_data
+    start_data_refresh() # La página sigue mostrando la copia actual mientras se recarga
     st.rerun()
 
+# Estado del precalentamiento de cachés (tiempos por etapa)
+with st.sidebar.expander("Precalentamiento de cachés"):
+    if warmup_status['total'] is None:
+        st.write(f"Estado: {warmup_status['estado']}")
+    else:
+        st.write(f"Estado: {warmup_status['estado']} en {warmup_status['total']:.1f} s")
+    for stage_name, stage_seconds in list(warmup_status['etapas'].items()):
+        st.caption(f"{stage_name}: {stage_seconds:.2f} s")
+
 # --- Contenido Principal (Siempre se muestra ya que no hay filtros) ---
 
 print(f"INFO Home.py: Mostrando contenido principal con {len(df)} filas (sin filtros).")
@@ -64,12 +104,10 @@ overall_satisfaction = None
 plazos_cumplidos = None
 proceso_sencillo = None
 
+# Promedio de los promedios por pregunta (tomados de la distribución de respuestas precalculada)
+answer_distribution = get_answer_distribution(df) if archive is None else archive_distribution(archive)
 if satisfaction_cols:
-    all_means = []
-    for col in satisfaction_cols:
-         numeric_col = pd.to_numeric(df[col], errors='coerce')
-         if numeric_col.notna().any():
-              all_means.append(numeric_col.mean())
+    all_means = answer_distribution['Promedio'].dropna().tolist()
     if all_means:
          overall_satisfaction = sum(all_means) / len(all_means)
 
@@ -92,10 +130,14 @@ with col2:
 with col3:
     st.metric("Proceso Sencillo", f"{proceso_sencillo:.1f}%" if proceso_sencillo is not None else "N/A")
 
+# --- Comparación de periodos (si está activa en la barra lateral) ---
+show_period_comparison(df, 'comparacion_home', [GENERAL_CATEGORY] + list(CATEGORIES),
+                       table_columns=[GENERAL_CATEGORY] + list(CATEGORIES) + satisfaction_cols)
+
 # --- Áreas problemáticas ---
 st.subheader("Aspectos con Menor Satisfacción (Global)")
 try:
-    problem_areas = identify_problem_areas(df) # Usar el df completo
+    problem_areas = identify_problem_areas(df, answer_distribution) # Usar el df completo (o el archivo)
     if not problem_areas.empty:
         problem_areas['Satisfacción Media'] = problem_areas['Satisfacción Media'].map('{:.2f}'.format)
         st.dataframe(problem_areas, use_container_width=True, hide_index=True)
@@ -106,10 +148,34 @@ except Exception as e_problem:
     print(f"ERROR Home.py - identify_problem_areas: {e_problem}")
 
 
+# --- Alertas de caída de satisfacción ---
+st.subheader("🚨 Alertas de Caída de Satisfacción")
+try:
+    alerts = get_alerts(df)
+    if not alerts.empty:
+        st.write(f"**{len(alerts)}** comedores o zonas cuya última encuesta quedó al menos {ALERT_Z_THRESHOLD:.0f} "
+                 "desviaciones por debajo de su promedio reciente (media móvil exponencial).")
+        alert_levels = st.columns(len(alerts['Nivel'].unique()))
+        for level_col, (level, level_alerts) in zip(alert_levels, alerts.groupby('Nivel', sort=False)):
+            level_col.metric(f"Alertas por {level}", len(level_alerts))
+        show_paginated_table(
+            alerts.round({'Puntaje': 2, 'Esperado': 2, 'Desviaciones': 2}),
+            key='tabla_alertas', page_size=10
+        )
+    else:
+        st.success("Sin caídas recientes de satisfacción en comedores ni zonas.")
+except Exception as e_alerts:
+    st.error(f"Error al calcular las alertas: {e_alerts}")
+    print(f"ERROR Home.py - get_alerts: {e_alerts}")
+
+
 # --- Gráficos principales ---
 st.header("Satisfacción Promedio por Categoría (Global)")
 try:
-    satisfaction_fig = plot_satisfaction_by_category(df) # Usar el df completo
+    if archive is None:
+        satisfaction_fig = get_cached_figure(plot_satisfaction_by_category, df) # Usar el df completo
+    else:
+        satisfaction_fig = plot_satisfaction_by_category(df, answer_distribution)
     if satisfaction_fig:
         st.plotly_chart(satisfaction_fig, use_container_width=True)
     # else: # La función ahora devuelve una figura vacía si no hay datos
@@ -119,6 +185,38 @@ except Exception as e_plot_cat:
     print(f"ERROR Home.py - plot_satisfaction_by_category: {e_plot_cat}")
 
 
+# --- Distribución de respuestas ---
+with st.expander("Distribución de Respuestas por Pregunta"):
+    if not answer_distribution.empty:
+        distribution_table = answer_distribution.rename(index=COL_DESCRIPTIONS)
+        st.dataframe(distribution_table.style.format({'Promedio': '{:.2f}'}), width="stretch")
+        st.download_button(
+            "Descargar distribución (CSV)",
+            data=distribution_table.to_csv().encode('utf-8'),
+            file_name="distribucion_respuestas.csv",
+            mime="text/csv"
+        )
+    else:
+        st.info("No hay preguntas de satisfacción con respuestas válidas.")
+
+
+# --- Resumen por comedor ---
+st.header("Resumen por Comedor")
+if not scorecard.empty:
+    st.write(f"Scorecard de **{len(scorecard)}** comedores: encuestas, promedios por pregunta y categoría, insatisfacciones, fechas y ubicación.")
+    scorecard_default_cols = [scorecard.index.name, 'encuestas', *CATEGORIES, 'satisfaccion_general',
+                              'total_insatisfacciones', 'ultima_fecha', 'comuna', 'barrio']
+    show_paginated_table(scorecard, key='tabla_scorecard', default_columns=scorecard_default_cols)
+    st.download_button(
+        "Descargar scorecard (CSV)",
+        data=scorecard.to_csv().encode('utf-8'),
+        file_name="scorecard_comedores.csv",
+        mime="text/csv"
+    )
+else:
+    st.info("No se pudo construir el resumen por comedor (falta la columna de identificación del comedor).")
+
+
 # --- Secciones fijas ---
 st.header("Navegación por el Dashboard")
 st.markdown("""
@@ -129,6 +227,11 @@ Utilice la barra lateral izquierda para navegar a las distintas secciones del da
 3.  **Frutas y Verduras**: Análisis de la satisfacción con frutas, verduras, hortalizas y tubérculos.
 4.  **Proceso de Entrega**: Evaluación del proceso de entrega, tiempos y atención.
 5.  **Análisis Geográfico**: Comparativa de satisfacción por ubicación geográfica.
+6.  **Buscar Comedor**: Búsqueda de un comedor con sus encuestas, evolución y comentarios.
+7.  **Correlaciones**: Relación entre preguntas y factores clave de la satisfacción general, con filtros geográficos.
+8.  **Mapa de Comedores**: Mapa de calor de puntajes por comedor y pregunta, agrupando perfiles parecidos.
+9.  **Tendencias**: Evolución de la satisfacción por semana, mes o trimestre.
+10. **Visitas Repetidas**: Cambio de cada comedor entre visitas consecutivas (cuántos mejoraron o empeoraron).
 
 Cada sección contiene gráficos interactivos y análisis detallados **sobre el total de los datos**.
 """)
@@ -0,0 +1,95 @@
+"""
+Benchmark de construcción de gráficos de barras por pregunta.
+
+Mide, para cada página de categoría, el tiempo de construcción de cada gráfico y el total de la página:
+- legado: px.bar vertical + intercambio de ejes traza por traza (antiguo make_horizontal_chart)
+- directo: plot_question_satisfaction(..., orientation='h') construido en su forma final
+- caché: get_cached_figure con la caché caliente (solo deserialización)
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.benchmark_charts [--rows 5000] [--repeat 5]
+"""
+import argparse
+import contextlib
+import io
+import time
+import plotly.express as px
+from benchmarks.synthetic_data import make_survey_dataframe
+from utils.data_processing import (
+    plot_question_satisfaction,
+    get_cached_figure,
+    CATEGORIES,
+    COL_DESCRIPTIONS,
+    SATISFACTION_COLOR_MAP
+)
+
+PAGE_QUESTIONS = {
+    '1_Abarrotes': CATEGORIES['Abarrotes'],
+    '2_Carnicos_Huevos': CATEGORIES['Cárnicos y Huevos'],
+    '3_Frutas_Verduras': CATEGORIES['Frutas y Verduras'],
+    '4_Proceso_Entrega': CATEGORIES['Proceso de Entrega'],
+}
+
+
+def legacy_horizontal_chart(df, question_col, question_text, title):
+    """Reproduce el camino anterior: px.bar vertical y luego intercambio de x/y en cada traza."""
+    count_df = df[question_col + '_label'].dropna().value_counts().reset_index()
+    count_df.columns = ['Respuesta', 'Conteo']
+    fig = px.bar(count_df, x='Respuesta', y='Conteo', color='Respuesta',
+                 color_discrete_map=SATISFACTION_COLOR_MAP, text='Conteo')
+    fig.update_layout(height=400)
+    fig.update_traces(textposition='outside')
+    for trace in fig.data:
+        trace.x, trace.y = trace.y, trace.x
+        trace.orientation = 'h'
+    fig.update_layout(plot_bgcolor='white', paper_bgcolor='white',
+                      xaxis_title="Número de Respuestas", yaxis_title="Categorías de Respuesta",
+                      yaxis={'categoryorder': 'total ascending'},
+                      title={'text': title, 'x': 0.5, 'xanchor': 'center', 'font': {'size': 16}})
+    return fig
+
+
+def time_call(function, repeat):
+    """Mejor tiempo (ms) de `repeat` ejecuciones."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(rows, repeat):
+    df = make_survey_dataframe(rows, max(10, rows // 7))
+    print(f"Benchmark de gráficos: {rows} encuestas, mejor de {repeat} repeticiones (ms)")
+    print(f"{'página':<20} {'pregunta':<34} {'legado':>9} {'directo':>9} {'caché':>9}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Calentar la caché de figuras
+        for questions in PAGE_QUESTIONS.values():
+            for col in questions:
+                get_cached_figure(plot_question_satisfaction, df, col, COL_DESCRIPTIONS[col],
+                                  orientation='h', title=COL_DESCRIPTIONS[col])
+
+    for page, questions in PAGE_QUESTIONS.items():
+        totals = [0.0, 0.0, 0.0]
+        for col in questions:
+            description = COL_DESCRIPTIONS[col]
+            with contextlib.redirect_stdout(io.StringIO()):
+                timings = [
+                    time_call(lambda: legacy_horizontal_chart(df, col, description, description), repeat),
+                    time_call(lambda: plot_question_satisfaction(df, col, description, orientation='h', title=description), repeat),
+                    time_call(lambda: get_cached_figure(plot_question_satisfaction, df, col, description,
+                                                        orientation='h', title=description), repeat),
+                ]
+            totals = [total + timing for total, timing in zip(totals, timings)]
+            print(f"{page:<20} {col[:34]:<34} {timings[0]:>9.2f} {timings[1]:>9.2f} {timings[2]:>9.2f}")
+        print(f"{page:<20} {'TOTAL PÁGINA':<34} {totals[0]:>9.2f} {totals[1]:>9.2f} {totals[2]:>9.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000, help="Número de encuestas sintéticas")
+    parser.add_argument('--repeat', type=int, default=5, help="Repeticiones por medición")
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
@@ -0,0 +1,116 @@
+"""
+Benchmark de arranque en frío: tiempo de importación de los módulos y primer render de cada página.
+
+Cada medición se hace en un proceso nuevo de Python, para que ningún módulo esté ya cargado:
+- importación: tiempo de `import <módulo>` para los módulos del proyecto y las dependencias pesadas
+- primer render: importación de la página más su primera ejecución completa (AppTest),
+  con datos sintéticos en lugar de Google Sheets; también se listan las dependencias
+  pesadas que quedaron cargadas después del render
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.benchmark_imports [--rows 2000] [--repeat 3]
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+
+MODULES = [
+    'utils.data_loader',
+    'utils.data_processing',
+    'utils.significance',
+    'plotly.graph_objects',
+    'plotly.express',
+    'matplotlib.pyplot',
+    'wordcloud',
+    'scipy.stats',
+]
+
+# Dependencias que solo deberían cargarse en las páginas que las usan
+HEAVY_MODULES = ['plotly.express', 'matplotlib.pyplot', 'wordcloud', 'scipy.stats']
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_child(args):
+    """Ejecuta un comando de Python en un proceso nuevo y devuelve la última línea de su salida."""
+    result = subprocess.run([sys.executable] + args, cwd=REPO_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "error desconocido")
+    return result.stdout.strip().splitlines()[-1]
+
+
+def time_import(module, repeat):
+    """Mejor tiempo (ms) de importar `module` en un proceso nuevo."""
+    return min(float(run_child(['-c', IMPORT_SNIPPET.format(module=module)])) for _ in range(repeat)) * 1000
+
+
+def first_paint(page, rows):
+    """
+    Se ejecuta en el proceso hijo: importa y ejecuta la página una vez con datos sintéticos.
+    Imprime un JSON con el tiempo (ms) y las dependencias pesadas cargadas.
+    """
+    import contextlib
+    import io
+    import tempfile
+    import time
+    from streamlit.testing.v1 import AppTest
+    import utils.data_loader as data_loader
+    from benchmarks.synthetic_data import make_survey_dataframe
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = make_survey_dataframe(rows, max(10, rows // 7))
+    data_loader.load_data = lambda: df.copy()
+    data_loader.fetch_survey_data = lambda: (df.copy(), [])
+    # La copia de los datos va a un directorio temporal: no se lee ni se sobrescribe data_snapshot.pkl del repositorio
+    snapshot_dir = tempfile.TemporaryDirectory()
+    data_loader.SNAPSHOT_PATH = os.path.join(snapshot_dir.name, 'data_snapshot.pkl')
+    # Los módulos cargados por el generador no cuentan como carga de la página
+    preloaded = set(sys.modules)
+
+    app = AppTest.from_file(os.path.join(REPO_ROOT, page), default_timeout=300)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.run()
+    elapsed = (time.perf_counter() - start) * 1000
+
+    snapshot_dir.cleanup()
+
+    loaded = [module for module in HEAVY_MODULES if module in sys.modules and module not in preloaded]
+    print(json.dumps({'ms': elapsed, 'heavy': loaded, 'exceptions': len(app.exception)}))
+
+
+def run(rows, repeat):
+    print(f"Importación en frío, mejor de {repeat} procesos (ms)")
+    for module in MODULES:
+        try:
+            print(f"  {module:<24} {time_import(module, repeat):>9.1f}")
+        except RuntimeError as e_import:
+            print(f"  {module:<24} {'error':>9}  {e_import}")
+
+    print(f"\nPrimer render en frío con {rows} encuestas sintéticas, mejor de {repeat} procesos (ms)")
+    pages = ['Home.py'] + sorted(glob.glob('pages/*.py', root_dir=REPO_ROOT))
+    for page in pages:
+        results = [json.loads(run_child(['-m', 'benchmarks.benchmark_imports', '--first-paint', page,
+                                         '--rows', str(rows)]))
+                   for _ in range(repeat)]
+        best = min(results, key=lambda result: result['ms'])
+        heavy_text = ", ".join(best['heavy']) or "-"
+        error_text = f"  ({best['exceptions']} excepciones)" if best['exceptions'] else ""
+        print(f"  {page:<32} {best['ms']:>9.1f}  pesados: {heavy_text}{error_text}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2000, help="Número de encuestas sintéticas")
+    parser.add_argument('--repeat', type=int, default=3, help="Procesos por medición")
+    parser.add_argument('--first-paint', metavar='PAGE', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.first_paint:
+        first_paint(args.first_paint, args.rows)
+    else:
+        run(args.rows, args.repeat)
@@ -0,0 +1,52 @@
+"""
+Generador de encuestas sintéticas para los benchmarks (no requiere credenciales ni Google Sheets).
+Produce un DataFrame con la misma estructura que load_data() después del procesamiento.
+"""
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+from utils.data_loader import process_satisfaction_columns, get_dataset_version
+from utils.data_processing import COL_DESCRIPTIONS
+
+SATISFACTION_LABELS = {
+    5: "MUY SATISFECHO", 4: "SATISFECHO", 3: "NI SATISFECHO NI INSATISFECHO",
+    2: "INSATISFECHO", 1: "MUY INSATISFECHO"
+}
+COMMENT_WORDS = (
+    "llegar a tiempo puntualidad en la entrega huevos rotos carne congelada mejor calidad "
+    "frutas maduras verduras frescas buena atención excelente servicio demora tarde empaque"
+).split()
+
+
+def make_survey_dataframe(n_rows=2000, n_comedores=300, seed=0):
+    """
+    Crea n_rows encuestas sintéticas repartidas entre n_comedores comedores.
+    """
+    rng = np.random.default_rng(seed)
+    comedor_ids = rng.integers(0, n_comedores, n_rows)
+    df = pd.DataFrame({
+        'fecha': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 400, n_rows), unit='D'),
+        'nombre_comedor': [f"Comedor {i}" for i in comedor_ids],
+        'comuna': (comedor_ids % 22 + 1).astype(str),
+        'barrio': [f"Barrio {i % 80}" for i in comedor_ids],
+        'nodo': [f"Nodo {i % 40}" for i in comedor_ids],
+        'nicho': [f"Nicho {i % 5}" for i in comedor_ids],
+    })
+    for col in COL_DESCRIPTIONS:
+        scores = rng.choice([1, 2, 3, 4, 5], n_rows, p=[0.05, 0.1, 0.15, 0.35, 0.35])
+        answers = pd.Series([SATISFACTION_LABELS[score] for score in scores], dtype=object)
+        answers[rng.random(n_rows) < 0.05] = ''
+        df[col] = answers
+    df['23por_que'] = [' '.join(rng.choice(COMMENT_WORDS, 5)) for _ in range(n_rows)]
+    df['29plazos_entrega_mercados'] = rng.choice(['Sí', 'No'], n_rows)
+    df['30brindan_informacion_productos'] = rng.choice(['Sí', 'No'], n_rows)
+    df['31pasos_recepcion_mercado'] = rng.choice(['Sencillo', 'Complejo', 'Muy complejo'], n_rows)
+    df['32aspectos_de_mejora'] = [' '.join(rng.choice(COMMENT_WORDS, rng.integers(2, 8))) for _ in range(n_rows)]
+
+    # process_satisfaction_columns imprime mensajes de depuración por columna
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = process_satisfaction_columns(df)
+    df.attrs['dataset_version'] = get_dataset_version(df)
+    df.attrs['dataset_version_shape'] = df.shape
+    return df
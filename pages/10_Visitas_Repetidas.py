@@ -0,0 +1,116 @@
+import streamlit as st
+import pandas as pd
+from utils.data_loader import load_current_data
+from utils.data_processing import (
+    plot_visit_change_summary,
+    plot_scores_by_visit,
+    show_paginated_table,
+    get_satisfaction_columns,
+    CATEGORIES,
+    COL_DESCRIPTIONS,
+    GENERAL_CATEGORY
+)
+from utils.cohorts import get_visit_changes, summarize_changes, VISIT_CHANGE_THRESHOLD
+from utils.warmup import start_warmup
+
+# Visitas que se grafican como máximo en la curva por número de visita
+MAX_PLOTTED_VISITS = 12
+
+# Configuración de la página
+st.set_page_config(
+    page_title="Visitas Repetidas por Comedor",
+    page_icon="🔁",
+    layout="wide"
+)
+
+# Precalentar las cachés compartidas (solo la primera ejecución del proceso lanza el hilo)
+start_warmup()
+
+# Título y descripción
+st.title("🔁 Visitas Repetidas por Comedor")
+st.markdown("""
+Cada comedor se encuesta en cada entrega. Esta sección ordena las encuestas de cada comedor por fecha
+y compara cada visita con la anterior, para saber cuántos comedores mejoraron o empeoraron.
+""")
+
+# Cargar datos
+df = load_current_data()
+
+if df is None or df.empty:
+    st.error("No se pudieron cargar los datos. Verifica tus credenciales y la conexión a Google Sheets.")
+    st.stop()
+
+changes = get_visit_changes(df)
+if not changes or changes['transitions'].empty:
+    st.warning("No hay comedores con más de una encuesta fechada (faltan la columna del comedor, la fecha o visitas repetidas).")
+    st.stop()
+
+# --- Controles ---
+st.sidebar.title("🔧 Opciones")
+comparison_options = {
+    'Última visita vs. anterior': 'latest_change',
+    'Primera vs. última visita': 'total_change',
+}
+comparison_label = st.sidebar.radio("Comparar", list(comparison_options), key='visitas_comparacion')
+threshold = st.sidebar.slider(
+    "Cambio mínimo (puntos)", 0.0, 1.0, VISIT_CHANGE_THRESHOLD, 0.05, key='visitas_umbral',
+    help="Cambios dentro de ± este valor se consideran 'sin cambio'."
+)
+change_table = changes[comparison_options[comparison_label]]
+visits = changes['visits']
+st.sidebar.metric("Comedores con visitas repetidas", f"{int((visits >= 2).sum())} de {len(visits)}")
+
+summary = summarize_changes(change_table, threshold)
+
+# --- Métricas generales ---
+st.header(f"📊 Resumen ({comparison_label.lower()})")
+if GENERAL_CATEGORY in summary.index:
+    general = summary.loc[GENERAL_CATEGORY]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Comedores comparados", int(general['Comedores']))
+    col2.metric("🟢 Mejoraron", int(general['Mejoraron']))
+    col3.metric("🔴 Empeoraron", int(general['Empeoraron']))
+    col4.metric("Cambio promedio", f"{general['Cambio promedio']:+.2f}" if pd.notna(general['Cambio promedio']) else "N/A")
+    st.caption("Según el promedio general de cada encuesta (todas las preguntas de satisfacción).")
+
+# --- Mejoras y retrocesos por categoría y pregunta ---
+category_rows = [col for col in list(CATEGORIES) + [GENERAL_CATEGORY] if col in summary.index]
+st.plotly_chart(plot_visit_change_summary(summary.loc[category_rows], "Comedores que mejoraron o empeoraron por categoría"),
+                width="stretch")
+
+question_rows = [col for col in get_satisfaction_columns(df) if col in summary.index]
+with st.expander("Detalle por pregunta"):
+    question_summary = summary.loc[category_rows + question_rows].rename(index=COL_DESCRIPTIONS)
+    question_summary.index.name = 'Aspecto'
+    st.dataframe(question_summary.style.format({'Cambio promedio': '{:+.2f}'}, na_rep='-'),
+                 width="stretch")
+
+# --- Satisfacción por número de visita ---
+st.header("📈 Satisfacción según el Número de Visita")
+st.write("Promedio de las encuestas según si son la 1ª, 2ª, 3ª... visita del comedor.")
+st.plotly_chart(
+    plot_scores_by_visit(changes['by_visit'], changes['by_visit_counts'], list(CATEGORIES) + [GENERAL_CATEGORY],
+                         max_visits=MAX_PLOTTED_VISITS),
+    width="stretch"
+)
+
+# --- Comedores ---
+st.header("🏪 Cambio por Comedor")
+aspect = st.selectbox(
+    "Aspecto", category_rows + question_rows, index=category_rows.index(GENERAL_CATEGORY) if GENERAL_CATEGORY in category_rows else 0,
+    format_func=lambda col: COL_DESCRIPTIONS.get(col, col), key='visitas_aspecto'
+)
+comedor_table = pd.DataFrame({
+    'Visitas': visits.reindex(change_table.index),
+    'Cambio': change_table[aspect],
+}).dropna(subset=['Cambio'])
+comedor_table['Resultado'] = "⚪ Sin cambio"
+comedor_table.loc[comedor_table['Cambio'] > threshold, 'Resultado'] = "🟢 Mejoró"
+comedor_table.loc[comedor_table['Cambio'] < -threshold, 'Resultado'] = "🔴 Empeoró"
+comedor_table['Cambio'] = comedor_table['Cambio'].round(2)
+comedor_table = comedor_table.sort_values('Cambio').reset_index()
+show_paginated_table(comedor_table, key='tabla_visitas_comedores')
+
+# Footer
+st.markdown("---")
+st.markdown("📊 Dashboard de Análisis de la Encuesta de Satisfacción | 🔁 Sección: Visitas Repetidas")
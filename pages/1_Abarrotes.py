@@ -1,59 +1,21 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from utils.data_loader import load_data, get_filtered_data # Asegúrate que estas funciones existan en data_loader.py
+from utils.data_loader import load_current_data, get_filtered_data # Asegúrate que estas funciones existan en data_loader.py
 from utils.data_processing import ( # Asegúrate que estas funciones existan en data_processing.py
     plot_question_satisfaction,
+    get_cached_figure,
+    get_answer_distribution,
+    get_comedor_scorecard,
+    get_comedor_column,
+    get_section_result,
+    show_paginated_table,
+    show_period_comparison,
     # create_wordcloud, # Descomenta si usas wordcloud aquí
-    COL_DESCRIPTIONS
+    CATEGORIES,
+    QUESTION_DETAILS
 )
-
-# Función modificada para convertir gráficos a barras horizontales
-def make_horizontal_chart(fig, title_with_icon=None):
-    """
-    Convierte cualquier gráfico de barras verticales a horizontales y aplica fondo blanco
-    """
-    if fig is None:
-        return None
-    
-    try:
-        # Intercambiar x e y para hacer horizontal
-        for trace in fig.data:
-            if hasattr(trace, 'x') and hasattr(trace, 'y'):
-                # Intercambiar valores
-                temp_x = trace.x
-                trace.x = trace.y
-                trace.y = temp_x
-                
-                # Cambiar orientación
-                if hasattr(trace, 'orientation'):
-                    trace.orientation = 'h'
-        
-        # Actualizar layout para fondo blanco y ajustar ejes
-        layout_updates = {
-            'plot_bgcolor': 'white',
-            'paper_bgcolor': 'white',
-            'xaxis_title': "Número de Respuestas",
-            'yaxis_title': "Categorías de Respuesta",
-            'yaxis': {'categoryorder': 'total ascending'}  # Ordenar por valores
-        }
-        
-        # Agregar título con icono si se proporciona
-        if title_with_icon:
-            layout_updates['title'] = {
-                'text': title_with_icon,
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 16}
-            }
-        
-        fig.update_layout(**layout_updates)
-        
-        return fig
-        
-    except Exception as e:
-        print(f"Error convirtiendo a horizontal: {e}")
-        return fig
+from utils.warmup import start_warmup
+from utils.archive import archive_source_toggle, archive_distribution
 
 # Configuración de la página
 st.set_page_config(
@@ -62,6 +24,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Precalentar las cachés compartidas (solo la primera ejecución del proceso lanza el hilo)
+start_warmup()
+
 # Título y descripción
 st.title("📦 Análisis de Satisfacción - Abarrotes")
 st.markdown("""
@@ -73,13 +38,13 @@ incluyendo fechas de vencimiento, tipo de empaque y correspondencia con la lista
 # Cargar los datos originales (usará caché si Home.py ya lo hizo)
 # @st.cache_data(show_spinner="Cargando datos...") # No cachear aquí si Home.py ya lo hace con la misma función
 def get_data():
-    df = load_data()
+    df = load_current_data()
     return df
 
 df_pagina = get_data()
 
 if df_pagina is None or df_pagina.empty:
-    st.error("1_Abarrotes.py: No se pudieron cargar los datos iniciales desde load_data().")
+    st.error("1_Abarrotes.py: No se pudieron cargar los datos iniciales desde load_current_data().")
     st.stop()
 # else: # No es necesario mostrar mensaje de éxito aquí de nuevo
     # st.success(f"Datos cargados para Abarrotes. Registros iniciales: {len(df_pagina)}")
@@ -142,6 +107,11 @@ filtered_df_pagina = df_pagina.copy()  # Usar todos los datos sin filtrar
 
 # Mostrar métrica de encuestas para esta página
 st.sidebar.metric("📊 Total de Encuestas (Abarrotes)", len(filtered_df_pagina))
+# Fuente de los promedios y las distribuciones de respuestas (datos actuales o archivo histórico)
+archive = archive_source_toggle()
+distribution = None if archive is None else archive_distribution(archive)
+chart_options = {} if distribution is None else {'distribution': distribution}
+source_version = None if archive is None else archive['version']
 
 
 # --- Contenido de la Página (si hay datos) ---
@@ -153,163 +123,146 @@ else:
     # --- Análisis de Abarrotes ---
 
     # Mapeo de las columnas de abarrotes con iconos (usar COL_DESCRIPTIONS si es posible)
-    abarrotes_cols_map = {
-        '9fecha_vencimiento': {
-            'description': COL_DESCRIPTIONS.get('9fecha_vencimiento', 'Fecha de vencimiento'),
-            'icon': '📅',
-            'title_with_icon': '📅 Satisfacción con Fechas de Vencimiento'
-        },
-        '10tipo_empaque': {
-            'description': COL_DESCRIPTIONS.get('10tipo_empaque', 'Tipo de empaque'),
-            'icon': '📦',
-            'title_with_icon': '📦 Satisfacción con Tipo de Empaque'
-        },
-        '11productos_iguales_lista_mercado': {
-            'description': COL_DESCRIPTIONS.get('11productos_iguales_lista_mercado', 'Correspondencia con lista'),
-            'icon': '📋',
-            'title_with_icon': '📋 Correspondencia con Lista de Mercado'
-        }
-    }
+    abarrotes_cols_map = {col: QUESTION_DETAILS[col] for col in CATEGORIES['Abarrotes']}
+
+    # --- Funciones de cálculo de cada sección ---
+    # Cada sección se calcula solo cuando su pestaña está abierta y el resultado queda
+    # guardado en session_state (get_section_result) para los reruns siguientes.
+    def compute_satisfaction_charts(df):
+        # Comprobar si existen las columnas de abarrotes y tienen datos válidos (numéricos o etiquetas)
+        # Usar .notna() porque la columna _label puede existir pero estar llena de NaNs si la conversión falló
+        charts = {}
+        for col_key, col_info in abarrotes_cols_map.items():
+            label_col = col_key + '_label'
+            # Priorizar _label, si no existe o está vacía, verificar la columna numérica original
+            if label_col in df.columns and df[label_col].notna().any():
+                pass
+            elif col_key in df.columns and pd.api.types.is_numeric_dtype(df[col_key].dtype) and df[col_key].notna().any():
+                print(f"WARN 1_Abarrotes.py: Usando columna numérica '{col_key}' directamente porque '{label_col}' falta o está vacía.")
+            else:
+                continue
+            try:
+                charts[col_key] = get_cached_figure(plot_question_satisfaction, df, col_key, col_info['description'], orientation='h', title=col_info['title_with_icon'], **chart_options)
+            except Exception as e_plot:
+                charts[col_key] = e_plot
+                print(f"ERROR 1_Abarrotes.py - plot_question_satisfaction para '{col_key}': {e_plot}")
+        return charts
+
+    def compute_dissatisfaction_table(df):
+        # Consultar el scorecard por comedor (materializado una vez por versión de datos)
+        scorecard = get_comedor_scorecard(df)
+        conteo_col = 'Abarrotes_encuestas_insatisfechas'
+        conteo_series = scorecard[conteo_col] if conteo_col in scorecard.columns else pd.Series(dtype=int)
+        conteo_series = conteo_series[conteo_series > 0]
+
+        # Número de encuestas con insatisfacción en Abarrotes por comedor
+        conteo_comedores = conteo_series.reset_index()
+        conteo_comedores.columns = ['🏪 Comedor', '📊 Número de Reportes con Insatisfacción']
+        return conteo_comedores.sort_values('📊 Número de Reportes con Insatisfacción', ascending=False)
+
+    def compute_satisfaction_means(df):
+        # Promedios de satisfacción tomados de la distribución de respuestas precalculada
+        question_means = (get_answer_distribution(df) if distribution is None else distribution)['Promedio']
+        return {col: question_means[col] for col in abarrotes_cols_map.keys()
+                if col in question_means.index and pd.notna(question_means[col])}
+
+    # Comparación de periodos (promedio de la categoría y de cada pregunta), si está activa en la barra lateral
+    show_period_comparison(filtered_df_pagina, 'comparacion_abarrotes', ['Abarrotes'] + CATEGORIES['Abarrotes'])
+
+    satisfaccion_tab, insatisfaccion_tab, conclusiones_tab = st.tabs(
+        ["📊 Satisfacción", "⚠️ Insatisfacción por Comedor", "💡 Conclusiones"],
+        key='secciones_abarrotes',
+        on_change='rerun'
+    )
 
     # Análisis de satisfacción por pregunta
-    st.header("📊 Satisfacción con los Abarrotes")
-
-    # Comprobar si existen las columnas de abarrotes y tienen datos válidos (numéricos o etiquetas)
-    # Usar .notna() porque la columna _label puede existir pero estar llena de NaNs si la conversión falló
-    valid_display_cols = []
-    for col_key in abarrotes_cols_map.keys():
-        label_col = col_key + '_label'
-        # Priorizar _label, si no existe o está vacía, verificar la columna numérica original
-        if label_col in filtered_df_pagina.columns and filtered_df_pagina[label_col].notna().any():
-            valid_display_cols.append(col_key)
-        elif col_key in filtered_df_pagina.columns and pd.api.types.is_numeric_dtype(filtered_df_pagina[col_key].dtype) and filtered_df_pagina[col_key].notna().any():
-            valid_display_cols.append(col_key)
-            print(f"WARN 1_Abarrotes.py: Usando columna numérica '{col_key}' directamente porque '{label_col}' falta o está vacía.")
-
-
-    if not valid_display_cols:
-        st.warning("No se encontraron datos de satisfacción válidos para Abarrotes.")
-    else:
-        # Crear columnas para layout (máximo 2 gráficos por fila)
-        num_cols = 2
-        cols_layout = st.columns(num_cols)
-        col_index = 0
-
-        for col_key in valid_display_cols:
-            col_info = abarrotes_cols_map[col_key]
-            col_description = col_info['description']
-            title_with_icon = col_info['title_with_icon']
-            
-            # Seleccionar la columna correcta (priorizar _label)
-            plot_col = col_key + '_label' if col_key + '_label' in filtered_df_pagina.columns and filtered_df_pagina[col_key + '_label'].notna().any() else col_key
-
-            with cols_layout[col_index % num_cols]:
-                print(f"DEBUG 1_Abarrotes.py: Intentando graficar '{plot_col}' para '{col_description}'")
-                try:
-                    # Usar la función original del archivo data_processing
-                    fig = plot_question_satisfaction(filtered_df_pagina, col_key, col_description)
-                    
-                    if fig:
-                        # Convertir a horizontal y aplicar fondo blanco con título con icono
-                        fig_horizontal = make_horizontal_chart(fig, title_with_icon)
-                        st.plotly_chart(fig_horizontal, use_container_width=True)
-                    else:
-                        # La función plot_question_satisfaction ya imprime si no hay datos
-                        st.info(f"No hay datos suficientes o válidos para graficar '{col_description}'.")
-                except Exception as e_plot:
-                     st.error(f"Error al graficar '{col_description}': {e_plot}")
-                     print(f"ERROR 1_Abarrotes.py - plot_question_satisfaction para '{col_key}': {e_plot}")
+    if satisfaccion_tab.open:
+        with satisfaccion_tab:
+            st.header("📊 Satisfacción con los Abarrotes")
+            charts = get_section_result('abarrotes_graficos', filtered_df_pagina, compute_satisfaction_charts, variant=source_version)
 
-            col_index += 1
+            if not charts:
+                st.warning("No se encontraron datos de satisfacción válidos para Abarrotes.")
+            else:
+                # Crear columnas para layout (máximo 2 gráficos por fila)
+                num_cols = 2
+                cols_layout = st.columns(num_cols)
+
+                for col_index, (col_key, fig) in enumerate(charts.items()):
+                    col_description = abarrotes_cols_map[col_key]['description']
+                    with cols_layout[col_index % num_cols]:
+                        if isinstance(fig, Exception):
+                            st.error(f"Error al graficar '{col_description}': {fig}")
+                        elif fig:
+                            st.plotly_chart(fig, width="stretch")
+                        else:
+                            # La función plot_question_satisfaction ya imprime si no hay datos
+                            st.info(f"No hay datos suficientes o válidos para graficar '{col_description}'.")
 
 
     # --- Análisis de Comedores con Insatisfacción ---
-    st.header("⚠️ Comedores con Niveles de Insatisfacción Reportados")
-
-    # Verificar columnas necesarias: identificación de comedor y columnas de satisfacción numéricas
-    # Intentar encontrar una columna de identificación del comedor
-    id_comedor_candidates = ['nombre_comedor', 'comedor', 'id_comedor', 'nombre del comedor'] # Añade otros posibles nombres
-    id_comedor_col = next((col for col in id_comedor_candidates if col in filtered_df_pagina.columns), None)
-
-    satisfaction_numeric_cols = [col for col in abarrotes_cols_map.keys() if col in filtered_df_pagina.columns and pd.api.types.is_numeric_dtype(filtered_df_pagina[col])]
-
-    if not satisfaction_numeric_cols:
-        st.info("No hay columnas numéricas de satisfacción de abarrotes para analizar insatisfacción.")
-    elif not id_comedor_col:
-        st.warning("No se encontró una columna para identificar el comedor (ej. 'nombre_comedor', 'comedor'). No se puede agrupar.")
-    else:
-        print(f"DEBUG 1_Abarrotes.py: Analizando insatisfacción. ID Comedor: '{id_comedor_col}', Columnas numéricas: {satisfaction_numeric_cols}")
-        try:
-            # Crear dataframe para análisis, asegurando que las columnas sean numéricas
-            analisis_df = filtered_df_pagina[[id_comedor_col] + satisfaction_numeric_cols].copy()
-            for col in satisfaction_numeric_cols:
-                analisis_df[col] = pd.to_numeric(analisis_df[col], errors='coerce')
-
-            # Identificar filas con insatisfacción (valor <= 2) en CUALQUIERA de las columnas numéricas
-            insatisfaccion_mask = (analisis_df[satisfaction_numeric_cols] <= 2).any(axis=1)
-
-            if not insatisfaccion_mask.any():
-                st.success("✅ No se encontraron reportes de insatisfacción (puntaje <= 2) para Abarrotes con los datos actuales.")
+    if insatisfaccion_tab.open:
+        with insatisfaccion_tab:
+            st.header("⚠️ Comedores con Niveles de Insatisfacción Reportados")
+
+            # Verificar columnas necesarias: identificación de comedor y columnas de satisfacción numéricas
+            id_comedor_col = get_comedor_column(filtered_df_pagina)
+            satisfaction_numeric_cols = [col for col in abarrotes_cols_map.keys() if col in filtered_df_pagina.columns and pd.api.types.is_numeric_dtype(filtered_df_pagina[col])]
+
+            if not satisfaction_numeric_cols:
+                st.info("No hay columnas numéricas de satisfacción de abarrotes para analizar insatisfacción.")
+            elif not id_comedor_col:
+                st.warning("No se encontró una columna para identificar el comedor (ej. 'nombre_comedor', 'comedor'). No se puede agrupar.")
             else:
-                insatisfechos_df = analisis_df[insatisfaccion_mask]
-                print(f"DEBUG 1_Abarrotes.py: {len(insatisfechos_df)} filas con al menos una insatisfacción encontrada.")
-
-                # Agrupar por comedor y contar cuántas veces aparece cada comedor insatisfecho
-                conteo_comedores = insatisfechos_df[id_comedor_col].value_counts().reset_index()
-                conteo_comedores.columns = ['🏪 Comedor', '📊 Número de Reportes con Insatisfacción']
-
-                # Opcional: Detallar qué aspectos fueron insatisfactorios por comedor (más complejo)
-                # Por ahora, mostrar la tabla de conteo
-                st.write("🍽️ Comedores con al menos un reporte de insatisfacción (puntaje <= 2) en Abarrotes:")
-                st.dataframe(conteo_comedores.sort_values('📊 Número de Reportes con Insatisfacción', ascending=False), hide_index=True, use_container_width=True)
+                print(f"DEBUG 1_Abarrotes.py: Analizando insatisfacción. ID Comedor: '{id_comedor_col}', Columnas numéricas: {satisfaction_numeric_cols}")
+                try:
+                    conteo_comedores = get_section_result('abarrotes_insatisfaccion', filtered_df_pagina, compute_dissatisfaction_table)
 
-                # Podrías añadir aquí conclusiones textuales como las tenías antes
-                # ...
+                    if conteo_comedores.empty:
+                        st.success("✅ No se encontraron reportes de insatisfacción (puntaje <= 2) para Abarrotes con los datos actuales.")
+                    else:
+                        st.write("🍽️ Comedores con al menos un reporte de insatisfacción (puntaje <= 2) en Abarrotes:")
+                        show_paginated_table(conteo_comedores, key='tabla_insatisfaccion_abarrotes')
 
-        except Exception as e_insat:
-            st.error(f"Error analizando comedores insatisfechos: {e_insat}")
-            print(f"ERROR 1_Abarrotes.py - Análisis Insatisfacción: {e_insat}")
+                except Exception as e_insat:
+                    st.error(f"Error analizando comedores insatisfechos: {e_insat}")
+                    print(f"ERROR 1_Abarrotes.py - Análisis Insatisfacción: {e_insat}")
 
 
     # --- Conclusiones y recomendaciones ---
-    st.header("💡 Conclusiones y Recomendaciones (Abarrotes)")
-    try:
-        satisfaction_means = {}
-        valid_cols_for_mean = [col for col in abarrotes_cols_map.keys() if col in filtered_df_pagina.columns and pd.api.types.is_numeric_dtype(filtered_df_pagina[col])]
-
-        if valid_cols_for_mean:
-             for col in valid_cols_for_mean:
-                 numeric_data = pd.to_numeric(filtered_df_pagina[col], errors='coerce')
-                 if numeric_data.notna().any():
-                     satisfaction_means[col] = numeric_data.mean()
-
-        if satisfaction_means:
-             min_aspect_col = min(satisfaction_means, key=satisfaction_means.get)
-             min_score = satisfaction_means[min_aspect_col]
-             max_aspect_col = max(satisfaction_means, key=satisfaction_means.get)
-             max_score = satisfaction_means[max_aspect_col]
-
-             min_desc = abarrotes_cols_map.get(min_aspect_col, {}).get('description', min_aspect_col)
-             max_desc = abarrotes_cols_map.get(max_aspect_col, {}).get('description', max_aspect_col)
-             min_icon = abarrotes_cols_map.get(min_aspect_col, {}).get('icon', '📊')
-             max_icon = abarrotes_cols_map.get(max_aspect_col, {}).get('icon', '📊')
-
-             st.markdown(f"""
-             📈 **Basado en el análisis de los datos:**
-
-             - 🏆 El aspecto con **mayor satisfacción** es "{max_icon} {max_desc}" con un puntaje promedio de **{max_score:.2f}/5**.
-             - ⚠️ El aspecto con **menor satisfacción** es "{min_icon} {min_desc}" con un puntaje promedio de **{min_score:.2f}/5**.
-
-             **🎯 Recomendaciones:**
-             - 🔧 Centrar esfuerzos de mejora en "{min_icon} {min_desc}".
-             - ✅ Mantener las buenas prácticas relacionadas con "{max_icon} {max_desc}".
-             - 📊 Realizar seguimiento continuo de la satisfacción para identificar tendencias.
-             """)
-        else:
-             st.info("ℹ️ No hay datos numéricos de satisfacción suficientes para generar conclusiones automáticas.")
-    except Exception as e_conclu:
-        st.error(f"Error generando conclusiones: {e_conclu}")
-        print(f"ERROR 1_Abarrotes.py - Conclusiones: {e_conclu}")
+    if conclusiones_tab.open:
+        with conclusiones_tab:
+            st.header("💡 Conclusiones y Recomendaciones (Abarrotes)")
+            try:
+                satisfaction_means = get_section_result('abarrotes_promedios', filtered_df_pagina, compute_satisfaction_means, variant=source_version)
+
+                if satisfaction_means:
+                    min_aspect_col = min(satisfaction_means, key=satisfaction_means.get)
+                    min_score = satisfaction_means[min_aspect_col]
+                    max_aspect_col = max(satisfaction_means, key=satisfaction_means.get)
+                    max_score = satisfaction_means[max_aspect_col]
+
+                    min_desc = abarrotes_cols_map.get(min_aspect_col, {}).get('description', min_aspect_col)
+                    max_desc = abarrotes_cols_map.get(max_aspect_col, {}).get('description', max_aspect_col)
+                    min_icon = abarrotes_cols_map.get(min_aspect_col, {}).get('icon', '📊')
+                    max_icon = abarrotes_cols_map.get(max_aspect_col, {}).get('icon', '📊')
+
+                    st.markdown(f"""
+                    📈 **Basado en el análisis de los datos:**
+
+                    - 🏆 El aspecto con **mayor satisfacción** es "{max_icon} {max_desc}" con un puntaje promedio de **{max_score:.2f}/5**.
+                    - ⚠️ El aspecto con **menor satisfacción** es "{min_icon} {min_desc}" con un puntaje promedio de **{min_score:.2f}/5**.
+
+                    **🎯 Recomendaciones:**
+                    - 🔧 Centrar esfuerzos de mejora en "{min_icon} {min_desc}".
+                    - ✅ Mantener las buenas prácticas relacionadas con "{max_icon} {max_desc}".
+                    - 📊 Realizar seguimiento continuo de la satisfacción para identificar tendencias.
+                    """)
+                else:
+                    st.info("ℹ️ No hay datos numéricos de satisfacción suficientes para generar conclusiones automáticas.")
+            except Exception as e_conclu:
+                st.error(f"Error generando conclusiones: {e_conclu}")
+                print(f"ERROR 1_Abarrotes.py - Conclusiones: {e_conclu}")
 
 
 # --- Footer ---
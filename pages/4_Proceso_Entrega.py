@@ -1,59 +1,33 @@
 import streamlit as st
 import pandas as pd
-from utils.data_loader import load_data, get_filtered_data
+from utils.data_loader import load_current_data, get_filtered_data
 from utils.data_processing import (
     plot_question_satisfaction,
+    get_cached_figure,
+    get_answer_distribution,
     plot_yes_no_questions,
     plot_complexity_analysis,
-    COL_DESCRIPTIONS
+    create_wordcloud,
+    get_comedor_scorecard,
+    comedor_dissatisfaction_table,
+    get_comedor_column,
+    get_section_result,
+    show_paginated_table,
+    show_period_comparison,
+    COL_DESCRIPTIONS,
+    CATEGORIES,
+    QUESTION_DETAILS
 )
-
-# Función para convertir gráficos a barras horizontales
-def make_horizontal_chart(fig, title_with_icon=None):
-    """
-    Convierte cualquier gráfico de barras verticales a horizontales y aplica fondo blanco
-    """
-    if fig is None:
-        return None
-    
-    try:
-        # Intercambiar x e y para hacer horizontal
-        for trace in fig.data:
-            if hasattr(trace, 'x') and hasattr(trace, 'y'):
-                # Intercambiar valores
-                temp_x = trace.x
-                trace.x = trace.y
-                trace.y = temp_x
-                
-                # Cambiar orientación
-                if hasattr(trace, 'orientation'):
-                    trace.orientation = 'h'
-        
-        # Actualizar layout para fondo blanco y ajustar ejes
-        layout_updates = {
-            'plot_bgcolor': 'white',
-            'paper_bgcolor': 'white',
-            'xaxis_title': "Número de Respuestas",
-            'yaxis_title': "Categorías de Respuesta",
-            'yaxis': {'categoryorder': 'total ascending'}  # Ordenar por valores
-        }
-        
-        # Agregar título con icono si se proporciona
-        if title_with_icon:
-            layout_updates['title'] = {
-                'text': title_with_icon,
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 16}
-            }
-        
-        fig.update_layout(**layout_updates)
-        
-        return fig
-        
-    except Exception as e:
-        print(f"Error convirtiendo a horizontal: {e}")
-        return fig
+from utils.text_analysis import (
+    get_inverted_index,
+    search_comments,
+    search_results_table,
+    get_suggestion_clusters,
+    get_term_pairs
+)
+from utils.sentiment import get_sentiment_summary, sentiment_group_options
+from utils.warmup import start_warmup
+from utils.archive import archive_source_toggle, archive_distribution
 
 # Configuración de la página
 st.set_page_config(
@@ -62,6 +36,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Precalentar las cachés compartidas (solo la primera ejecución del proceso lanza el hilo)
+start_warmup()
+
 # Título y descripción
 st.title("🚚 Análisis de Satisfacción - Proceso de Entrega de Mercado")
 st.markdown("""
@@ -70,9 +47,9 @@ incluyendo aspectos como ciclo de menús, notificación, tiempos de revisión y
 """)
 
 # Cargar datos
-df = load_data()
+df = load_current_data()
 
-if df.empty:
+if df is None or df.empty:
     st.error("No se pudieron cargar los datos. Verifica tus credenciales y la conexión a Google Sheets.")
     st.stop()
 
@@ -87,7 +64,6 @@ st.sidebar.title("🔧 Filtros (Desactivados)")
 
 # Intentar obtener el rango de fechas (desactivado)
 if 'fecha' in df.columns:
-    df['fecha'] = pd.to_datetime(df['fecha'], errors='coerce')
     valid_dates = df.dropna(subset=['fecha'])
     
     if not valid_dates.empty:
@@ -122,43 +98,14 @@ filtered_df = df.copy()  # Usar todos los datos sin filtrar
 
 # Mostrar número de encuestas
 st.sidebar.metric("📊 Total de encuestas", len(filtered_df))
+# Fuente de los promedios y las distribuciones de respuestas (datos actuales o archivo histórico)
+archive = archive_source_toggle()
+distribution = None if archive is None else archive_distribution(archive)
+chart_options = {} if distribution is None else {'distribution': distribution}
+source_version = None if archive is None else archive['version']
 
 # Mapeo de las columnas del proceso de entrega con iconos
-entrega_cols = {
-    '23ciclo_menus': {
-        'description': 'El ciclo de menús establecido por el proyecto',
-        'icon': '📋',
-        'title_with_icon': '📋 Ciclo de Menús'
-    },
-    '24notificacion_telefonica': {
-        'description': 'La notificación telefónica para informar fecha y hora de entrega',
-        'icon': '📞',
-        'title_with_icon': '📞 Notificación Telefónica'
-    },
-    '25tiempo_revision_alimentos': {
-        'description': 'El tiempo para revisar los alimentos al recibirlos',
-        'icon': '⏰',
-        'title_with_icon': '⏰ Tiempo de Revisión'
-    },
-    '26tiempo_entrega_mercdos': {
-        'description': 'El tiempo entre las entregas de los mercados (10 días hábiles)',
-        'icon': '📅',
-        'title_with_icon': '📅 Frecuencia de Entregas'
-    },
-    '27tiempo_demora_proveedor': {
-        'description': 'El tiempo de respuesta para reposiciones o ajustes',
-        'icon': '🔄',
-        'title_with_icon': '🔄 Tiempo de Respuesta'
-    },
-    '28actitud_funcionario_logistico': {
-        'description': 'La actitud y disposición del funcionario logístico',
-        'icon': '👥',
-        'title_with_icon': '👥 Actitud del Personal'
-    }
-}
-
-# Análisis de satisfacción por aspectos del proceso
-st.header("📊 Satisfacción con el Proceso de Entrega")
+entrega_cols = {col: QUESTION_DETAILS[col] for col in CATEGORIES['Proceso de Entrega']}
 
 # Comprobar si existen las columnas
 available_cols = [col for col in entrega_cols.keys() if col in filtered_df.columns]
@@ -167,282 +114,340 @@ if not available_cols:
     st.warning("No se encontraron datos de satisfacción con el proceso de entrega en la encuesta.")
     st.stop()
 
-# Crear tabs para diferentes aspectos del proceso
-logistica_tab, tiempos_tab, personal_tab = st.tabs(["📋 Logística", "⏰ Tiempos", "👥 Personal"])
-
 # Columnas para cada tab
 logistica_cols = ['23ciclo_menus', '24notificacion_telefonica']
 tiempos_cols = ['25tiempo_revision_alimentos', '26tiempo_entrega_mercdos', '27tiempo_demora_proveedor']
 personal_cols = ['28actitud_funcionario_logistico']
 
-with logistica_tab:
-    logistica_available = [col for col in logistica_cols if col in available_cols]
-    
-    if logistica_available:
-        st.subheader("📋 Satisfacción con Aspectos Logísticos")
-        
-        col1, col2 = st.columns(2)
-        
-        # Primera columna (si existe)
-        if len(logistica_available) > 0:
-            col_info = entrega_cols[logistica_available[0]]
-            fig1 = plot_question_satisfaction(filtered_df, logistica_available[0], col_info['description'])
-            if fig1:
-                fig1_horizontal = make_horizontal_chart(fig1, col_info['title_with_icon'])
-                col1.plotly_chart(fig1_horizontal, use_container_width=True)
-            else:
-                col1.info(f"No hay datos suficientes para '{col_info['description']}'")
-        
-        # Segunda columna (si existe)
-        if len(logistica_available) > 1:
-            col_info2 = entrega_cols[logistica_available[1]]
-            fig2 = plot_question_satisfaction(filtered_df, logistica_available[1], col_info2['description'])
-            if fig2:
-                fig2_horizontal = make_horizontal_chart(fig2, col_info2['title_with_icon'])
-                col2.plotly_chart(fig2_horizontal, use_container_width=True)
-            else:
-                col2.info(f"No hay datos suficientes para '{col_info2['description']}'")
-    else:
-        st.info("No se encontraron datos de satisfacción con aspectos logísticos.")
+logistica_available = [col for col in logistica_cols if col in available_cols]
+tiempos_available = [col for col in tiempos_cols if col in available_cols]
+personal_available = [col for col in personal_cols if col in available_cols]
+
+# --- Funciones de cálculo de cada sección ---
+# Cada sección se calcula solo cuando su pestaña está abierta y el resultado queda
+# guardado en session_state (get_section_result) para los reruns siguientes.
+def compute_charts(cols):
+    def compute(df):
+        return {
+            col: get_cached_figure(plot_question_satisfaction, df, col, entrega_cols[col]['description'], orientation='h', title=entrega_cols[col]['title_with_icon'], **chart_options)
+            for col in cols
+        }
+    return compute
+
+def compute_yes_no_chart(df):
+    yes_no_fig = get_cached_figure(plot_yes_no_questions, df)
+    if yes_no_fig:
+        # Aplicar fondo blanco a los gráficos de sí/no también
+        yes_no_fig.update_layout(
+            plot_bgcolor='white',
+            paper_bgcolor='white',
+            title={
+                'text': '✅ Análisis de Cumplimiento (Sí/No)',
+                'x': 0.5,
+                'xanchor': 'center',
+                'font': {'size': 16}
+            }
+        )
+    return yes_no_fig
+
+def compute_dissatisfaction_table(df):
+    # Consultar el scorecard por comedor (materializado una vez por versión de datos)
+    scorecard = get_comedor_scorecard(df)
+    satisfaccion_cols = [col for col in entrega_cols.keys() if col in df.columns]
+    return comedor_dissatisfaction_table(
+        scorecard,
+        {col: entrega_cols[col]['description'] for col in satisfaccion_cols}
+    )
 
-with tiempos_tab:
-    tiempos_available = [col for col in tiempos_cols if col in available_cols]
-    
-    if tiempos_available:
-        st.subheader("⏰ Satisfacción con Tiempos")
-        
-        # Mostrar gráficos
-        for i, col in enumerate(tiempos_available):
-            col_info = entrega_cols[col]
-            fig = plot_question_satisfaction(filtered_df, col, col_info['description'])
-            if fig:
-                fig_horizontal = make_horizontal_chart(fig, col_info['title_with_icon'])
-                st.plotly_chart(fig_horizontal, use_container_width=True)
-            else:
-                st.info(f"No hay datos suficientes para '{col_info['description']}'")
-    else:
-        st.info("No se encontraron datos de satisfacción con tiempos.")
+def compute_suggestion_clusters(df):
+    # Sugerencias casi duplicadas agrupadas (MinHash/LSH, en caché por versión de datos)
+    sugerencias = df['32aspectos_de_mejora'].dropna().astype(str)
+    return len(sugerencias), get_suggestion_clusters(df, '32aspectos_de_mejora')
 
-with personal_tab:
-    personal_available = [col for col in personal_cols if col in available_cols]
-    
-    if personal_available:
-        st.subheader("👥 Satisfacción con el Personal")
-        
-        # Mostrar gráficos
-        for col in personal_available:
-            col_info = entrega_cols[col]
-            fig = plot_question_satisfaction(filtered_df, col, col_info['description'])
+def compute_conclusions(df):
+    # Promedios de satisfacción tomados de la distribución de respuestas precalculada
+    question_means = (get_answer_distribution(df) if distribution is None else distribution)['Promedio']
+    satisfaction_means = {col: question_means[col] for col in available_cols
+                          if col in question_means.index and pd.notna(question_means[col])}
+
+    # Calcular si el proceso es percibido como sencillo
+    if '31pasos_recepcion_mercado' in df.columns:
+        proceso_sencillo = (df['31pasos_recepcion_mercado'].astype(str).str.lower() == 'sencillo').mean() * 100
+    else:
+        proceso_sencillo = None
+    return satisfaction_means, proceso_sencillo
+
+def show_chart_grid(charts, num_cols=2):
+    # Mostrar gráficos en grid
+    chart_items = list(charts.items())
+    for i in range(0, len(chart_items), num_cols):
+        grid_cols = st.columns(num_cols) if num_cols > 1 else [st]
+        for grid_col, (col, fig) in zip(grid_cols, chart_items[i:i + num_cols]):
             if fig:
-                fig_horizontal = make_horizontal_chart(fig, col_info['title_with_icon'])
-                st.plotly_chart(fig_horizontal, use_container_width=True)
+                grid_col.plotly_chart(fig, width="stretch")
             else:
-                st.info(f"No hay datos suficientes para '{col_info['description']}'")
-    else:
-        st.info("No se encontraron datos de satisfacción con el personal.")
+                grid_col.info(f"No hay datos suficientes para '{entrega_cols[col]['description']}'")
+
+# Comparación de periodos (promedio de la categoría y de cada pregunta), si está activa en la barra lateral
+show_period_comparison(filtered_df, 'comparacion_entrega', ['Proceso de Entrega'] + CATEGORIES['Proceso de Entrega'])
+
+satisfaccion_tab, cumplimiento_tab, insatisfaccion_tab, sugerencias_tab, conclusiones_tab = st.tabs(
+    ["📊 Satisfacción", "✅ Cumplimiento", "⚠️ Insatisfacción por Comedor", "💡 Sugerencias", "🎯 Conclusiones"],
+    key='secciones_entrega',
+    on_change='rerun'
+)
+
+# Análisis de satisfacción por aspectos del proceso
+if satisfaccion_tab.open:
+    with satisfaccion_tab:
+        st.header("📊 Satisfacción con el Proceso de Entrega")
+
+        # Crear tabs para diferentes aspectos del proceso
+        logistica_tab, tiempos_tab, personal_tab = st.tabs(["📋 Logística", "⏰ Tiempos", "👥 Personal"], key='tabs_proceso_entrega', on_change='rerun')
+
+        if logistica_tab.open:
+            with logistica_tab:
+                if logistica_available:
+                    st.subheader("📋 Satisfacción con Aspectos Logísticos")
+                    show_chart_grid(get_section_result('entrega_graficos_logistica', filtered_df, compute_charts(logistica_available), variant=source_version))
+                else:
+                    st.info("No se encontraron datos de satisfacción con aspectos logísticos.")
+
+        if tiempos_tab.open:
+            with tiempos_tab:
+                if tiempos_available:
+                    st.subheader("⏰ Satisfacción con Tiempos")
+                    show_chart_grid(get_section_result('entrega_graficos_tiempos', filtered_df, compute_charts(tiempos_available), variant=source_version), num_cols=1)
+                else:
+                    st.info("No se encontraron datos de satisfacción con tiempos.")
+
+        if personal_tab.open:
+            with personal_tab:
+                if personal_available:
+                    st.subheader("👥 Satisfacción con el Personal")
+                    show_chart_grid(get_section_result('entrega_graficos_personal', filtered_df, compute_charts(personal_available), variant=source_version), num_cols=1)
+                else:
+                    st.info("No se encontraron datos de satisfacción con el personal.")
 
 # Análisis de preguntas sí/no
-st.header("✅ Cumplimiento y Comunicación")
-
-yes_no_fig = plot_yes_no_questions(filtered_df)
-if yes_no_fig:
-    # Aplicar fondo blanco a los gráficos de sí/no también
-    yes_no_fig.update_layout(
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        title={
-            'text': '✅ Análisis de Cumplimiento (Sí/No)',
-            'x': 0.5,
-            'xanchor': 'center',
-            'font': {'size': 16}
-        }
-    )
-    st.plotly_chart(yes_no_fig, use_container_width=True)
-else:
-    st.info("No hay datos suficientes para el análisis de preguntas sí/no.")
+if cumplimiento_tab.open:
+    with cumplimiento_tab:
+        st.header("✅ Cumplimiento y Comunicación")
+
+        yes_no_fig = get_section_result('entrega_si_no', filtered_df, compute_yes_no_chart)
+        if yes_no_fig:
+            st.plotly_chart(yes_no_fig, width="stretch")
+        else:
+            st.info("No hay datos suficientes para el análisis de preguntas sí/no.")
 
 # Análisis de Comedores con Insatisfacción
-st.header("⚠️ Comedores con Niveles de Insatisfacción")
+if insatisfaccion_tab.open:
+    with insatisfaccion_tab:
+        st.header("⚠️ Comedores con Niveles de Insatisfacción")
 
-# Verificar que existan las columnas de satisfacción y la columna de identificación del comedor
-satisfaccion_cols = [col for col in entrega_cols.keys() if col in filtered_df.columns]
-id_comedor_col = next((col for col in ['nombre_comedor', 'comedor', 'id_comedor'] if col in filtered_df.columns), None)
+        # Verificar que exista la columna de identificación del comedor
+        id_comedor_col = get_comedor_column(filtered_df)
 
-if not satisfaccion_cols:
-    st.warning("No se encontraron datos de satisfacción con el proceso de entrega en la encuesta.")
-elif not id_comedor_col:
-    st.warning("No se encontró columna de identificación del comedor comunitario.")
-else:
-    # Crear dataframe para análisis
-    analisis_df = filtered_df.copy()
-    
-    # Función para identificar valores de insatisfacción
-    def es_insatisfecho(valor):
-        if pd.isna(valor):
-            return False
-        
-        # Si es numérico, considerar valores menores o iguales a 2 como insatisfacción
-        if isinstance(valor, (int, float)):
-            return valor <= 2
-        
-        # Si es texto, buscar las palabras clave
-        valor_str = str(valor).upper()
-        return "INSATISFECHO" in valor_str or "MUY INSATISFECHO" in valor_str
-    
-    # Identificar comedores con insatisfacción
-    comedores_insatisfechos = {}
-    
-    for col in satisfaccion_cols:
-        # Filtrar filas con insatisfacción
-        insatisfaccion_mask = analisis_df[col].apply(es_insatisfecho)
-        
-        if insatisfaccion_mask.any():
-            # Agrupar por comedor y contar insatisfacciones
-            insatisfacciones = analisis_df[insatisfaccion_mask].groupby(id_comedor_col).size()
+        if not id_comedor_col:
+            st.warning("No se encontró columna de identificación del comedor comunitario.")
+        else:
+            resultado_df = get_section_result('entrega_insatisfaccion', filtered_df, compute_dissatisfaction_table)
             
-            # Almacenar resultados
-            for comedor, count in insatisfacciones.items():
-                if comedor not in comedores_insatisfechos:
-                    comedores_insatisfechos[comedor] = {}
+            # Mostrar resultados
+            if not resultado_df.empty:
+                # Mostrar como tabla
+                st.write("🍽️ Comedores con reportes de insatisfacción en el proceso de entrega:")
+                show_paginated_table(resultado_df, key='tabla_insatisfaccion_entrega')
                 
-                comedores_insatisfechos[comedor][entrega_cols[col]['description']] = count
-    
-    # Mostrar resultados
-    if comedores_insatisfechos:
-        # Convertir a DataFrame para mejor visualización
-        resultado_df = pd.DataFrame.from_dict(comedores_insatisfechos, orient='index')
-        
-        # Reemplazar NaN con 0
-        resultado_df = resultado_df.fillna(0)
-        
-        # Agregar columna de total
-        resultado_df['📊 Total Insatisfacciones'] = resultado_df.sum(axis=1)
-        
-        # Ordenar por total de insatisfacciones (descendente)
-        resultado_df = resultado_df.sort_values('📊 Total Insatisfacciones', ascending=False)
-        
-        # Mostrar como tabla
-        st.write("🍽️ Comedores con reportes de insatisfacción en el proceso de entrega:")
-        st.dataframe(resultado_df, use_container_width=True)
-        
-        # Conclusión textual sobre comedores con insatisfacciones
-        st.subheader("🎯 Comedores con problemas de insatisfacción")
-        
-        # Tomar los primeros comedores (los más problemáticos)
-        top_comedores = resultado_df.head(5)
-        
-        # Crear conclusión textual
-        st.markdown("### 📈 Resumen de hallazgos")
-        
-        # Texto introductorio
-        st.markdown(f"""
-        Se han identificado **{len(resultado_df)}** comedores comunitarios que presentan reportes 
-        de insatisfacción con el proceso de entrega de mercados. A continuación se detallan los comedores 
-        con mayores niveles de insatisfacción:
-        """)
-        
-        # Lista de comedores problemáticos
-        for comedor, row in top_comedores.iterrows():
-            # Obtener los aspectos con insatisfacción para este comedor
-            aspectos_insatisfechos = []
-            for aspecto, valor in row.items():
-                if aspecto != '📊 Total Insatisfacciones' and valor > 0:
-                    aspectos_insatisfechos.append(aspecto)
-            
-            aspectos_texto = ", ".join(aspectos_insatisfechos)
-            st.markdown(f"""
-            - **🏪 {comedor}**: {int(row['📊 Total Insatisfacciones'])} reportes de insatisfacción.
-              **Aspectos problemáticos:** {aspectos_texto}
-            """)
-        
-        # Recomendaciones generales
-        st.markdown("""
-        ### 🎯 Recomendaciones
-        
-        Se sugiere implementar un plan de seguimiento especial para estos comedores, 
-        con énfasis en los aspectos señalados como problemáticos. Es recomendable:
-        
-        1. 📞 **Mejorar la comunicación** con estos comedores respecto a fechas y horarios de entrega
-        2. ⏰ **Revisar los tiempos** de entrega y ajustarlos según las necesidades específicas de cada comedor
-        3. 👥 **Proporcionar capacitación adicional** al personal que atiende estos comedores
-        4. 📋 **Implementar un sistema de seguimiento** posterior a la entrega para verificar la satisfacción
-        5. 🔄 **Establecer un canal directo** de comunicación para resolver problemas de manera ágil
-        """)
-    else:
-        st.success("✅ No se encontraron comedores con reportes de insatisfacción en el proceso de entrega.")
+                # Conclusión textual sobre comedores con insatisfacciones
+                st.subheader("🎯 Comedores con problemas de insatisfacción")
+                
+                # Tomar los primeros comedores (los más problemáticos)
+                top_comedores = resultado_df.head(5)
+                
+                # Crear conclusión textual
+                st.markdown("### 📈 Resumen de hallazgos")
+                
+                # Texto introductorio
+                st.markdown(f"""
+                Se han identificado **{len(resultado_df)}** comedores comunitarios que presentan reportes 
+                de insatisfacción con el proceso de entrega de mercados. A continuación se detallan los comedores 
+                con mayores niveles de insatisfacción:
+                """)
+                
+                # Lista de comedores problemáticos
+                for comedor, row in top_comedores.iterrows():
+                    # Obtener los aspectos con insatisfacción para este comedor
+                    aspectos_insatisfechos = []
+                    for aspecto, valor in row.items():
+                        if aspecto != '📊 Total Insatisfacciones' and valor > 0:
+                            aspectos_insatisfechos.append(aspecto)
+                    
+                    aspectos_texto = ", ".join(aspectos_insatisfechos)
+                    st.markdown(f"""
+                    - **🏪 {comedor}**: {int(row['📊 Total Insatisfacciones'])} reportes de insatisfacción.
+                      **Aspectos problemáticos:** {aspectos_texto}
+                    """)
+                
+                # Recomendaciones generales
+                st.markdown("""
+                ### 🎯 Recomendaciones
+                
+                Se sugiere implementar un plan de seguimiento especial para estos comedores, 
+                con énfasis en los aspectos señalados como problemáticos. Es recomendable:
+                
+                1. 📞 **Mejorar la comunicación** con estos comedores respecto a fechas y horarios de entrega
+                2. ⏰ **Revisar los tiempos** de entrega y ajustarlos según las necesidades específicas de cada comedor
+                3. 👥 **Proporcionar capacitación adicional** al personal que atiende estos comedores
+                4. 📋 **Implementar un sistema de seguimiento** posterior a la entrega para verificar la satisfacción
+                5. 🔄 **Establecer un canal directo** de comunicación para resolver problemas de manera ágil
+                """)
+            else:
+                st.success("✅ No se encontraron comedores con reportes de insatisfacción en el proceso de entrega.")
 
 # Análisis de sugerencias de mejora
-st.header("💡 Sugerencias de Mejora")
+if sugerencias_tab.open:
+    with sugerencias_tab:
+        st.header("💡 Sugerencias de Mejora")
 
-# Verificar si existe la columna de sugerencias
-if '32aspectos_de_mejora' in filtered_df.columns:
-    # En lugar de nube de palabras, mostrar las principales sugerencias agrupadas
-    sugerencias = filtered_df['32aspectos_de_mejora'].dropna().astype(str)
-    
-    if not sugerencias.empty:
-        # Mostrar conteo de sugerencias
-        st.write(f"Se han registrado **{len(sugerencias)}** sugerencias de mejora. A continuación se muestran las 5 sugerencias más representativas:")
-        
-        # Mostrar las 5 sugerencias más largas (probablemente las más detalladas)
-        sugerencias_ordenadas = sugerencias.sort_values(key=lambda x: x.str.len(), ascending=False)
-        for i, sugerencia in enumerate(sugerencias_ordenadas.head(5), 1):
-            if len(sugerencia) > 10:  # Solo mostrar sugerencias significativas
-                st.markdown(f"**💭 {i}. Sugerencia de mejora:** {sugerencia}")
-    else:
-        st.info("No se han registrado sugerencias de mejora.")
-else:
-    st.info("No se encontró la columna de sugerencias de mejora.")
+        # Verificar si existe la columna de sugerencias
+        if '32aspectos_de_mejora' in filtered_df.columns:
+            total_sugerencias, suggestion_clusters = get_section_result('entrega_sugerencias', filtered_df, compute_suggestion_clusters)
+            
+            if total_sugerencias:
+                # Mostrar conteo de sugerencias y los grupos de sugerencias similares
+                st.write(f"Se han registrado **{total_sugerencias}** sugerencias de mejora, agrupadas en "
+                         f"**{len(suggestion_clusters)}** temas. Los temas más frecuentes, con una sugerencia representativa:")
+                show_paginated_table(suggestion_clusters, key='tabla_grupos_sugerencias', page_size=10)
+
+                # Búsqueda de texto completo en sugerencias y comentarios (índice invertido en caché por versión)
+                st.subheader("🔎 Buscar en sugerencias y comentarios")
+                search_col, comuna_search_col, comedor_search_col = st.columns([2, 1, 1])
+                search_query = search_col.text_input(
+                    "Palabras o frases (entre comillas)", key='busqueda_sugerencias',
+                    placeholder='p. ej. puntualidad "llegó tarde"'
+                )
+                search_comuna = None
+                if 'comuna' in filtered_df.columns:
+                    search_comunas = ["Todas"] + sorted(str(x).strip() for x in filtered_df['comuna'].dropna().unique())
+                    selected_search_comuna = comuna_search_col.selectbox("🏘️ Comuna", search_comunas, key='busqueda_comuna_entrega')
+                    search_comuna = None if selected_search_comuna == "Todas" else selected_search_comuna
+                search_comedor = None
+                id_comedor_col = get_comedor_column(filtered_df)
+                if id_comedor_col:
+                    search_comedores = ["Todos"] + sorted(str(x).strip() for x in filtered_df[id_comedor_col].dropna().unique())
+                    selected_search_comedor = comedor_search_col.selectbox("🏠 Comedor", search_comedores, key='busqueda_comedor_entrega')
+                    search_comedor = None if selected_search_comedor == "Todos" else selected_search_comedor
+
+                if search_query.strip():
+                    comments_index = get_inverted_index(filtered_df)
+                    doc_ids = search_comments(comments_index, search_query, comuna=search_comuna, comedor=search_comedor)
+                    if len(doc_ids):
+                        st.write(f"**{len(doc_ids)}** comentarios coinciden con la búsqueda.")
+                        show_paginated_table(
+                            search_results_table(filtered_df, comments_index, doc_ids),
+                            key='tabla_busqueda_sugerencias', page_size=10
+                        )
+                    else:
+                        st.info("Ningún comentario coincide con la búsqueda.")
+
+                # Nube de palabras y términos frecuentes (imagen y frecuencias en caché por versión y filtro)
+                st.subheader("☁️ Términos más frecuentes en las sugerencias")
+                comuna_filter = None
+                if 'comuna' in filtered_df.columns:
+                    comunas = ["Todas"] + sorted(str(x) for x in filtered_df['comuna'].dropna().unique())
+                    selected_wordcloud_comuna = st.selectbox("🏘️ Comuna", comunas, key='wordcloud_comuna_entrega')
+                    comuna_filter = None if selected_wordcloud_comuna == "Todas" else selected_wordcloud_comuna
+
+                wordcloud_png, frequent_terms = create_wordcloud(
+                    filtered_df, '32aspectos_de_mejora',
+                    filter_col='comuna' if comuna_filter else None, filter_value=comuna_filter
+                )
+                if wordcloud_png is None:
+                    st.info(frequent_terms)
+                else:
+                    wordcloud_col, terms_col = st.columns([3, 1])
+                    wordcloud_col.image(wordcloud_png, width="stretch")
+                    terms_col.dataframe(
+                        pd.DataFrame(frequent_terms, columns=['Término', 'Frecuencia']),
+                        hide_index=True, width="stretch"
+                    )
+
+                # Bigramas y palabras que aparecen juntas (matriz documento-término dispersa en caché)
+                st.subheader("🔗 Palabras que aparecen juntas")
+                low_scores_only = st.checkbox("Solo respuestas con alguna insatisfacción (puntaje ≤ 2)",
+                                              key='pares_insatisfaccion_entrega')
+                bigrams, cooccurrences = get_term_pairs(
+                    filtered_df, '32aspectos_de_mejora',
+                    filter_col='comuna' if comuna_filter else None, filter_value=comuna_filter,
+                    low_scores_only=low_scores_only
+                )
+                if bigrams.empty and cooccurrences.empty:
+                    st.info("No hay sugerencias suficientes para calcular pares de palabras con este filtro.")
+                else:
+                    bigrams_col, cooccurrences_col = st.columns(2)
+                    bigrams_col.markdown("**Bigramas más frecuentes**")
+                    bigrams_col.dataframe(bigrams, hide_index=True, width="stretch")
+                    cooccurrences_col.markdown("**Términos en el mismo comentario**")
+                    cooccurrences_col.dataframe(cooccurrences, hide_index=True, width="stretch")
+
+                # Sentimiento de los comentarios junto al puntaje de satisfacción, por zona o comedor
+                st.subheader("😊 Sentimiento de los comentarios")
+                group_options = sentiment_group_options(filtered_df)
+                if group_options:
+                    sentiment_group = st.selectbox("Agrupar por", group_options, key='sentimiento_grupo_entrega')
+                    st.caption("Sentimiento de -1 (negativo) a 1 (positivo), estimado con un léxico en español "
+                               "sobre las sugerencias y los comentarios de satisfacción.")
+                    show_paginated_table(get_sentiment_summary(filtered_df, sentiment_group),
+                                         key=f'tabla_sentimiento_{sentiment_group}')
+            else:
+                st.info("No se han registrado sugerencias de mejora.")
+        else:
+            st.info("No se encontró la columna de sugerencias de mejora.")
 
 # Conclusiones y recomendaciones
-st.header("🎯 Conclusiones y Recomendaciones")
-
-# Análisis automático basado en los datos
-if available_cols:
-    # Calcular promedios de satisfacción
-    satisfaction_means = {}
-    for col in available_cols:
-        satisfaction_means[col] = filtered_df[col].mean()
-    
-    # Identificar el aspecto con menor satisfacción
-    min_aspect = min(satisfaction_means, key=satisfaction_means.get)
-    min_score = satisfaction_means[min_aspect]
-    
-    # Identificar el aspecto con mayor satisfacción
-    max_aspect = max(satisfaction_means, key=satisfaction_means.get)
-    max_score = satisfaction_means[max_aspect]
-    
-    # Obtener información con iconos
-    min_info = entrega_cols[min_aspect]
-    max_info = entrega_cols[max_aspect]
-    
-    # Calcular si el proceso es percibido como sencillo
-    if '31pasos_recepcion_mercado' in filtered_df.columns:
-        proceso_sencillo = (filtered_df['31pasos_recepcion_mercado'].astype(str).str.lower() == 'sencillo').mean() * 100
-    else:
-        proceso_sencillo = None
-    
-    # Mostrar conclusiones
-    st.markdown(f"""
-    📈 **Basado en el análisis de los datos:**
-    
-    - 🏆 El aspecto con **mayor satisfacción** es "{max_info['icon']} {max_info['description']}" con un puntaje promedio de **{max_score:.2f}/5**.
-    - ⚠️ El aspecto con **menor satisfacción** es "{min_info['icon']} {min_info['description']}" con un puntaje promedio de **{min_score:.2f}/5**.
-    """)
-    
-    if proceso_sencillo is not None:
-        st.markdown(f"- ✅ El **{proceso_sencillo:.1f}%** de los encuestados considera que el proceso de recepción es **sencillo**.")
-    
-    st.markdown(f"""
-    **🎯 Recomendaciones:**
-    
-    - 🔧 **Revisar y optimizar** los aspectos relacionados con "{min_info['icon']} {min_info['description']}"
-    - 📞 **Mantener un canal de comunicación** abierto con los beneficiarios
-    - ⏰ **Evaluar posibles ajustes** en los tiempos y la logística del proceso
-    - 👥 **Proporcionar capacitación adicional** al personal de entrega
-    - ✅ **Mantener las buenas prácticas** relacionadas con "{max_info['icon']} {max_info['description']}"
-    """)
-else:
-    st.info("ℹ️ No hay datos suficientes para generar conclusiones y recomendaciones.")
+if conclusiones_tab.open:
+    with conclusiones_tab:
+        st.header("🎯 Conclusiones y Recomendaciones")
+
+        # Análisis automático basado en los datos
+        satisfaction_means, proceso_sencillo = get_section_result('entrega_conclusiones', filtered_df, compute_conclusions, variant=source_version)
+
+        if satisfaction_means:
+            # Identificar el aspecto con menor satisfacción
+            min_aspect = min(satisfaction_means, key=satisfaction_means.get)
+            min_score = satisfaction_means[min_aspect]
+            
+            # Identificar el aspecto con mayor satisfacción
+            max_aspect = max(satisfaction_means, key=satisfaction_means.get)
+            max_score = satisfaction_means[max_aspect]
+            
+            # Obtener información con iconos
+            min_info = entrega_cols[min_aspect]
+            max_info = entrega_cols[max_aspect]
+            
+            # Mostrar conclusiones
+            st.markdown(f"""
+            📈 **Basado en el análisis de los datos:**
+            
+            - 🏆 El aspecto con **mayor satisfacción** es "{max_info['icon']} {max_info['description']}" con un puntaje promedio de **{max_score:.2f}/5**.
+            - ⚠️ El aspecto con **menor satisfacción** es "{min_info['icon']} {min_info['description']}" con un puntaje promedio de **{min_score:.2f}/5**.
+            """)
+            
+            if proceso_sencillo is not None:
+                st.markdown(f"- ✅ El **{proceso_sencillo:.1f}%** de los encuestados considera que el proceso de recepción es **sencillo**.")
+            
+            st.markdown(f"""
+            **🎯 Recomendaciones:**
+            
+            - 🔧 **Revisar y optimizar** los aspectos relacionados con "{min_info['icon']} {min_info['description']}"
+            - 📞 **Mantener un canal de comunicación** abierto con los beneficiarios
+            - ⏰ **Evaluar posibles ajustes** en los tiempos y la logística del proceso
+            - 👥 **Proporcionar capacitación adicional** al personal de entrega
+            - ✅ **Mantener las buenas prácticas** relacionadas con "{max_info['icon']} {max_info['description']}"
+            """)
+        else:
+            st.info("ℹ️ No hay datos suficientes para generar conclusiones y recomendaciones.")
 
 # Footer
 st.markdown("---")
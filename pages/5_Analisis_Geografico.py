@@ -1,10 +1,21 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from utils.data_loader import load_data, get_filtered_data
+from utils.data_loader import load_current_data, get_filtered_data
 from utils.data_processing import (
-    get_satisfaction_columns,
-    CATEGORIES
+    get_geographic_aggregates,
+    get_hierarchy_rollup,
+    plot_hierarchy_rollup,
+    show_paginated_table,
+    CATEGORIES,
+    GENERAL_CATEGORY
+)
+from utils.warmup import start_warmup
+from utils.archive import archive_source_toggle, archive_geographic_aggregates
+from utils.significance import (
+    get_geo_statistics,
+    attach_confidence_intervals,
+    describe_kruskal_result,
+    CONFIDENCE_LEVEL
 )
 
 # Configuración de la página
@@ -14,6 +25,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Precalentar las cachés compartidas (solo la primera ejecución del proceso lanza el hilo)
+start_warmup()
+
 # Título y descripción
 st.title("Análisis Geográfico de Satisfacción")
 st.markdown("""
@@ -22,9 +36,9 @@ permitiendo identificar diferencias entre comunas, barrios, nodos y nichos.
 """)
 
 # Cargar datos
-df = load_data()
+df = load_current_data()
 
-if df.empty:
+if df is None or df.empty:
     st.error("No se pudieron cargar los datos. Verifica tus credenciales y la conexión a Google Sheets.")
     st.stop()
 
@@ -33,7 +47,6 @@ date_range = None
 
 # Intentar obtener el rango de fechas (solo para UI)
 if 'fecha' in df.columns:
-    df['fecha'] = pd.to_datetime(df['fecha'], errors='coerce')
     valid_dates = df.dropna(subset=['fecha'])
     
     if not valid_dates.empty:
@@ -55,6 +68,8 @@ filtered_df = df.copy()  # Usar todos los datos sin filtrar
 
 # Mostrar número de encuestas
 st.sidebar.metric("Total de encuestas", len(filtered_df))
+# Fuente de los promedios por ubicación (datos actuales o archivo histórico)
+archive = archive_source_toggle()
 
 # Verificar variables geográficas disponibles
 geo_vars = []
@@ -89,68 +104,112 @@ selected_category = st.selectbox(
     index=0
 )
 
-# Obtener columnas de la categoría seleccionada
-category_cols = CATEGORIES[selected_category]
-valid_cols = [col for col in category_cols if col in filtered_df.columns]
-
-if not valid_cols:
+# Agregados precalculados para todos los pares (nivel geográfico, categoría)
+if archive is None:
+    geo_aggregates = get_geographic_aggregates(filtered_df)
+    # Pruebas estadísticas e intervalos de confianza (calculados en lote una vez por versión de datos)
+    geo_statistics = get_geo_statistics(filtered_df)
+else:
+    # El archivo solo guarda sumas y conteos por ubicación: sin encuestas individuales no hay pruebas ni intervalos
+    geo_aggregates = archive_geographic_aggregates(archive)
+    geo_statistics = {}
+    st.caption("Promedios del archivo histórico, sin pruebas estadísticas ni intervalos de confianza.")
+    if selected_geo_var not in archive.get('regions', {}):
+        # Archivos exportados antes de guardar este nivel (p. ej. nicho)
+        st.info(f"El archivo histórico no guarda '{selected_geo_var}'; elija otra variable o use los datos actuales.")
+        st.stop()
+confidence_pct = int(CONFIDENCE_LEVEL * 100)
+
+# Consultar la categoría y el nivel seleccionados
+geo_category_data = geo_aggregates.get((selected_geo_var, selected_category))
+
+if geo_category_data is None:
     st.warning(f"No se encontraron datos para la categoría {selected_category}.")
 else:
-    # Calcular satisfacción promedio por categoría y ubicación
-    for col in valid_cols:
-        filtered_df[col] = pd.to_numeric(filtered_df[col], errors='coerce')
-    
-    filtered_df[f'{selected_category}_avg'] = filtered_df[valid_cols].mean(axis=1)
-    
-    # Agrupar por variable geográfica
-    geo_category_data = filtered_df.groupby(selected_geo_var)[f'{selected_category}_avg'].agg(['mean', 'count']).reset_index()
-    geo_category_data.columns = [selected_geo_var, 'Satisfacción Promedio', 'Conteo']
+    geo_category_data = geo_category_data.rename(columns={'Cantidad de Encuestas': 'Conteo'})
+    geo_category_data = attach_confidence_intervals(geo_category_data, geo_statistics, selected_geo_var, selected_category)
     
     # Mostrar tabla
     st.subheader(f"Satisfacción con {selected_category} por {selected_geo_var}")
-    st.dataframe(geo_category_data.sort_values('Satisfacción Promedio', ascending=False), use_container_width=True)
+    kruskal_text = describe_kruskal_result(geo_statistics, selected_geo_var, selected_category)
+    if kruskal_text:
+        st.markdown(kruskal_text)
+    show_paginated_table(geo_category_data.sort_values('Satisfacción Promedio', ascending=False), key=f'tabla_geo_categoria_{selected_geo_var}')
 
 # Identificación de ubicaciones problemáticas
 st.header("Identificación de Ubicaciones Problemáticas")
 
-# Calcular satisfacción promedio por ubicación
-satisfaction_cols = get_satisfaction_columns(filtered_df)
+# Satisfacción promedio (todas las preguntas) por ubicación
+geo_satisfaction = geo_aggregates.get((selected_geo_var, GENERAL_CATEGORY))
+has_satisfaction_data = geo_satisfaction is not None
+
+if has_satisfaction_data:
+    geo_satisfaction = attach_confidence_intervals(geo_satisfaction, geo_statistics, selected_geo_var, GENERAL_CATEGORY)
+    upper_col = f'IC {confidence_pct}% Superior'
+    lower_col = f'IC {confidence_pct}% Inferior'
 
-if satisfaction_cols:
-    filtered_df['satisfaccion_promedio'] = filtered_df[satisfaction_cols].mean(axis=1)
-    
-    # Agrupar por ubicación
-    geo_satisfaction = filtered_df.groupby(selected_geo_var)['satisfaccion_promedio'].agg(['mean', 'count']).reset_index()
-    geo_satisfaction.columns = [selected_geo_var, 'Satisfacción Promedio', 'Cantidad de Encuestas']
-    
     # Ordenar de menor a mayor satisfacción
     geo_satisfaction = geo_satisfaction.sort_values('Satisfacción Promedio')
     
     # Mostrar tabla
     st.subheader(f"Ranking de {selected_geo_var} por Satisfacción")
-    st.dataframe(geo_satisfaction, use_container_width=True)
+    kruskal_text = describe_kruskal_result(geo_statistics, selected_geo_var, GENERAL_CATEGORY)
+    if kruskal_text:
+        st.markdown(kruskal_text)
+    show_paginated_table(geo_satisfaction, key=f'tabla_geo_ranking_{selected_geo_var}')
     
-    # Identificar las ubicaciones con menor satisfacción
-    worst_locations = geo_satisfaction.head(3)
+    # Identificar las ubicaciones con menor satisfacción: se ordena por el límite superior del
+    # intervalo para que una ubicación con pocas encuestas no aparezca como la peor solo por azar
+    if upper_col in geo_satisfaction.columns:
+        worst_locations = geo_satisfaction.sort_values([upper_col, 'Satisfacción Promedio']).head(3)
+    else:
+        worst_locations = geo_satisfaction.head(3)
     
     st.subheader(f"{selected_geo_var.capitalize()} con menor satisfacción")
-    st.markdown("""
+    st.markdown(f"""
     Las siguientes ubicaciones presentan los niveles más bajos de satisfacción 
+    (según el límite superior del intervalo de confianza del {confidence_pct}%)
     y podrían requerir atención prioritaria:
     """)
     
     for i, row in worst_locations.iterrows():
+        interval_text = ""
+        if upper_col in row.index and pd.notna(row[upper_col]):
+            interval_text = f", IC {confidence_pct}%: [{row[lower_col]:.2f}, {row[upper_col]:.2f}]"
         st.markdown(f"""
         - **{row[selected_geo_var]}**: Satisfacción promedio de **{row['Satisfacción Promedio']:.2f}/5** 
-        (basado en {row['Cantidad de Encuestas']} encuestas)
+        (basado en {row['Cantidad de Encuestas']} encuestas{interval_text})
         """)
+    
+    # Pares de ubicaciones con diferencias significativas (prueba de Dunn)
+    level_statistics = geo_statistics.get(selected_geo_var)
+    if level_statistics is not None:
+        pairwise = level_statistics['pairwise']
+        pairwise = pairwise[pairwise['pregunta'] == GENERAL_CATEGORY].sort_values('p_ajustado')
+        with st.expander(f"Comparaciones por pares significativas ({len(pairwise)})"):
+            if pairwise.empty:
+                st.info("Ningún par de ubicaciones difiere significativamente en la satisfacción general.")
+            else:
+                show_paginated_table(pairwise.drop(columns='pregunta'), key=f'tabla_geo_pares_{selected_geo_var}')
 else:
     st.info("No hay columnas de satisfacción disponibles para identificar ubicaciones problemáticas.")
 
+# Vista jerárquica (drill-down comuna → barrio → nodo → comedor)
+st.header("Vista Jerárquica de Satisfacción")
+st.markdown("Haga clic en un sector para profundizar en el siguiente nivel; el tamaño indica el número de encuestas.")
+
+hierarchy_rollup = get_hierarchy_rollup(filtered_df)
+if hierarchy_rollup.empty:
+    st.info("No hay datos suficientes para construir la vista jerárquica.")
+else:
+    chart_type = st.radio("Tipo de gráfico", ["Sunburst", "Treemap"], horizontal=True)
+    hierarchy_fig = plot_hierarchy_rollup(hierarchy_rollup, chart_type=chart_type.lower())
+    st.plotly_chart(hierarchy_fig, width="stretch")
+
 # Conclusiones y recomendaciones
 st.header("Conclusiones y Recomendaciones")
 
-if satisfaction_cols and len(geo_vars) > 0:
+if has_satisfaction_data and len(geo_vars) > 0:
     st.markdown("""
     El análisis geográfico permite identificar patrones de satisfacción según la ubicación, 
     lo que puede ayudar a:
@@ -0,0 +1,165 @@
+import streamlit as st
+import pandas as pd
+from utils.data_loader import load_current_data
+from utils.data_processing import (
+    get_comedor_index,
+    get_comedor_scorecard,
+    get_comedor_rows,
+    search_comedores,
+    get_comedor_column,
+    get_satisfaction_columns,
+    CATEGORIES,
+    COL_DESCRIPTIONS,
+    COMMENT_COLS,
+    GEO_COLS
+)
+from utils.sentiment import sentiment_column, sentiment_label
+from utils.warmup import start_warmup
+
+# Configuración de la página
+st.set_page_config(
+    page_title="Búsqueda de Comedor",
+    page_icon="🔍",
+    layout="wide"
+)
+
+# Precalentar las cachés compartidas (solo la primera ejecución del proceso lanza el hilo)
+start_warmup()
+
+# Título y descripción
+st.title("🔍 Búsqueda y Detalle por Comedor")
+st.markdown("""
+Busque un comedor comunitario por nombre (admite búsquedas parciales y con errores de digitación)
+para ver sus encuestas, la evolución de sus puntajes y los comentarios registrados.
+""")
+
+# Cargar datos
+df = load_current_data()
+
+if df is None or df.empty:
+    st.error("No se pudieron cargar los datos. Verifica tus credenciales y la conexión a Google Sheets.")
+    st.stop()
+
+id_comedor_col = get_comedor_column(df)
+if id_comedor_col is None:
+    st.warning("No se encontró columna de identificación del comedor comunitario.")
+    st.stop()
+
+# Índice de búsqueda y scorecard (construidos una sola vez por versión de datos)
+comedor_index = get_comedor_index(df)
+scorecard = get_comedor_scorecard(df)
+
+st.sidebar.metric("🏪 Comedores registrados", len(comedor_index['names']))
+
+# --- Búsqueda ---
+query = st.text_input("🔎 Nombre del comedor", placeholder="Escriba parte del nombre...")
+matches = search_comedores(comedor_index, query, limit=50)
+
+if not matches:
+    st.info("No se encontraron comedores que coincidan con la búsqueda.")
+    st.stop()
+
+selected_comedor = st.selectbox(f"🏪 Comedores encontrados ({len(matches)})", matches, index=0)
+
+# Encuestas del comedor (carga diferida por posiciones de fila)
+comedor_df = get_comedor_rows(df, comedor_index, selected_comedor)
+
+# --- Resumen del comedor ---
+st.header(f"🏪 {selected_comedor}")
+
+if selected_comedor in scorecard.index:
+    comedor_summary = scorecard.loc[selected_comedor]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("📊 Encuestas", int(comedor_summary['encuestas']))
+    general = comedor_summary.get('satisfaccion_general')
+    col2.metric("⭐ Satisfacción General", f"{general:.2f}/5" if pd.notna(general) else "N/A")
+    col3.metric("⚠️ Insatisfacciones", int(comedor_summary.get('total_insatisfacciones', 0)))
+    ultima_fecha = comedor_summary.get('ultima_fecha')
+    col4.metric("📅 Última encuesta", ultima_fecha.strftime('%Y-%m-%d') if pd.notna(ultima_fecha) else "N/A")
+
+    geo_info = [f"**{col.capitalize()}:** {comedor_summary[col]}" for col in GEO_COLS
+                if col in comedor_summary.index and pd.notna(comedor_summary[col])]
+    if geo_info:
+        st.markdown(" | ".join(geo_info))
+
+    category_scores = {category: comedor_summary[category] for category in CATEGORIES if category in comedor_summary.index}
+    if category_scores:
+        category_df = pd.DataFrame({
+            'Categoría': list(category_scores),
+            'Satisfacción Promedio': list(category_scores.values())
+        })
+        st.dataframe(category_df, hide_index=True, width="stretch")
+
+# --- Puntajes en el tiempo ---
+st.header("📈 Puntajes en el Tiempo")
+
+satisfaction_cols = get_satisfaction_columns(comedor_df)
+if 'fecha' in comedor_df.columns and satisfaction_cols and comedor_df['fecha'].notna().any():
+    scores = comedor_df[satisfaction_cols].apply(pd.to_numeric, errors='coerce')
+    trend_data = []
+    for category, category_cols in CATEGORIES.items():
+        valid_category_cols = [col for col in category_cols if col in scores.columns]
+        if not valid_category_cols:
+            continue
+        category_trend = scores[valid_category_cols].mean(axis=1).groupby(comedor_df['fecha']).mean().dropna()
+        trend_data.append(pd.DataFrame({
+            'Fecha': category_trend.index,
+            'Satisfacción Promedio': category_trend.values,
+            'Categoría': category
+        }))
+
+    if trend_data:
+        # plotly.express solo se importa si hay un gráfico que mostrar (su importación es lenta)
+        import plotly.express as px
+        fig = px.line(
+            pd.concat(trend_data),
+            x='Fecha',
+            y='Satisfacción Promedio',
+            color='Categoría',
+            markers=True,
+            title=f"Evolución de la Satisfacción - {selected_comedor}",
+            height=400
+        )
+        fig.update_layout(yaxis_range=[1, 5], plot_bgcolor='white', paper_bgcolor='white')
+        st.plotly_chart(fig, width="stretch")
+    else:
+        st.info("No hay puntajes de satisfacción para graficar.")
+else:
+    st.info("No hay fechas o puntajes válidos para mostrar la evolución de este comedor.")
+
+# --- Comentarios ---
+st.header("💬 Comentarios y Sugerencias")
+
+comment_cols = [col for col in COMMENT_COLS if col in comedor_df.columns]
+comments_shown = 0
+sentiment_icons = {'Positivo': '🙂', 'Neutral': '😐', 'Negativo': '🙁'}
+for col in comment_cols:
+    comments = comedor_df[[col] + (['fecha'] if 'fecha' in comedor_df.columns else [])].dropna(subset=[col])
+    comments = comments[comments[col].astype(str).str.strip() != '']
+    if comments.empty:
+        continue
+    # Sentimiento del comentario (columna calculada al cargar los datos), si está disponible
+    if sentiment_column(col) in comedor_df.columns:
+        comment_icons = sentiment_label(comedor_df.loc[comments.index, sentiment_column(col)]).map(sentiment_icons)
+    else:
+        comment_icons = pd.Series('💭', index=comments.index)
+    st.subheader(COMMENT_COLS[col])
+    for row_index, comment, *fecha in comments.itertuples(name=None):
+        fecha_text = f" ({fecha[0]:%Y-%m-%d})" if fecha and pd.notna(fecha[0]) else ""
+        st.markdown(f"- {comment_icons.get(row_index, '💭')} {comment}{fecha_text}")
+        comments_shown += 1
+
+if comments_shown == 0:
+    st.info("Este comedor no tiene comentarios registrados.")
+
+# --- Encuestas ---
+st.header("📋 Encuestas Registradas")
+display_cols = [col for col in ['fecha', id_comedor_col] + GEO_COLS if col in comedor_df.columns] + satisfaction_cols
+encuestas_df = comedor_df[display_cols]
+if 'fecha' in display_cols:
+    encuestas_df = encuestas_df.sort_values('fecha', ascending=False)
+st.dataframe(encuestas_df.rename(columns=COL_DESCRIPTIONS), hide_index=True, width="stretch")
+
+# Footer
+st.markdown("---")
+st.markdown("📊 Dashboard de Análisis de la Encuesta de Satisfacción | 🔍 Sección: Búsqueda de Comedor")
@@ -0,0 +1,129 @@
+import streamlit as st
+import pandas as pd
+from utils.data_loader import load_current_data
+from utils.data_processing import (
+    build_heatmap,
+    build_bar_chart,
+    CATEGORIES,
+    COL_DESCRIPTIONS,
+    HIERARCHY_LEVELS,
+    GENERAL_CATEGORY
+)
+from utils.warmup import start_warmup
+from utils.significance import (
+    get_correlation_statistics,
+    combine_correlation_statistics,
+    correlation_from_statistics,
+    driver_ranking,
+    geographic_cell_mask
+)
+
+# Configuración de la página
+st.set_page_config(
+    page_title="Correlaciones y Factores Clave",
+    page_icon="🧭",
+    layout="wide"
+)
+
+# Precalentar las cachés compartidas (solo la primera ejecución del proceso lanza el hilo)
+start_warmup()
+
+# Título y descripción
+st.title("🧭 Correlaciones y Factores Clave de la Satisfacción")
+st.markdown("""
+Esta sección muestra qué aspectos se mueven juntos (correlación entre preguntas) y cuáles
+están más asociados con la satisfacción general (factores clave), para priorizar mejoras.
+""")
+
+# Cargar datos
+df = load_current_data()
+
+if df is None or df.empty:
+    st.error("No se pudieron cargar los datos. Verifica tus credenciales y la conexión a Google Sheets.")
+    st.stop()
+
+# Estadísticos suficientes por celda geográfica (en caché por versión de datos):
+# los filtros solo suman celdas, no se recalcula sobre las encuestas
+statistics = get_correlation_statistics(df)
+if not statistics:
+    st.warning("No hay preguntas de satisfacción con respuestas válidas para calcular correlaciones.")
+    st.stop()
+
+# --- Filtros geográficos (en cascada: cada nivel muestra solo las opciones de los niveles anteriores) ---
+st.sidebar.title("🔧 Filtros")
+cells = statistics['cells']
+level_icons = {'comuna': '🏘️', 'barrio': '🏠', 'nodo': '📍'}
+selections = {}
+available = pd.Series(True, index=cells.index)
+for level in [col for col in HIERARCHY_LEVELS if col in cells.columns]:
+    options = sorted(cells.loc[available, level].unique())
+    selections[level] = st.sidebar.multiselect(
+        f"{level_icons.get(level, '')} {level.capitalize()}", options, key=f'correlaciones_{level}'
+    )
+    if selections[level]:
+        available &= cells[level].isin(selections[level])
+
+cell_mask = geographic_cell_mask(statistics, selections)
+totals = combine_correlation_statistics(statistics, cell_mask)
+columns = statistics['columns']
+general_index = columns.index(GENERAL_CATEGORY)
+st.sidebar.metric("Encuestas seleccionadas", int(totals['n'][general_index, general_index]))
+
+if totals['n'][general_index, general_index] == 0:
+    st.info("No hay encuestas para los filtros seleccionados.")
+    st.stop()
+
+question_labels = {col: COL_DESCRIPTIONS.get(col, col) for col in columns}
+question_categories = {col: category for category, category_cols in CATEGORIES.items() for col in category_cols}
+
+# --- Matriz de correlación ---
+st.header("🔗 Correlación entre Preguntas")
+st.write("Correlación de Pearson por pares (con las encuestas que respondieron ambas preguntas). "
+         "Valores cercanos a 1 indican aspectos que suben y bajan juntos.")
+correlation = correlation_from_statistics(totals, columns).rename(index=question_labels, columns=question_labels)
+st.plotly_chart(
+    build_heatmap(correlation, "Matriz de correlación", colorscale='RdBu', zmin=-1, zmax=1,
+                  colorbar_title="r", height=750),
+    width="stretch"
+)
+
+# --- Factores clave ---
+st.header("🎯 Factores Clave de la Satisfacción General")
+st.write("Para cada pregunta, regresión simple del promedio general de la encuesta sobre la pregunta: "
+         "la correlación y el R² indican cuánto se asocia el aspecto con la satisfacción general.")
+drivers = driver_ranking(totals, columns)
+drivers = drivers.dropna(subset=['correlacion'])
+
+if drivers.empty:
+    st.info("No hay observaciones suficientes para estimar los factores clave con estos filtros.")
+else:
+    # Prioridad: aspectos muy asociados a la satisfacción general pero con promedio bajo
+    high_impact = drivers['correlacion'] >= drivers['correlacion'].median()
+    low_score = drivers['promedio'] < drivers['promedio'].median()
+    drivers['Prioridad'] = (high_impact & low_score).map({True: "🔴 Mejorar", False: ""})
+    drivers['Aspecto'] = drivers['pregunta'].map(question_labels)
+    drivers['Categoría'] = drivers['pregunta'].map(question_categories)
+
+    drivers_fig = build_bar_chart(
+        drivers.assign(correlacion=drivers['correlacion'].round(2)), 'Aspecto', 'correlacion',
+        "Correlación con la satisfacción general", orientation='h',
+        value_title="Correlación", height=650
+    )
+    drivers_fig.update_layout(showlegend=False)
+    st.plotly_chart(drivers_fig, width="stretch")
+
+    drivers_table = drivers[['Aspecto', 'Categoría', 'n', 'promedio', 'correlacion', 'pendiente', 'r2', 'Prioridad']]
+    drivers_table = drivers_table.rename(columns={
+        'n': 'Encuestas', 'promedio': 'Promedio (1-5)', 'correlacion': 'Correlación',
+        'pendiente': 'Pendiente', 'r2': 'R²'
+    })
+    st.dataframe(
+        drivers_table.style.format({'Promedio (1-5)': '{:.2f}', 'Correlación': '{:.2f}',
+                                    'Pendiente': '{:.3f}', 'R²': '{:.2f}'}),
+        width="stretch", hide_index=True
+    )
+    st.caption("🔴 Mejorar: aspectos con correlación por encima de la mediana y promedio por debajo de la mediana.")
+
+# Footer
+st.markdown("---")
+st.markdown("📊 Dashboard de Análisis de la Encuesta de Satisfacción | 🧭 Sección: Correlaciones y Factores Clave")
\ No newline at end of file
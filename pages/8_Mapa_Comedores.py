@@ -0,0 +1,90 @@
+import streamlit as st
+import pandas as pd
+from utils.data_loader import load_current_data
+from utils.data_processing import (
+    get_comedor_heatmap,
+    build_heatmap,
+    COL_DESCRIPTIONS
+)
+from utils.warmup import start_warmup
+
+# Comedores que se muestran con el valor de cada celda escrito (con más, solo colores)
+MAX_ANNOTATED_ROWS = 60
+
+# Configuración de la página
+st.set_page_config(
+    page_title="Mapa de Calor por Comedor",
+    page_icon="🟩",
+    layout="wide"
+)
+
+# Precalentar las cachés compartidas (solo la primera ejecución del proceso lanza el hilo)
+start_warmup()
+
+# Título y descripción
+st.title("🟩 Mapa de Calor por Comedor")
+st.markdown("""
+Puntaje promedio de cada comedor en cada pregunta. Filas y columnas están ordenadas por
+agrupamiento jerárquico: los comedores con perfiles de problemas parecidos quedan juntos.
+""")
+
+# Cargar datos
+df = load_current_data()
+
+if df is None or df.empty:
+    st.error("No se pudieron cargar los datos. Verifica tus credenciales y la conexión a Google Sheets.")
+    st.stop()
+
+# Matriz ordenada (el agrupamiento se calcula una vez por versión de datos; los filtros solo seleccionan filas)
+heatmap = get_comedor_heatmap(df)
+matrix, geo = heatmap['matrix'], heatmap['geo']
+if matrix.empty:
+    st.warning("No se pudo construir el mapa de calor (falta la columna del comedor o no hay puntajes válidos).")
+    st.stop()
+
+# --- Filtros ---
+st.sidebar.title("🔧 Filtros")
+selected_rows = pd.Series(True, index=matrix.index)
+if 'comuna' in geo.columns:
+    comunas = sorted(geo['comuna'].dropna().astype(str).unique())
+    selected_comunas = st.sidebar.multiselect("🏘️ Comuna", comunas, key='mapa_comunas')
+    if selected_comunas:
+        selected_rows &= geo['comuna'].astype(str).isin(selected_comunas)
+
+max_score = st.sidebar.slider("Satisfacción general máxima", 1.0, 5.0, 5.0, 0.1, key='mapa_satisfaccion_maxima',
+                              help="Mostrar solo comedores con satisfacción general menor o igual a este valor.")
+selected_rows &= geo['satisfaccion_general'] <= max_score
+
+max_rows = st.sidebar.number_input("Máximo de comedores", min_value=min(10, len(matrix)), max_value=len(matrix),
+                                   value=min(100, len(matrix)), step=10, key='mapa_maximo_comedores')
+
+visible = matrix[selected_rows.to_numpy()]
+if len(visible) > max_rows:
+    # Se conservan los de menor satisfacción general, sin perder el orden del agrupamiento
+    lowest = geo.loc[visible.index, 'satisfaccion_general'].nsmallest(int(max_rows)).index
+    visible = visible[visible.index.isin(lowest)]
+st.sidebar.metric("Comedores en el mapa", f"{len(visible)} de {len(matrix)}")
+
+if visible.empty:
+    st.info("Ningún comedor cumple los filtros seleccionados.")
+    st.stop()
+
+fig = build_heatmap(
+    visible.rename(columns=COL_DESCRIPTIONS),
+    "Puntaje promedio por comedor y pregunta",
+    colorscale='RdYlGn', zmin=1, zmax=5, colorbar_title="Promedio",
+    height=max(450, 18 * len(visible) + 250),
+    show_text=len(visible) <= MAX_ANNOTATED_ROWS
+)
+st.plotly_chart(fig, width="stretch")
+
+st.download_button(
+    "Descargar matriz ordenada (CSV)",
+    data=visible.rename(columns=COL_DESCRIPTIONS).to_csv().encode('utf-8'),
+    file_name="mapa_calor_comedores.csv",
+    mime="text/csv"
+)
+
+# Footer
+st.markdown("---")
+st.markdown("📊 Dashboard de Análisis de la Encuesta de Satisfacción | 🟩 Sección: Mapa de Calor por Comedor")
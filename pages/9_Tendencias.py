@@ -0,0 +1,139 @@
+import streamlit as st
+import pandas as pd
+from utils.data_loader import load_current_data
+from utils.data_processing import (
+    plot_satisfaction_trend,
+    get_satisfaction_columns,
+    build_bar_chart,
+    CATEGORIES,
+    COL_DESCRIPTIONS,
+    GENERAL_CATEGORY
+)
+from utils.trends import get_trend, rollup_by_period, period_means, TREND_FREQUENCIES, DEFAULT_TREND_FREQUENCY
+from utils.archive import (
+    archive_source_toggle,
+    export_to_archive,
+    archive_distribution,
+    statistics_means,
+    ARCHIVE_DIR
+)
+from utils.warmup import start_warmup
+
+# Configuración de la página
+st.set_page_config(
+    page_title="Tendencias de Satisfacción",
+    page_icon="📈",
+    layout="wide"
+)
+
+# Precalentar las cachés compartidas (solo la primera ejecución del proceso lanza el hilo)
+start_warmup()
+
+# Título y descripción
+st.title("📈 Tendencias de Satisfacción en el Tiempo")
+st.markdown("""
+Evolución de la satisfacción promedio por semana, mes o trimestre. Los promedios se calculan
+a partir de acumulados diarios que se actualizan solo con las encuestas nuevas.
+""")
+
+# Cargar datos
+df = load_current_data()
+
+if df is None or df.empty:
+    st.error("No se pudieron cargar los datos. Verifica tus credenciales y la conexión a Google Sheets.")
+    st.stop()
+
+if 'fecha' not in df.columns:
+    st.warning("Los datos no tienen columna 'fecha': no se pueden calcular tendencias.")
+    st.stop()
+
+# --- Controles ---
+st.sidebar.title("🔧 Opciones")
+frequency_label = st.sidebar.radio(
+    "Granularidad", list(TREND_FREQUENCIES), index=list(TREND_FREQUENCIES).index(DEFAULT_TREND_FREQUENCY),
+    key='tendencias_granularidad'
+)
+series_options = list(CATEGORIES) + [GENERAL_CATEGORY] + get_satisfaction_columns(df)
+selected_series = st.sidebar.multiselect(
+    "Series", series_options, default=list(CATEGORIES),
+    format_func=lambda col: COL_DESCRIPTIONS.get(col, col), key='tendencias_series'
+)
+
+# --- Archivo histórico (Parquet, leído por lotes) ---
+st.sidebar.markdown("---")
+if st.sidebar.button("🗄️ Guardar encuestas nuevas en el archivo", key='tendencias_exportar'):
+    saved_rows = export_to_archive(df)
+    if saved_rows is None:
+        st.sidebar.error("No se pudo guardar el archivo (revise que pyarrow esté instalado y que haya fechas).")
+    elif saved_rows:
+        st.sidebar.success(f"{saved_rows} encuestas nuevas guardadas en el archivo histórico.")
+    else:
+        st.sidebar.info("Todas las encuestas ya están en el archivo histórico.")
+archive = archive_source_toggle()
+use_archive = archive is not None
+
+if use_archive:
+    if 'daily' not in archive:
+        st.warning(f"El archivo histórico en '{ARCHIVE_DIR}' no tiene encuestas con fecha.")
+        st.stop()
+    period_rollup = rollup_by_period(archive['daily'], TREND_FREQUENCIES[frequency_label])
+    means, counts = period_means(period_rollup), period_rollup['count']
+else:
+    means, counts = get_trend(df, frequency_label)
+if means.empty:
+    st.info("No hay encuestas con fecha y puntajes válidos.")
+    st.stop()
+st.sidebar.metric("Periodos", len(means))
+
+# --- Gráfico de tendencia ---
+if selected_series:
+    trend_fig = plot_satisfaction_trend(df, frequency_label, columns=selected_series,
+                                        trend=(means, counts) if use_archive else None)
+    if trend_fig:
+        st.plotly_chart(trend_fig, width="stretch")
+else:
+    st.info("Seleccione al menos una serie en la barra lateral.")
+
+# --- Encuestas por periodo ---
+if GENERAL_CATEGORY in counts.columns:
+    surveys = pd.DataFrame({'Periodo': [str(period) for period in counts.index],
+                            'Encuestas': counts[GENERAL_CATEGORY].astype(int).to_numpy()})
+    surveys_fig = build_bar_chart(surveys, 'Periodo', 'Encuestas', f"Encuestas por {frequency_label.lower()}",
+                                  category_order=list(surveys['Periodo']), height=350)
+    surveys_fig.update_layout(showlegend=False)
+    st.plotly_chart(surveys_fig, width="stretch")
+
+# --- Tabla de promedios ---
+with st.expander("Promedios por periodo"):
+    table_cols = [col for col in selected_series if col in means.columns] or list(means.columns)
+    trend_table = means[table_cols].rename(columns=COL_DESCRIPTIONS)
+    trend_table.index = trend_table.index.astype(str)
+    trend_table.index.name = frequency_label
+    st.dataframe(trend_table.style.format('{:.2f}', na_rep='-'), width="stretch")
+    st.download_button(
+        "Descargar tendencia (CSV)",
+        data=trend_table.to_csv().encode('utf-8'),
+        file_name=f"tendencia_{frequency_label.lower()}.csv",
+        mime="text/csv"
+    )
+
+# --- Agregados del archivo histórico ---
+if use_archive:
+    with st.expander("Archivo histórico: promedios por zona y distribución de respuestas"):
+        levels = list(archive.get('regions', {}))
+        if levels:
+            level = st.selectbox("Nivel geográfico", levels, format_func=str.capitalize, key='tendencias_nivel_archivo')
+            region_stats = archive['regions'][level]
+            region_table = statistics_means(region_stats)
+            table_cols = [col for col in list(CATEGORIES) + [GENERAL_CATEGORY] if col in region_table.columns]
+            region_table = region_table[table_cols].rename(columns=COL_DESCRIPTIONS)
+            if GENERAL_CATEGORY in region_stats['count'].columns:
+                region_table.insert(0, 'Encuestas', region_stats['count'][GENERAL_CATEGORY].astype(int))
+            st.dataframe(region_table.style.format('{:.2f}', subset=region_table.columns.drop('Encuestas', errors='ignore'),
+                                                   na_rep='-'), width="stretch")
+        distribution = archive_distribution(archive).rename(index=COL_DESCRIPTIONS)
+        st.dataframe(distribution.style.format({'Promedio': '{:.2f}'}, na_rep='-'), width="stretch")
+
+# Footer
+st.markdown("---")
+st.markdown("📊 Dashboard de Análisis de la Encuesta de Satisfacción | 📈 Sección: Tendencias")
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.trends import build_daily_rollup, rollup_by_period, period_means, get_trend, ROLLUP_STATISTICS
+
+
+def _surveys(fechas):
+    """Encuestas mínimas: dos preguntas de Abarrotes con puntajes 1-5 y la fecha indicada."""
+    return pd.DataFrame({
+        'fecha': fechas,
+        '9fecha_vencimiento': [4.0] * len(fechas),
+        '10tipo_empaque': [2.0] * len(fechas),
+    })
+
+
+def _assert_empty_daily_rollup(rollup):
+    for statistic in ROLLUP_STATISTICS:
+        assert isinstance(rollup[statistic].index, pd.DatetimeIndex)
+        assert rollup[statistic].index.name == 'dia'
+        assert rollup[statistic].empty
+
+
+def test_daily_rollup_without_valid_dates_is_indexed_by_day():
+    for df in [pd.DataFrame(), _surveys([pd.NaT, pd.NaT]), _surveys(['sin fecha', None])]:
+        rollup = build_daily_rollup(df)
+        _assert_empty_daily_rollup(rollup)
+        period_rollup = rollup_by_period(rollup, 'M')
+        assert period_means(period_rollup).empty
+
+
+def test_trend_without_valid_dates_is_empty():
+    for df in [pd.DataFrame(), _surveys([pd.NaT, pd.NaT])]:
+        means, counts = get_trend(df, 'Mes')
+        assert means.empty and counts.empty
+
+
+def test_daily_rollup_groups_by_day():
+    rollup = build_daily_rollup(_surveys(['2024-01-01 08:00', '2024-01-01 17:00', '2024-02-03 09:30', None]))
+    assert list(rollup['count'].index) == [pd.Timestamp('2024-01-01'), pd.Timestamp('2024-02-03')]
+    assert rollup['count'].loc['2024-01-01', '9fecha_vencimiento'] == 2
+    assert rollup['sum'].loc['2024-01-01', '10tipo_empaque'] == 4
+    assert rollup['sumsq'].loc['2024-02-03', '9fecha_vencimiento'] == 16
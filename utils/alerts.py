@@ -0,0 +1,113 @@
+import math
+import threading
+import pandas as pd
+import streamlit as st
+from utils.data_processing import get_comedor_column, GENERAL_CATEGORY
+from utils.significance import build_score_matrix
+from utils.trends import register_ingestion_listener
+
+# Parámetros del detector EWMA (media y varianza con pesos exponenciales por entidad)
+EWMA_ALPHA = 0.3                # Peso de cada encuesta nueva
+ALERT_Z_THRESHOLD = 2.0         # Caída (en desviaciones) respecto de lo esperado para alertar
+ALERT_MIN_OBSERVATIONS = 5      # Encuestas previas mínimas antes de poder alertar
+ALERT_MIN_STD = 0.25            # Piso de la desviación (evita alertas con historiales sin variación)
+
+# Niveles vigilados: el comedor y las unidades geográficas
+ALERT_GEO_LEVELS = ['comuna', 'barrio', 'nodo']
+COMEDOR_LEVEL = 'comedor'
+
+# --- INICIO FUNCIONES ---
+
+@st.cache_resource(show_spinner=False)
+def _alert_store():
+    """
+    Estado del detector compartido por el proceso: {(nivel, entidad): dict con media, varianza,
+    n, último puntaje, última fecha y la alerta de la última encuesta (o None)}.
+    """
+    return {'lock': threading.Lock(), 'entities': {}}
+
+
+def ewma_update(entity_state, value):
+    """
+    Actualiza en O(1) la media y varianza exponenciales de una entidad con un puntaje nuevo.
+    Devuelve (z, esperado): la desviación del puntaje respecto de la media previa, en desviaciones
+    estándar (None si aún no hay ALERT_MIN_OBSERVATIONS encuestas), y la media previa.
+    """
+    if entity_state['n'] == 0:
+        entity_state.update(mean=value, var=0.0, n=1)
+        return None, value
+    expected = entity_state['mean']
+    delta = value - expected
+    z = None
+    if entity_state['n'] >= ALERT_MIN_OBSERVATIONS:
+        z = delta / max(math.sqrt(entity_state['var']), ALERT_MIN_STD)
+    entity_state['mean'] = expected + EWMA_ALPHA * delta
+    entity_state['var'] = (1 - EWMA_ALPHA) * (entity_state['var'] + EWMA_ALPHA * delta ** 2)
+    entity_state['n'] += 1
+    return z, expected
+
+
+def process_new_rows(new_df):
+    """
+    Pasa las encuestas nuevas (en orden de fecha) por el detector de cada comedor y unidad geográfica.
+    El puntaje de cada encuesta es su promedio general (GENERAL_CATEGORY).
+    """
+    matrix, _ = build_score_matrix(new_df)
+    if GENERAL_CATEGORY not in matrix.columns:
+        return
+    if 'fecha' in new_df.columns:
+        fechas = pd.to_datetime(new_df['fecha'], errors='coerce')
+    else:
+        fechas = pd.Series(pd.NaT, index=new_df.index)
+    levels = {level: level for level in ALERT_GEO_LEVELS if level in new_df.columns}
+    comedor_col = get_comedor_column(new_df)
+    if comedor_col:
+        levels[COMEDOR_LEVEL] = comedor_col
+
+    stream = pd.DataFrame({'fecha': fechas, 'puntaje': matrix[GENERAL_CATEGORY]}, index=new_df.index)
+    for level, col in levels.items():
+        keys = new_df[col].astype(str).str.strip()
+        stream[level] = keys.where(new_df[col].notna() & (keys != ''))
+    stream = stream[stream['puntaje'].notna()].sort_values('fecha', kind='stable', na_position='first')
+
+    store = _alert_store()
+    level_names = list(levels)
+    with store['lock']:
+        for row in stream.itertuples(index=False):
+            for level in level_names:
+                entity = getattr(row, level)
+                if not isinstance(entity, str):
+                    continue
+                state = store['entities'].setdefault((level, entity), {'mean': 0.0, 'var': 0.0, 'n': 0})
+                z, expected = ewma_update(state, row.puntaje)
+                state['last_value'], state['last_fecha'] = row.puntaje, row.fecha
+                state['alert'] = (z, expected) if z is not None and z <= -ALERT_Z_THRESHOLD else None
+
+
+def reset_alerts():
+    """Vacía el estado del detector (se reconstruye con todas las filas en el próximo ingreso)."""
+    store = _alert_store()
+    with store['lock']:
+        store['entities'].clear()
+
+
+def get_alerts(df):
+    """
+    Entidades (comedor o unidad geográfica) cuya última encuesta cayó al menos ALERT_Z_THRESHOLD
+    desviaciones por debajo de su media exponencial. El detector sigue la copia vigente de los datos
+    (utils.trends la ingresa al guardarla); df solo indica si hay datos.
+    Devuelve un DataFrame ordenado de la caída más fuerte a la más leve.
+    """
+    columns = ['Nivel', 'Entidad', 'Fecha', 'Puntaje', 'Esperado', 'Desviaciones', 'Encuestas']
+    if df is None or df.empty:
+        return pd.DataFrame(columns=columns)
+    register_ingestion_listener('alertas_ewma', process_new_rows, reset_alerts)
+
+    store = _alert_store()
+    with store['lock']:
+        rows = [(level, entity, state['last_fecha'], state['last_value'], state['alert'][1], state['alert'][0], state['n'])
+                for (level, entity), state in list(store['entities'].items()) if state.get('alert')]
+    alerts = pd.DataFrame(rows, columns=columns)
+    return alerts.sort_values('Desviaciones', kind='stable').reset_index(drop=True)
+
+# --- FIN FUNCIONES ---
@@ -0,0 +1,265 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.data_processing import (
+    build_answer_distribution,
+    get_comedor_column,
+    get_satisfaction_columns,
+    SATISFACTION_ORDER,
+    GEO_COLS
+)
+from utils.significance import build_score_matrix
+from utils.trends import build_daily_rollup, row_fingerprints, ROLLUP_STATISTICS
+
+# Carpeta con el archivo histórico: archivos Parquet (uno por programa o periodo, sin filas repetidas entre archivos)
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'archivo')
+# Nombre de los archivos exportados: primera y última fecha de las encuestas que contienen
+ARCHIVE_FILE_TEMPLATE = 'encuestas_{desde}_{hasta}.parquet'
+# Columna con la huella de cada encuesta exportada (utils.trends.row_fingerprints), para no repetirlas
+ARCHIVE_FINGERPRINT_COL = 'huella'
+
+# Selector de fuente de datos compartido por las páginas (clave del widget y elección guardada)
+ARCHIVE_SOURCE_OPTIONS = ["Datos actuales", "Archivo histórico"]
+ARCHIVE_SOURCE_KEY = 'fuente_datos'
+ARCHIVE_SOURCE_STATE_KEY = 'fuente_datos_elegida'
+
+# Filas por lote al leer (acota la memoria) y por grupo de filas al escribir
+ARCHIVE_BATCH_ROWS = 50_000
+ARCHIVE_ROW_GROUP_ROWS = 50_000
+
+# --- INICIO FUNCIONES ---
+
+def archive_files(archive_dir=ARCHIVE_DIR):
+    """Archivos Parquet del archivo histórico, en orden alfabético."""
+    return sorted(glob.glob(os.path.join(archive_dir, '*.parquet')))
+
+
+def archive_columns(df):
+    """Columnas que se guardan en el archivo: fecha, niveles geográficos, comedor y preguntas de satisfacción."""
+    comedor_col = get_comedor_column(df)
+    keys = ['fecha'] + GEO_COLS + ([comedor_col] if comedor_col else [])
+    return [col for col in keys if col in df.columns] + get_satisfaction_columns(df)
+
+
+def archived_fingerprints(archive_dir=ARCHIVE_DIR):
+    """
+    Huellas de las encuestas ya exportadas (leyendo solo la columna ARCHIVE_FINGERPRINT_COL de cada archivo).
+    Los archivos sin esa columna (agregados a mano) no se tienen en cuenta.
+    """
+    import pyarrow.parquet as pq
+    fingerprints = []
+    for path in archive_files(archive_dir):
+        if ARCHIVE_FINGERPRINT_COL in pq.ParquetFile(path).schema_arrow.names:
+            fingerprints.append(pq.read_table(path, columns=[ARCHIVE_FINGERPRINT_COL]).column(ARCHIVE_FINGERPRINT_COL).to_numpy())
+    return pd.Index(np.concatenate(fingerprints) if fingerprints else np.array([], dtype=np.uint64))
+
+
+def export_to_archive(df, archive_dir=ARCHIVE_DIR):
+    """
+    Agrega al archivo las encuestas de df que aún no están archivadas (solo las columnas de
+    archive_columns), en un archivo Parquet nuevo con nombre ARCHIVE_FILE_TEMPLATE y grupos de
+    ARCHIVE_ROW_GROUP_ROWS filas, para poder leerlo luego por lotes. Las encuestas ya archivadas se
+    reconocen por su huella (row_fingerprints), no por la fecha: las encuestas nuevas del último día
+    archivado o con fecha anterior también se agregan. Los archivos anteriores no se modifican y las
+    encuestas sin fecha no se archivan. Devuelve el número de encuestas guardadas (0 si no hay nuevas) o None si falla.
+    """
+    if df is None or df.empty or 'fecha' not in df.columns:
+        return None
+    try:
+        archived = archived_fingerprints(archive_dir)
+    except Exception as e_archived:
+        print(f"ERROR export_to_archive: No se pudo leer el archivo en '{archive_dir}': {e_archived}")
+        return None
+
+    fechas = pd.to_datetime(df['fecha'], errors='coerce')
+    if fechas.isna().any():
+        print(f"WARN export_to_archive: {int(fechas.isna().sum())} encuestas sin fecha válida no se archivan.")
+    df = df[fechas.notna()]
+    columns = archive_columns(df)
+    satisfaction_cols = get_satisfaction_columns(df)
+    archive_df = df[columns].copy()
+    archive_df[satisfaction_cols] = archive_df[satisfaction_cols].apply(pd.to_numeric, errors='coerce').astype(float)
+    archive_df['fecha'] = fechas[fechas.notna()]
+    for col in archive_df.columns.difference(satisfaction_cols + ['fecha']):
+        archive_df[col] = archive_df[col].where(archive_df[col].isna(), archive_df[col].astype(str))
+
+    # Huellas sobre todas las encuestas (no solo las nuevas) para que las filas repetidas conserven su número de aparición
+    fingerprints = row_fingerprints(archive_df)
+    new_rows = ~fingerprints.isin(archived)
+    if not new_rows.any():
+        print("INFO export_to_archive: Todas las encuestas ya están en el archivo.")
+        return 0
+    archive_df = archive_df[new_rows]
+    archive_df[ARCHIVE_FINGERPRINT_COL] = fingerprints[new_rows].to_numpy()
+
+    file_name = ARCHIVE_FILE_TEMPLATE.format(desde=archive_df['fecha'].min().strftime('%Y%m%d'),
+                                             hasta=archive_df['fecha'].max().strftime('%Y%m%d'))
+    path = os.path.join(archive_dir, file_name)
+    if os.path.exists(path):
+        # Mismo rango de fechas que un archivo anterior (p. ej. encuestas nuevas del mismo día): no se sobrescribe
+        path = path.replace('.parquet', f"_{pd.Timestamp.now().strftime('%H%M%S')}.parquet")
+    try:
+        os.makedirs(archive_dir, exist_ok=True)
+        archive_df.to_parquet(path, index=False, engine='pyarrow', row_group_size=ARCHIVE_ROW_GROUP_ROWS)
+    except Exception as e_archive:
+        print(f"ERROR export_to_archive: No se pudo escribir '{path}': {e_archive}")
+        return None
+    print(f"INFO export_to_archive: {len(archive_df)} encuestas guardadas en '{path}'.")
+    return len(archive_df)
+
+
+def iter_archive_batches(paths, batch_rows=ARCHIVE_BATCH_ROWS):
+    """
+    Recorre los archivos Parquet por lotes de a lo sumo batch_rows filas (sin cargar el archivo completo),
+    leyendo solo las columnas que usan los agregados. Devuelve DataFrames.
+    """
+    import pyarrow.parquet as pq
+    for path in paths:
+        parquet_file = pq.ParquetFile(path)
+        names = parquet_file.schema_arrow.names
+        columns = [col for col in names if col in ['fecha'] + GEO_COLS
+                   or col.startswith(tuple(str(number) for number in range(9, 29)))]
+        for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=columns):
+            yield batch.to_pandas()
+
+
+def _add_statistics(totals, new):
+    """Suma estadísticos acumulables (DataFrames o Series alineados por índice y columnas; lo que falte cuenta 0)."""
+    if totals is None:
+        return new
+    return totals.add(new, fill_value=0)
+
+
+def fold_archive_batch(aggregates, batch):
+    """
+    Suma un lote de encuestas a los agregados acumulados (dict, vacío al inicio):
+      - 'distribution': respuestas 1-5 por pregunta (como build_answer_distribution)
+      - 'totals': suma, suma de cuadrados y conteo por pregunta, categoría y promedio general
+      - 'regions': lo mismo por valor de cada nivel geográfico
+      - 'daily': rollup diario (como utils.trends.build_daily_rollup)
+      - 'rows': encuestas procesadas
+    El tamaño de los agregados no depende del número de encuestas.
+    """
+    matrix, _ = build_score_matrix(batch)
+    if matrix.empty:
+        return aggregates
+
+    distribution = build_answer_distribution(batch)[SATISFACTION_ORDER]
+    aggregates['distribution'] = _add_statistics(aggregates.get('distribution'), distribution)
+
+    batch_totals = {'sum': matrix.sum(), 'sumsq': (matrix ** 2).sum(), 'count': matrix.notna().sum().astype(float)}
+    totals = aggregates.setdefault('totals', {})
+    for statistic in ROLLUP_STATISTICS:
+        totals[statistic] = _add_statistics(totals.get(statistic), batch_totals[statistic])
+
+    regions = aggregates.setdefault('regions', {})
+    for level in [col for col in GEO_COLS if col in batch.columns]:
+        keys = batch[level].astype(str).str.strip()
+        keys = keys.where(batch[level].notna() & (keys != '')).rename(level)
+        level_stats = regions.setdefault(level, {})
+        level_stats['sum'] = _add_statistics(level_stats.get('sum'), matrix.groupby(keys).sum())
+        level_stats['sumsq'] = _add_statistics(level_stats.get('sumsq'), (matrix ** 2).groupby(keys).sum())
+        level_stats['count'] = _add_statistics(level_stats.get('count'), matrix.notna().groupby(keys).sum().astype(float))
+
+    if 'fecha' in batch.columns:
+        daily = aggregates.setdefault('daily', {})
+        batch_daily = build_daily_rollup(batch)
+        for statistic in ROLLUP_STATISTICS:
+            daily[statistic] = _add_statistics(daily.get(statistic), batch_daily[statistic]).sort_index()
+
+    aggregates['rows'] = aggregates.get('rows', 0) + len(batch)
+    return aggregates
+
+
+def aggregate_archive(paths, batch_rows=ARCHIVE_BATCH_ROWS):
+    """Agrega todos los archivos lote a lote (memoria acotada por batch_rows). Devuelve los agregados de fold_archive_batch."""
+    aggregates = {}
+    for batch in iter_archive_batches(paths, batch_rows):
+        aggregates = fold_archive_batch(aggregates, batch)
+    return aggregates
+
+
+@st.cache_data(show_spinner="Agregando el archivo histórico...")
+def _cached_archive_aggregates(archive_signature):
+    print(f"INFO: Agregando {len(archive_signature)} archivos del archivo histórico por lotes (caché)...")
+    aggregates = aggregate_archive([path for path, _, _ in archive_signature])
+    aggregates['version'] = archive_signature
+    return aggregates
+
+
+def get_archive_aggregates(archive_dir=ARCHIVE_DIR):
+    """
+    Agregados del archivo histórico, en caché mientras los archivos no cambien (ruta, fecha de
+    modificación y tamaño, guardados en 'version'). Devuelve un dict vacío si no hay archivos o falta pyarrow.
+    """
+    paths = archive_files(archive_dir)
+    if not paths:
+        return {}
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        print("WARN get_archive_aggregates: pyarrow no está instalado; no se puede leer el archivo histórico.")
+        return {}
+    signature = tuple((path, os.path.getmtime(path), os.path.getsize(path)) for path in paths)
+    return _cached_archive_aggregates(signature)
+
+
+def statistics_means(statistics):
+    """Promedios a partir de sumas y conteos acumulados (NaN donde no hay respuestas)."""
+    return statistics['sum'] / statistics['count'].where(statistics['count'] > 0)
+
+
+def archive_distribution(aggregates):
+    """Distribución de respuestas del archivo con el mismo formato que build_answer_distribution."""
+    counts = aggregates.get('distribution')
+    if counts is None:
+        return pd.DataFrame(columns=SATISFACTION_ORDER + ['Total', 'Promedio'])
+    distribution = counts.astype(int)
+    distribution['Total'] = distribution[SATISFACTION_ORDER].sum(axis=1)
+    weights = pd.Series(range(1, len(SATISFACTION_ORDER) + 1), index=SATISFACTION_ORDER)
+    distribution['Promedio'] = (distribution[SATISFACTION_ORDER] @ weights) / distribution['Total'].where(distribution['Total'] > 0)
+    return distribution
+
+
+def archive_geographic_aggregates(aggregates):
+    """Promedios y encuestas por nivel geográfico del archivo, con el mismo formato que build_geographic_aggregates."""
+    geo_aggregates = {}
+    for level, level_stats in aggregates.get('regions', {}).items():
+        means = statistics_means(level_stats)
+        for category in means.columns:
+            category_stats = pd.DataFrame({
+                level: means.index,
+                'Satisfacción Promedio': means[category].to_numpy(),
+                'Cantidad de Encuestas': level_stats['count'][category].astype(int).to_numpy()
+            })
+            geo_aggregates[(level, category)] = category_stats[category_stats['Cantidad de Encuestas'] > 0]
+    return geo_aggregates
+
+
+def archive_source_toggle():
+    """
+    Selector "Fuente de datos" de la barra lateral, el mismo en todas las páginas con agregados
+    (solo aparece si hay archivo histórico); la elección se conserva al cambiar de página.
+    Devuelve los agregados del archivo si se eligió "Archivo histórico", o None para usar los datos actuales.
+    """
+    if not archive_files():
+        return None
+    chosen = st.session_state.get(ARCHIVE_SOURCE_STATE_KEY, ARCHIVE_SOURCE_OPTIONS[0])
+    source = st.sidebar.radio("Fuente de datos", ARCHIVE_SOURCE_OPTIONS, index=ARCHIVE_SOURCE_OPTIONS.index(chosen),
+                              key=ARCHIVE_SOURCE_KEY)
+    st.session_state[ARCHIVE_SOURCE_STATE_KEY] = source
+    if source != "Archivo histórico":
+        return None
+
+    # Los agregados se acumulan lote a lote desde los archivos Parquet: el historial completo no se carga en memoria
+    aggregates = get_archive_aggregates()
+    if not aggregates.get('rows'):
+        st.sidebar.warning(f"No se pudo leer el archivo histórico en '{ARCHIVE_DIR}'; se usan los datos actuales.")
+        return None
+    st.sidebar.metric("Encuestas en el archivo", f"{aggregates['rows']:,}")
+    st.sidebar.caption("Promedios y distribuciones del archivo; las tablas por encuesta o comedor usan los datos actuales.")
+    return aggregates
+
+# --- FIN FUNCIONES ---
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.data_loader import get_dataset_version
+from utils.data_processing import get_comedor_column
+from utils.significance import build_score_matrix
+
+# Cambio mínimo (en puntos de la escala 1-5) entre visitas para considerar que un comedor mejoró o empeoró
+VISIT_CHANGE_THRESHOLD = 0.25
+
+# --- INICIO FUNCIONES ---
+
+def build_visit_changes(df):
+    """
+    Ordena las encuestas de cada comedor por fecha (índice ordenado por comedor y fecha) y calcula,
+    con diferencias vectorizadas entre filas consecutivas del mismo comedor, el cambio de cada
+    pregunta, categoría y promedio general de una visita a la siguiente.
+    Devuelve un dict con:
+      - 'transitions': una fila por par de visitas consecutivas (comedor, número de visita, fechas y cambios)
+      - 'latest_change': cambio de la última visita respecto de la anterior, por comedor
+      - 'total_change': cambio entre la primera y la última visita, por comedor
+      - 'visits': número de visitas por comedor
+      - 'by_visit' / 'by_visit_counts': promedio y respuestas por número de visita (1ª, 2ª, ...)
+    o un dict vacío si faltan la columna del comedor, la fecha o los puntajes.
+    """
+    matrix, _ = build_score_matrix(df)
+    comedor_col = get_comedor_column(df)
+    if matrix.empty or comedor_col is None or 'fecha' not in df.columns:
+        return {}
+
+    fechas = pd.to_datetime(df['fecha'], errors='coerce')
+    comedor_keys = df[comedor_col].astype(str).str.strip()
+    valid = (df[comedor_col].notna() & (comedor_keys != '') & fechas.notna()).to_numpy()
+    if not valid.any():
+        return {}
+
+    # Índice ordenado: por comedor y, dentro de cada comedor, por fecha (orden estable ante empates)
+    codes, names = pd.factorize(comedor_keys[valid], sort=True)
+    dates = fechas[valid].to_numpy()
+    order = np.lexsort((dates, codes))
+    codes, dates = codes[order], dates[order]
+    values = matrix.to_numpy(dtype=float)[valid][order]
+
+    visits = np.bincount(codes, minlength=len(names))
+    starts = np.cumsum(visits) - visits
+    visit_number = np.arange(len(codes)) - np.repeat(starts, visits) + 1
+
+    # Pares consecutivos dentro del mismo comedor
+    same_comedor = codes[1:] == codes[:-1]
+    changes = (values[1:] - values[:-1])[same_comedor]
+    transition_codes = codes[1:][same_comedor]
+    transitions = pd.DataFrame(changes, columns=matrix.columns)
+    transitions.insert(0, 'comedor', names[transition_codes])
+    transitions.insert(1, 'visita', visit_number[1:][same_comedor])
+    transitions.insert(2, 'fecha_anterior', dates[:-1][same_comedor])
+    transitions.insert(3, 'fecha', dates[1:][same_comedor])
+
+    # Última transición de cada comedor y cambio entre la primera y la última visita
+    repeated = visits >= 2
+    last_transition = np.flatnonzero(np.r_[transition_codes[1:] != transition_codes[:-1], True]) if len(changes) else []
+    latest_change = pd.DataFrame(changes[last_transition], index=names[transition_codes[last_transition]],
+                                 columns=matrix.columns)
+    ends = starts + visits - 1
+    total_change = pd.DataFrame(values[ends[repeated]] - values[starts[repeated]], index=names[repeated],
+                                columns=matrix.columns)
+    latest_change.index.name = total_change.index.name = comedor_col
+
+    by_visit = pd.DataFrame(values, columns=matrix.columns).groupby(visit_number, sort=True)
+    return {
+        'transitions': transitions,
+        'latest_change': latest_change,
+        'total_change': total_change,
+        'visits': pd.Series(visits, index=pd.Index(names, name=comedor_col), name='visitas'),
+        'by_visit': by_visit.mean(),
+        'by_visit_counts': by_visit.count(),
+    }
+
+
+@st.cache_data(show_spinner="Calculando cambios entre visitas...")
+def _cached_visit_changes(_df, dataset_version):
+    print("INFO: Calculando cambios entre visitas consecutivas por comedor (caché)...")
+    return build_visit_changes(_df)
+
+
+def get_visit_changes(df):
+    """Cambios entre visitas consecutivas de cada comedor, en caché por versión de datos."""
+    if df is None or df.empty:
+        return {}
+    return _cached_visit_changes(df, get_dataset_version(df))
+
+
+def summarize_changes(change_table, threshold=VISIT_CHANGE_THRESHOLD):
+    """
+    Cuenta, por pregunta o categoría, cuántos comedores mejoraron, empeoraron o se mantuvieron
+    (cambio dentro de ±threshold) según una tabla de cambios por comedor ('latest_change' o 'total_change').
+    """
+    answered = change_table.notna()
+    summary = pd.DataFrame({
+        'Mejoraron': (change_table > threshold).sum(),
+        'Empeoraron': (change_table < -threshold).sum(),
+        'Sin cambio': (answered & (change_table.abs() <= threshold)).sum(),
+        'Cambio promedio': change_table.mean(),
+        'Comedores': answered.sum(),
+    })
+    summary['Balance'] = summary['Mejoraron'] - summary['Empeoraron']
+    return summary
+
+# --- FIN FUNCIONES ---
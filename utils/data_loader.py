@@ -3,11 +3,43 @@ import pandas as pd
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials # Para gspread < 6.0
 import os
+import hashlib
+import threading
+import time
+from datetime import datetime
 import numpy as np # Necesario para pd.NA y quizás dtypes
 
+# Última copia de los datos cargados, usada para mostrar la página mientras se recargan
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data_snapshot.pkl')
+# Antigüedad (segundos) a partir de la cual se recargan los datos en segundo plano (igual al ttl de load_data)
+SNAPSHOT_MAX_AGE_SECONDS = 600
+
 # --- INICIO DE FUNCIONES DE TU data_loader.py ORIGINAL ---
 # (Con añadidos para depuración en la nube)
 
+def get_dataset_version(df):
+    """
+    Devuelve una huella (hash) del contenido del DataFrame que identifica la versión de los datos.
+    load_data la calcula una sola vez y la guarda en df.attrs; los agregados en caché la usan como clave.
+    """
+    if df is None or df.empty:
+        return "vacio"
+
+    # Reutilizar la huella calculada en load_data si corresponde a este mismo DataFrame
+    cached_version = df.attrs.get('dataset_version')
+    if cached_version and df.attrs.get('dataset_version_shape') == df.shape:
+        return cached_version
+
+    try:
+        row_hashes = pd.util.hash_pandas_object(df, index=False).values
+        hasher = hashlib.sha1(row_hashes.tobytes())
+        hasher.update('|'.join(map(str, df.columns)).encode('utf-8'))
+        return hasher.hexdigest()[:16]
+    except Exception as e_hash:
+        print(f"WARN get_dataset_version: No se pudo calcular el hash del DataFrame: {e_hash}")
+        return f"{len(df)}x{len(df.columns)}"
+
+
 def print_unique_values(df):
     """
     Imprime los valores únicos de las columnas de satisfacción (ANTES del procesamiento).
@@ -104,12 +136,15 @@ def process_satisfaction_columns(df):
     return df
 
 
-@st.cache_data(ttl=600)
-def load_data():
+def fetch_survey_data():
     """
-    Carga y preprocesa datos desde Google Sheets usando st.secrets o archivo local.
+    Carga y preprocesa datos desde Google Sheets usando st.secrets o archivo local, sin llamar a
+    elementos de Streamlit (se puede usar desde hilos de fondo). Devuelve (df, mensajes), donde
+    mensajes es una lista de (nivel, texto) con nivel 'error', 'warning', 'success' o 'info'
+    para que quien tenga una página los muestre.
     """
-    print("DEBUG: Iniciando load_data()")
+    print("DEBUG: Iniciando fetch_survey_data()")
+    messages = []
     try:
         scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
         using_secrets = False
@@ -121,25 +156,25 @@ def load_data():
                 using_secrets = True
                 print("INFO: Credenciales cargadas desde Streamlit Secrets.")
             except Exception as e_secrets:
-                st.error(f"Error al procesar credenciales desde st.secrets: {e_secrets}. Verifica el formato en la configuración de Secrets.")
+                messages.append(('error', f"Error al procesar credenciales desde st.secrets: {e_secrets}. Verifica el formato en la configuración de Secrets."))
                 print(f"ERROR FATAL: Error al procesar credenciales desde st.secrets: {e_secrets}")
-                return pd.DataFrame()
+                return pd.DataFrame(), messages
         else:
             current_dir = os.path.dirname(os.path.abspath(__file__))
             project_root = os.path.dirname(current_dir)
             credentials_path = os.path.join(project_root, 'credentials.json')
 
             if not os.path.exists(credentials_path):
-                st.error(f"Credenciales NO ENCONTRADAS: Archivo 'credentials.json' no hallado en '{credentials_path}' y 'gcp_service_account' no está en st.secrets.")
+                messages.append(('error', f"Credenciales NO ENCONTRADAS: Archivo 'credentials.json' no hallado en '{credentials_path}' y 'gcp_service_account' no está en st.secrets."))
                 print(f"ERROR FATAL: Credenciales NO ENCONTRADAS. 'credentials.json' no en '{credentials_path}' y no hay secrets.")
-                return pd.DataFrame()
+                return pd.DataFrame(), messages
             try:
                 credentials = ServiceAccountCredentials.from_json_keyfile_name(credentials_path, scope)
                 print("INFO: Credenciales cargadas desde archivo local 'credentials.json'.")
             except Exception as e_local_creds:
-                st.error(f"Error al cargar credenciales desde archivo local '{credentials_path}': {e_local_creds}")
+                messages.append(('error', f"Error al cargar credenciales desde archivo local '{credentials_path}': {e_local_creds}"))
                 print(f"ERROR FATAL: Error al cargar credenciales desde archivo local '{credentials_path}': {e_local_creds}")
-                return pd.DataFrame()
+                return pd.DataFrame(), messages
 
         # --- Acceder a Google Sheets ---
         try:
@@ -166,24 +201,23 @@ def load_data():
                 try: details_msg = f" Detalles: {e_api.response.json()}"
                 except Exception: details_msg = f" Código estado: {e_api.response.status_code if hasattr(e_api.response, 'status_code') else 'N/A'}"
             full_error = error_msg + details_msg + " Verifica permisos de cuenta de servicio y ID/nombre de hoja."
-            st.error(full_error)
+            messages.append(('error', full_error))
             print(f"ERROR_API: {full_error}")
-            return pd.DataFrame()
+            return pd.DataFrame(), messages
         except Exception as e_gspread:
-            st.error(f"Error inesperado al interactuar con Google Sheets: {e_gspread} (Tipo: {type(e_gspread).__name__})")
+            messages.append(('error', f"Error inesperado al interactuar con Google Sheets: {e_gspread} (Tipo: {type(e_gspread).__name__})"))
             print(f"ERROR_GSPREAD: {e_gspread} (Tipo: {type(e_gspread).__name__})")
-            return pd.DataFrame()
+            return pd.DataFrame(), messages
 
         # --- Procesamiento del DataFrame ---
         if df.empty:
-            st.warning("El DataFrame está vacío después de cargar desde Google Sheets.")
+            messages.append(('warning', "El DataFrame está vacío después de cargar desde Google Sheets."))
             print("WARN: El DataFrame está vacío después de cargar desde Google Sheets.")
-            return pd.DataFrame()
+            return pd.DataFrame(), messages
 
-        # Mostrar mensajes de carga de credenciales después de éxito
-        if st.runtime.exists():
-            if using_secrets: st.sidebar.success("Credenciales cargadas desde Secrets.")
-            else: st.sidebar.info("Credenciales cargadas desde archivo local.")
+        # Mensajes de carga de credenciales después de éxito
+        if using_secrets: messages.append(('success', "Credenciales cargadas desde Secrets."))
+        else: messages.append(('info', "Credenciales cargadas desde archivo local."))
 
         if 'fecha' in df.columns:
             df['fecha'] = pd.to_datetime(df['fecha'], errors='coerce')
@@ -192,6 +226,11 @@ def load_data():
 
         df = process_satisfaction_columns(df) # Procesar
 
+        # Sentimiento de los comentarios (incremental: solo se puntúan los textos nuevos).
+        # Importación local: utils.sentiment depende de este módulo
+        from utils.sentiment import add_sentiment_columns
+        df = add_sentiment_columns(df)
+
         # DESPUÉS de procesar
         print("="*50)
         print("DEBUG: ESTADO FINAL DE COLUMNAS DE SATISFACCIÓN:")
@@ -207,13 +246,37 @@ def load_data():
                 print(f"  Columna Final '{col_check}' no encontrada.")
         print("="*50)
 
-        print("DEBUG: load_data() completado.")
-        return df
+        # Huella de la versión de datos (clave de los agregados en caché)
+        df.attrs['dataset_version'] = get_dataset_version(df)
+        df.attrs['dataset_version_shape'] = df.shape
+        print(f"INFO: Versión de datos: {df.attrs['dataset_version']}")
+
+        print("DEBUG: fetch_survey_data() completado.")
+        return df, messages
 
     except Exception as e_load:
-        st.error(f"Error general inesperado en load_data: {e_load} (Tipo: {type(e_load).__name__})")
+        messages.append(('error', f"Error general inesperado al cargar los datos: {e_load} (Tipo: {type(e_load).__name__})"))
         print(f"ERROR_LOAD_GENERAL: {e_load} (Tipo: {type(e_load).__name__})")
-        return pd.DataFrame()
+        return pd.DataFrame(), messages
+
+
+@st.cache_data(ttl=600)
+def load_data():
+    """
+    Carga y preprocesa datos desde Google Sheets (fetch_survey_data) y muestra en la página
+    los errores y avisos de la carga.
+    """
+    df, messages = fetch_survey_data()
+    for level, text in messages:
+        if level == 'error':
+            st.error(text)
+        elif level == 'warning':
+            st.warning(text)
+        elif level == 'success':
+            st.sidebar.success(text)
+        else:
+            st.sidebar.info(text)
+    return df
 
 
 def get_filtered_data(df, date_range=None, comuna=None, barrio=None, nodo=None):
@@ -224,6 +287,8 @@ def get_filtered_data(df, date_range=None, comuna=None, barrio=None, nodo=None):
         return pd.DataFrame()
 
     filtered_df = df.copy()
+    # El subconjunto filtrado es otra versión de datos: no heredar la huella del original
+    filtered_df.attrs.pop('dataset_version', None)
 
     # Filtro de fecha
     if date_range and len(date_range) == 2 and 'fecha' in filtered_df.columns:
@@ -249,4 +314,142 @@ def get_filtered_data(df, date_range=None, comuna=None, barrio=None, nodo=None):
 
     return filtered_df
 
+
+@st.cache_resource(show_spinner=False)
+def _snapshot_store():
+    """
+    Copia de los datos compartida por todas las sesiones del proceso.
+    'refresh_done' se activa al terminar cada recarga (para esperar una carga en curso en vez de repetirla).
+    """
+    return {'df': None, 'loaded_at': None, 'refreshing': False, 'lock': threading.Lock(),
+            'refresh_done': threading.Event()}
+
+
+def save_data_snapshot(df):
+    """
+    Guarda df como la última copia válida de los datos (en memoria y en disco).
+    """
+    if df is None or df.empty:
+        return
+    store = _snapshot_store()
+    store['df'] = df
+    store['loaded_at'] = datetime.now()
+    # Acumulados incrementales (tendencias): solo se procesan las filas nuevas.
+    # Importación local: utils.trends depende de este módulo
+    from utils.trends import ingest_rows
+    ingest_rows(df)
+    try:
+        df.to_pickle(SNAPSHOT_PATH)
+    except Exception as e_snapshot:
+        print(f"WARN save_data_snapshot: No se pudo guardar la copia en disco: {e_snapshot}")
+
+
+def _read_disk_snapshot(store):
+    """Carga en memoria la copia guardada en disco por una ejecución anterior del servidor."""
+    if store['df'] is not None or not os.path.exists(SNAPSHOT_PATH):
+        return
+    try:
+        store['df'] = pd.read_pickle(SNAPSHOT_PATH)
+        store['loaded_at'] = datetime.fromtimestamp(os.path.getmtime(SNAPSHOT_PATH))
+        # La copia leída pasa a ser la vigente: se ingresa en los acumulados incrementales
+        from utils.trends import ingest_rows
+        ingest_rows(store['df'])
+        print(f"INFO: Copia de datos leída de disco ({len(store['df'])} registros, {store['loaded_at']:%Y-%m-%d %H:%M}).")
+    except Exception as e_snapshot:
+        print(f"WARN: No se pudo leer la copia de datos en disco: {e_snapshot}")
+
+
+def _refresh_data_snapshot(store):
+    """
+    Recarga los datos (hilo de fondo) y reemplaza la copia si la carga fue exitosa.
+    Usa fetch_survey_data: el hilo no tiene contexto de página para mostrar mensajes, solo los imprime.
+    """
+    start = time.perf_counter()
+    try:
+        df, messages = fetch_survey_data()
+        for level, text in messages:
+            if level in ('error', 'warning'):
+                print(f"{'ERROR' if level == 'error' else 'WARN'} recarga en segundo plano: {text}")
+        save_data_snapshot(df)
+        print(f"INFO: Datos recargados en segundo plano en {time.perf_counter() - start:.2f}s.")
+    except Exception as e_refresh:
+        print(f"ERROR: Falló la recarga de datos en segundo plano: {e_refresh}")
+    finally:
+        with store['lock']:
+            store['refreshing'] = False
+            store['refresh_done'].set()
+
+
+def start_data_refresh():
+    """Lanza la recarga de datos en segundo plano si no hay otra en curso (entre todas las sesiones)."""
+    store = _snapshot_store()
+    with store['lock']:
+        if store['refreshing']:
+            return
+        store['refreshing'] = True
+        store['refresh_done'].clear()
+    threading.Thread(target=_refresh_data_snapshot, args=(store,), name="data-refresh", daemon=True).start()
+
+
+def start_initial_load():
+    """
+    Si aún no hay copia de los datos (ni en memoria ni en disco), lanza su carga en segundo plano.
+    La llama el precalentamiento antes de su hilo, para que las páginas esperen esa misma carga.
+    """
+    store = _snapshot_store()
+    _read_disk_snapshot(store)
+    if store['df'] is None:
+        start_data_refresh()
+
+
+def wait_for_snapshot(store=None):
+    """
+    Devuelve la copia vigente de los datos; si no hay copia y hay una carga en curso, espera a que termine.
+    No usa elementos de Streamlit (sirve para hilos de fondo). Devuelve None si la carga falló.
+    """
+    store = store if store is not None else _snapshot_store()
+    if store['df'] is None and store['refreshing']:
+        store['refresh_done'].wait()
+    return store['df']
+
+
+def get_snapshot_status():
+    """Devuelve (fecha de la copia, recarga en curso)."""
+    store = _snapshot_store()
+    return store['loaded_at'], store['refreshing']
+
+
+def load_data_stale_while_revalidate():
+    """
+    Devuelve (df, fecha_de_los_datos, recarga_en_curso) sin bloquear cuando hay una copia previa:
+    si la copia es más antigua que SNAPSHOT_MAX_AGE_SECONDS se recarga en segundo plano y
+    mientras tanto se usa la copia. Solo la primera carga (sin copia en memoria ni en disco) bloquea.
+    """
+    store = _snapshot_store()
+    _read_disk_snapshot(store)
+
+    # Primera carga en curso (lanzada por el precalentamiento u otra sesión): se espera en vez de repetirla
+    wait_for_snapshot(store)
+    if store['df'] is None:
+        save_data_snapshot(load_data())
+        if store['df'] is None:
+            # La primera carga falló (sin copia previa): las páginas muestran su mensaje de error
+            return pd.DataFrame(), None, False
+        return store['df'], store['loaded_at'], False
+
+    age_seconds = (datetime.now() - store['loaded_at']).total_seconds()
+    if age_seconds > SNAPSHOT_MAX_AGE_SECONDS:
+        start_data_refresh()
+    return store['df'], store['loaded_at'], store['refreshing']
+
+
+def load_current_data():
+    """
+    Datos de la copia vigente (load_data_stale_while_revalidate) para las páginas: todas leen el mismo
+    DataFrame que Home y solo la primera carga del proceso espera a Google Sheets.
+    El DataFrame se comparte entre sesiones e hilos: es de solo lectura (usar .copy() para modificarlo).
+    """
+    df, _, _ = load_data_stale_while_revalidate()
+    return df
+
 # --- FIN DE FUNCIONES DE data_loader.py ---
\ No newline at end of file
@@ -1,11 +1,17 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import plotly.express as px
-from wordcloud import WordCloud
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.colors import qualitative
 import streamlit as st
-from collections import Counter
-import re
+# plotly.express y wordcloud se importan dentro de las funciones que los usan
+# para no cargarlos al abrir cada página (ver benchmarks/benchmark_imports.py)
+import contextlib
+import unicodedata
+import difflib
+from bisect import bisect_left
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from utils.data_loader import get_dataset_version
 
 # Mapeo de columnas a descripciones (Usado en varias páginas)
 COL_DESCRIPTIONS = {
@@ -43,14 +49,103 @@ CATEGORIES = {
                             "26tiempo_entrega_mercdos", "27tiempo_demora_proveedor", "28actitud_funcionario_logistico"]
 }
 
+# Descripción, icono y título de los gráficos de cada pregunta en las páginas de categoría
+QUESTION_DETAILS = {
+    '9fecha_vencimiento': {'description': COL_DESCRIPTIONS['9fecha_vencimiento'], 'icon': '📅', 'title_with_icon': '📅 Satisfacción con Fechas de Vencimiento'},
+    '10tipo_empaque': {'description': COL_DESCRIPTIONS['10tipo_empaque'], 'icon': '📦', 'title_with_icon': '📦 Satisfacción con Tipo de Empaque'},
+    '11productos_iguales_lista_mercado': {'description': COL_DESCRIPTIONS['11productos_iguales_lista_mercado'], 'icon': '📋', 'title_with_icon': '📋 Correspondencia con Lista de Mercado'},
+    '12carnes_bien_etiquetadas': {'description': 'Las carnes se encuentran bien etiquetadas (peso, fechas, tipo de corte)', 'icon': '🏷️', 'title_with_icon': '🏷️ Etiquetado de Carnes'},
+    '13producto_congelado': {'description': 'El producto se encuentra congelado al momento de recibirlo', 'icon': '🧊', 'title_with_icon': '🧊 Estado de Congelación'},
+    '14corte_recibido': {'description': 'El corte del producto recibido es el mismo que aparece en la etiqueta', 'icon': '🔪', 'title_with_icon': '🔪 Correspondencia del Corte'},
+    '15fecha_vencimiento_adecuada': {'description': 'La fecha de vencimiento es adecuada para la preparación', 'icon': '📅', 'title_with_icon': '📅 Fecha de Vencimiento Adecuada'},
+    '16empacado_al_vacio': {'description': 'El producto está empacado al vacío', 'icon': '📦', 'title_with_icon': '📦 Empacado al Vacío'},
+    '17estado_huevo': {'description': 'Estado de los huevos recibidos', 'icon': '🥚', 'title_with_icon': '🥚 Estado de los Huevos'},
+    '18panal_de_huevo_etiquetado': {'description': 'El panal de huevos se encuentra etiquetado con fecha vencimiento', 'icon': '📋', 'title_with_icon': '📋 Etiquetado del Panal de Huevos'},
+    '19frutas': {'description': 'Estado y calidad de las frutas recibidas', 'icon': '🍎', 'title_with_icon': '🍎 Calidad de las Frutas'},
+    '20verduras': {'description': 'Estado y calidad de las verduras recibidas', 'icon': '🥬', 'title_with_icon': '🥬 Calidad de las Verduras'},
+    '21hortalizas': {'description': 'Estado y calidad de las hortalizas recibidas', 'icon': '🥕', 'title_with_icon': '🥕 Calidad de las Hortalizas'},
+    '22tuberculos': {'description': 'Estado y calidad de los tubérculos recibidos', 'icon': '🥔', 'title_with_icon': '🥔 Calidad de los Tubérculos'},
+    '23ciclo_menus': {'description': 'El ciclo de menús establecido por el proyecto', 'icon': '📋', 'title_with_icon': '📋 Ciclo de Menús'},
+    '24notificacion_telefonica': {'description': 'La notificación telefónica para informar fecha y hora de entrega', 'icon': '📞', 'title_with_icon': '📞 Notificación Telefónica'},
+    '25tiempo_revision_alimentos': {'description': 'El tiempo para revisar los alimentos al recibirlos', 'icon': '⏰', 'title_with_icon': '⏰ Tiempo de Revisión'},
+    '26tiempo_entrega_mercdos': {'description': 'El tiempo entre las entregas de los mercados (10 días hábiles)', 'icon': '📅', 'title_with_icon': '📅 Frecuencia de Entregas'},
+    '27tiempo_demora_proveedor': {'description': 'El tiempo de respuesta para reposiciones o ajustes', 'icon': '🔄', 'title_with_icon': '🔄 Tiempo de Respuesta'},
+    '28actitud_funcionario_logistico': {'description': 'La actitud y disposición del funcionario logístico', 'icon': '👥', 'title_with_icon': '👥 Actitud del Personal'}
+}
+
 # Preguntas sí/no (Usado en 4_Proceso_Entrega.py)
 YES_NO_COLS = {
     "29plazos_entrega_mercados": "¿Se cumplen los plazos establecidos?",
     "30brindan_informacion_productos": "¿Brindan información sobre los productos?"
 }
 
+# Columnas de texto libre (comentarios y sugerencias)
+COMMENT_COLS = {
+    "23por_que": "¿Por qué? (comentario de satisfacción)",
+    "32aspectos_de_mejora": "Aspectos de mejora sugeridos"
+}
+
+# Orden y colores estándar de las etiquetas de satisfacción
+SATISFACTION_ORDER = [
+    "MUY INSATISFECHO/A",
+    "INSATISFECHO/A",
+    "NI SATISFECHO/A NI INSATISFECHO/A",
+    "SATISFECHO/A",
+    "MUY SATISFECHO/A"
+]
+SATISFACTION_COLOR_MAP = {
+    "MUY INSATISFECHO/A": "#D32F2F", # Rojo oscuro
+    "INSATISFECHO/A": "#FF9800",     # Naranja
+    "NI SATISFECHO/A NI INSATISFECHO/A": "#FFEB3B", # Amarillo
+    "SATISFECHO/A": "#4CAF50",     # Verde
+    "MUY SATISFECHO/A": "#1E88E5"      # Azul
+}
+
+# Plantilla de layout compartida por los gráficos de barras (se construye una sola vez)
+CHART_TEMPLATE = go.layout.Template(
+    layout=go.Layout(
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        title={'x': 0.5, 'xanchor': 'center', 'font': {'size': 16}}
+    )
+)
+
+# Niveles geográficos disponibles en la encuesta (de mayor a menor agregación)
+GEO_COLS = ['comuna', 'barrio', 'nodo', 'nicho']
+
+# Posibles nombres de la columna que identifica al comedor
+COMEDOR_COL_CANDIDATES = ['nombre_comedor', 'comedor', 'id_comedor', 'nombre del comedor']
+
+# Jerarquía geográfica para la vista de drill-down (el comedor se agrega como último nivel)
+HIERARCHY_LEVELS = ['comuna', 'barrio', 'nodo']
+
+# Nombre usado para el promedio de todas las preguntas de satisfacción
+GENERAL_CATEGORY = "General"
+
+# Umbral de insatisfacción (puntaje <= 2)
+DISSATISFACTION_THRESHOLD = 2
+
+# Método de enlace del agrupamiento jerárquico del mapa de calor por comedor
+HEATMAP_LINKAGE_METHOD = 'average'
+
+# Clave de session_state donde se guardan los resultados de las secciones de cada página
+SECTION_STATE_KEY = "_section_results"
+
+# Tamaños de página disponibles en las tablas paginadas
+TABLE_PAGE_SIZES = [10, 25, 50, 100]
+
 # --- INICIO FUNCIONES ---
 
+def page_spinner(message):
+    """
+    Spinner para los cálculos en caché que también se ejecutan desde el hilo de precalentamiento:
+    solo se muestra si hay una página en ejecución (los hilos de fondo no tienen contexto de Streamlit).
+    """
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return contextlib.nullcontext()
+    return st.spinner(message)
+
+
 def get_satisfaction_columns(df):
     """
     Identifica las columnas de satisfacción disponibles y válidas en el DataFrame.
@@ -85,34 +180,22 @@ def get_satisfaction_columns(df):
     return valid_numeric_cols
 
 
-def calculate_category_satisfaction(df, category_name):
+def calculate_category_satisfaction(df, category_name, distribution=None):
     """
-    Calcula la satisfacción promedio para una categoría específica.
-    Utiliza get_satisfaction_columns para asegurar que se usan columnas válidas.
+    Calcula la satisfacción promedio para una categoría específica
+    (promedio de los promedios de sus preguntas, tomados de get_answer_distribution).
+    distribution: distribución de respuestas ya calculada (p. ej. del archivo histórico); si se da, df no se usa.
     """
     if category_name not in CATEGORIES:
         print(f"WARN calculate_category_satisfaction: Categoría '{category_name}' no definida.")
         return None
 
-    # Obtener todas las columnas de satisfacción numéricas válidas del df ACTUAL
-    all_valid_satisfaction_cols = get_satisfaction_columns(df)
+    # Promedios por pregunta a partir de la distribución de respuestas precalculada
+    question_means = (get_answer_distribution(df) if distribution is None else distribution)['Promedio']
 
     # Filtrar las que pertenecen a la categoría solicitada
-    category_cols_in_df = [col for col in CATEGORIES[category_name] if col in all_valid_satisfaction_cols]
-
-    if not category_cols_in_df:
-        # print(f"DEBUG calculate_category_satisfaction: No hay columnas válidas para la categoría '{category_name}' en el dataframe actual.")
-        return None
-
-    # Calcular el promedio de los promedios de cada columna válida en la categoría
-    category_means = []
-    for col in category_cols_in_df:
-        # La columna ya debería ser numérica por get_satisfaction_columns, pero re-verificar por seguridad
-        numeric_data = pd.to_numeric(df[col], errors='coerce')
-        if numeric_data.notna().any():
-            col_mean = numeric_data.mean()
-            if not pd.isna(col_mean):
-                category_means.append(col_mean)
+    category_means = [question_means[col] for col in CATEGORIES[category_name]
+                      if col in question_means.index and not pd.isna(question_means[col])]
 
     if not category_means:
         # print(f"DEBUG calculate_category_satisfaction: No se pudieron calcular promedios para las columnas de '{category_name}'.")
@@ -121,13 +204,15 @@ def calculate_category_satisfaction(df, category_name):
     return sum(category_means) / len(category_means)
 
 
-def plot_satisfaction_by_category(df):
+def plot_satisfaction_by_category(df, distribution=None):
     """
     Crea un gráfico de barras con la satisfacción promedio por categoría.
+    Se construye con build_bar_chart (sin plotly.express) porque es el gráfico de la página de inicio.
+    distribution: como en calculate_category_satisfaction.
     """
     category_means_data = []
     for category in CATEGORIES:
-        mean = calculate_category_satisfaction(df, category)
+        mean = calculate_category_satisfaction(df, category, distribution)
         if mean is not None:
             category_means_data.append({
                 "Categoría": category,
@@ -136,216 +221,211 @@ def plot_satisfaction_by_category(df):
 
     if not category_means_data:
         print("INFO plot_satisfaction_by_category: No hay datos de promedios por categoría para graficar.")
-        # Podrías retornar un mensaje o una figura vacía en lugar de None
-        # return None
-        # Opcional: retornar figura con mensaje
-        fig = px.bar(title="Satisfacción Promedio por Categoría")
-        fig.update_layout(annotations=[dict(text="No hay datos suficientes", showarrow=False)])
-        return fig
+        return _empty_chart("Satisfacción Promedio por Categoría", "No hay datos suficientes")
 
 
     category_df = pd.DataFrame(category_means_data)
 
-    fig = px.bar(
+    fig = build_bar_chart(
         category_df,
-        x="Categoría",
-        y="Promedio de Satisfacción",
+        category_col="Categoría",
+        value_col="Promedio de Satisfacción",
         title="Satisfacción Promedio por Categoría",
-        color="Categoría",
-        color_discrete_sequence=px.colors.qualitative.Set2, # Puedes cambiar la paleta de colores
-        text='Promedio de Satisfacción', # Mostrar valor en las barras
+        color_map=dict(zip(category_df["Categoría"], qualitative.Set2)), # Puedes cambiar la paleta de colores
+        category_title="Categoría de Productos/Servicio",
+        value_title="Promedio (1=Muy Insatisfecho, 5=Muy Satisfecho)",
         height=450 # Ajustar altura si es necesario
     )
 
-    fig.update_traces(texttemplate='%{text:.2f}', textposition='outside') # Formato del texto
+    fig.update_traces(texttemplate='%{text:.2f}') # Formato del texto
     fig.update_layout(
         yaxis_range=[1, 5], # Asegurar rango de 1 a 5
-        yaxis_title="Promedio (1=Muy Insatisfecho, 5=Muy Satisfecho)",
-        xaxis_title="Categoría de Productos/Servicio",
         uniformtext_minsize=8, uniformtext_mode='hide' # Para manejar texto en barras pequeñas
     )
     return fig
 
 
-def plot_question_satisfaction(df, question_col, question_text):
+def build_bar_chart(data, category_col, value_col, title, orientation='v', category_order=None,
+                    color_map=None, category_title=None, value_title=None, height=400):
     """
-    Crea un gráfico de barras para la distribución de respuestas a una pregunta específica.
-    Usa la columna '_label' creada por process_satisfaction_columns.
+    Construye un gráfico de barras directamente en su orientación final ('v' o 'h'),
+    con una traza por categoría (para conservar colores y leyenda) y el layout de CHART_TEMPLATE.
     """
-    label_col = question_col + '_label'
-
-    if label_col not in df.columns:
-        print(f"ERROR plot_question_satisfaction: Columna de etiquetas '{label_col}' no encontrada para la pregunta '{question_col}'.")
-        # Intentar usar la columna original si _label no existe
-        if question_col in df.columns:
-             print(f"WARN plot_question_satisfaction: Usando columna original '{question_col}' porque '{label_col}' no existe.")
-             col_to_use = question_col
+    horizontal = orientation == 'h'
+    color_map = color_map or {}
+    categories = list(data[category_col])
+    values = list(data[value_col])
+
+    traces = []
+    for category, value in zip(categories, values):
+        bar_kwargs = dict(
+            name=str(category),
+            orientation=orientation,
+            text=[value],
+            textposition='outside',
+            marker_color=color_map.get(category),
+            legendgroup=str(category)
+        )
+        if horizontal:
+            bar_kwargs.update(x=[value], y=[category])
         else:
-             print(f"ERROR plot_question_satisfaction: Ni '{label_col}' ni '{question_col}' encontradas.")
-             # Opcional: retornar figura con mensaje
-             fig = px.bar(title=f"Distribución de Respuestas: {question_text}")
-             fig.update_layout(annotations=[dict(text="Columna no encontrada", showarrow=False)])
-             return fig
-    elif df[label_col].isna().all():
-        print(f"INFO plot_question_satisfaction: Columna de etiquetas '{label_col}' solo contiene NaNs para '{question_col}'.")
-        # Opcional: retornar figura con mensaje
-        fig = px.bar(title=f"Distribución de Respuestas: {question_text}")
-        fig.update_layout(annotations=[dict(text="No hay datos válidos", showarrow=False)])
-        return fig
-    else:
-        col_to_use = label_col
+            bar_kwargs.update(x=[category], y=[value])
+        traces.append(go.Bar(**bar_kwargs))
+
+    category_axis = {'title': {'text': category_title}}
+    if horizontal:
+        category_axis['categoryorder'] = 'total ascending'  # Ordenar por valores
+    elif category_order:
+        category_axis.update(categoryorder='array', categoryarray=category_order)
+    value_axis = {'title': {'text': value_title}}
+
+    layout = go.Layout(
+        template=CHART_TEMPLATE,
+        title={'text': title},
+        height=height,
+        xaxis=value_axis if horizontal else category_axis,
+        yaxis=category_axis if horizontal else value_axis
+    )
+    return go.Figure(data=traces, layout=layout)
 
-    # Contar frecuencias de las respuestas/etiquetas válidas
-    count_df = df[col_to_use].dropna().value_counts().reset_index()
-    count_df.columns = ['Respuesta', 'Conteo']
 
+def _empty_chart(title, message):
+    """Figura vacía con un mensaje (cuando no hay datos que graficar)."""
+    fig = go.Figure(layout=go.Layout(template=CHART_TEMPLATE, title={'text': title}))
+    fig.update_layout(annotations=[dict(text=message, showarrow=False)])
+    return fig
 
-    if count_df.empty:
-        print(f"INFO plot_question_satisfaction: No hay datos válidos (no-NaN) para graficar en la columna '{col_to_use}' para '{question_col}'.")
-        # Opcional: retornar figura con mensaje
-        fig = px.bar(title=f"Distribución de Respuestas: {question_text}")
-        fig.update_layout(annotations=[dict(text="No hay datos válidos", showarrow=False)])
-        return fig
-
-    # Ordenar por nivel de satisfacción (usando las etiquetas estándar)
-    satisfaction_order = [
-        "MUY INSATISFECHO/A",
-        "INSATISFECHO/A",
-        "NI SATISFECHO/A NI INSATISFECHO/A",
-        "SATISFECHO/A",
-        "MUY SATISFECHO/A"
-    ]
-    # Convertir la columna 'Respuesta' a categórica con el orden deseado
-    # Solo incluir categorías que realmente existen en los datos para evitar errores
-    existing_categories = [cat for cat in satisfaction_order if cat in count_df['Respuesta'].unique()]
 
-    if existing_categories:
-         count_df['Respuesta'] = pd.Categorical(count_df['Respuesta'], categories=existing_categories, ordered=True)
-         count_df = count_df.sort_values('Respuesta')
-    # else: si las respuestas no coinciden (p.ej., eran números), no se ordena por satisfacción textual.
+def build_heatmap(matrix, title, colorscale='RdBu', zmin=-1, zmax=1, colorbar_title=None,
+                  height=600, text_format='.2f', show_text=True):
+    """
+    Construye un mapa de calor (go.Heatmap) de un DataFrame: filas en el eje y, columnas en el eje x,
+    en el orden del DataFrame (la primera fila queda arriba). Las celdas NaN quedan en blanco.
+    """
+    if matrix is None or matrix.empty:
+        return _empty_chart(title, "No hay datos suficientes")
+    heatmap_kwargs = dict(
+        z=matrix.to_numpy(dtype=float),
+        x=[str(col) for col in matrix.columns],
+        y=[str(row) for row in matrix.index],
+        colorscale=colorscale,
+        zmin=zmin,
+        zmax=zmax,
+        colorbar={'title': {'text': colorbar_title}},
+        hoverongaps=False
+    )
+    if show_text:
+        heatmap_kwargs.update(texttemplate=f"%{{z:{text_format}}}", textfont={'size': 9})
+    layout = go.Layout(
+        template=CHART_TEMPLATE,
+        title={'text': title},
+        height=height,
+        yaxis={'autorange': 'reversed'},
+        xaxis={'tickangle': -45}
+    )
+    return go.Figure(data=[go.Heatmap(**heatmap_kwargs)], layout=layout)
 
-    # Crear gráfico de barras
-    # Definir un mapeo de colores para las categorías de satisfacción
-    color_map = {
-        "MUY INSATISFECHO/A": "#D32F2F", # Rojo oscuro
-        "INSATISFECHO/A": "#FF9800",     # Naranja
-        "NI SATISFECHO/A NI INSATISFECHO/A": "#FFEB3B", # Amarillo
-        "SATISFECHO/A": "#4CAF50",     # Verde
-        "MUY SATISFECHO/A": "#1E88E5"      # Azul
-        # Añade otros colores si tienes otras respuestas posibles
-    }
 
-    fig = px.bar(
-        count_df,
-        x='Respuesta',
-        y='Conteo',
-        title=f"Distribución: {question_text}", # Título más corto
-        color='Respuesta',
-        color_discrete_map=color_map, # Aplicar el mapeo de colores
-        text='Conteo' # Mostrar conteo en las barras
-    )
+def plot_question_satisfaction(df, question_col, question_text, orientation='v', title=None, distribution=None):
+    """
+    Crea un gráfico de barras para la distribución de respuestas a una pregunta específica.
+    Usa la columna '_label' creada por process_satisfaction_columns.
+    orientation='h' construye directamente la versión horizontal usada en las páginas;
+    title reemplaza el título por defecto (p. ej. un título con icono);
+    distribution: distribución de respuestas ya calculada (p. ej. del archivo histórico) en lugar de la de df.
+    """
+    label_col = question_col + '_label'
+    chart_title = title or f"Distribución: {question_text}" # Título más corto
+
+    # Conteos precalculados (una sola pasada para todas las preguntas, por versión de datos)
+    answer_distribution = get_answer_distribution(df) if distribution is None else distribution
+
+    if question_col in answer_distribution.index:
+        counts = answer_distribution.loc[question_col, SATISFACTION_ORDER]
+        counts = counts[counts > 0]  # Ya vienen en el orden estándar de satisfacción
+        count_df = pd.DataFrame({'Respuesta': counts.index, 'Conteo': counts.values})
+    elif label_col not in df.columns and question_col not in df.columns:
+        print(f"ERROR plot_question_satisfaction: Ni '{label_col}' ni '{question_col}' encontradas.")
+        return _empty_chart(title or f"Distribución de Respuestas: {question_text}", "Columna no encontrada")
+    elif label_col in df.columns and df[label_col].isna().all():
+        print(f"INFO plot_question_satisfaction: Columna de etiquetas '{label_col}' solo contiene NaNs para '{question_col}'.")
+        return _empty_chart(title or f"Distribución de Respuestas: {question_text}", "No hay datos válidos")
+    else:
+        # Columna no numérica (no convertida en data_loader): contar las respuestas tal como vienen
+        col_to_use = label_col if label_col in df.columns else question_col
+        print(f"WARN plot_question_satisfaction: '{question_col}' no es numérica; contando valores de '{col_to_use}'.")
+        count_df = df[col_to_use].dropna().value_counts().reset_index()
+        count_df.columns = ['Respuesta', 'Conteo']
 
-    fig.update_layout(
-        xaxis_title="Nivel de Satisfacción",
-        yaxis_title="Cantidad de Respuestas",
-        xaxis={'categoryorder':'array', 'categoryarray':satisfaction_order}, # Asegurar orden en el eje X
-        height=400 # Ajustar altura
+    if count_df.empty:
+        print(f"INFO plot_question_satisfaction: No hay datos válidos (no-NaN) para graficar para '{question_col}'.")
+        return _empty_chart(title or f"Distribución de Respuestas: {question_text}", "No hay datos válidos")
+
+    if orientation == 'h':
+        return build_bar_chart(
+            count_df, 'Respuesta', 'Conteo', chart_title,
+            orientation='h',
+            color_map=SATISFACTION_COLOR_MAP,
+            category_title="Categorías de Respuesta",
+            value_title="Número de Respuestas"
+        )
+
+    return build_bar_chart(
+        count_df, 'Respuesta', 'Conteo', chart_title,
+        orientation='v',
+        category_order=SATISFACTION_ORDER, # Asegurar orden en el eje X
+        color_map=SATISFACTION_COLOR_MAP,
+        category_title="Nivel de Satisfacción",
+        value_title="Cantidad de Respuestas"
     )
-    fig.update_traces(textposition='outside')
-
-    return fig
 
 
-def create_wordcloud(df, comment_col):
+def create_wordcloud(df, comment_col, filter_col=None, filter_value=None):
     """
     Crea una nube de palabras a partir de los comentarios de una columna.
+    Devuelve (imagen PNG en bytes, 15 términos más frecuentes) o (None, mensaje de error).
+    La tokenización y la imagen se guardan en caché por versión de datos (utils.text_analysis).
     """
+    from utils.text_analysis import get_term_frequencies, get_wordcloud_png
+
     if comment_col not in df.columns:
         return None, f"La columna '{comment_col}' no está disponible."
 
-    # Concatenar comentarios, asegurando que sean strings y no nulos/vacíos
-    comments = df[comment_col].dropna().astype(str)
-    all_comments_text = ' '.join(comments[comments.str.strip() != ''])
+    try:
+        frequencies = get_term_frequencies(df, comment_col, filter_col, filter_value)
+        if frequencies.empty:
+            return None, "No hay comentarios disponibles para analizar."
 
-    if not all_comments_text:
-        return None, "No hay comentarios disponibles para analizar."
+        wordcloud_png = get_wordcloud_png(df, comment_col, filter_col, filter_value)
+        frequent_terms = list(frequencies.head(15).items()) # Obtener las 15 más comunes
 
-    try:
-        wordcloud_generator = WordCloud(
-            width=800,
-            height=400,
-            background_color='white',
-            colormap='viridis', # Puedes probar otras paletas: 'plasma', 'inferno', 'magma', 'cividis'
-            max_words=100,
-            contour_width=1,
-            contour_color='steelblue',
-            stopwords=None # Usaremos nuestro propio filtro después
-        ).generate(all_comments_text)
-
-        # Crear figura de matplotlib para mostrar la nube
-        fig, ax = plt.subplots(figsize=(10, 5))
-        ax.imshow(wordcloud_generator, interpolation='bilinear')
-        ax.axis('off')
-        plt.tight_layout(pad=0) # Ajustar layout
-
-        # Obtener términos más frecuentes (filtrando stopwords comunes en español)
-        words = re.findall(r'\b\w+\b', all_comments_text.lower())
-        stopwords_es = [
-            'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'y', 'o', 'u', 'de', 'del', 'a', 'al', 'en',
-            'con', 'por', 'para', 'se', 'su', 'sus', 'lo', 'que', 'como', 'pero', 'mas', 'más', 'mi', 'si', 'sin',
-            'sobre', 'este', 'esta', 'esto', 'estos', 'estas', 'es', 'son', 'fue', 'fueron', 'ser', 'soy', 'eres',
-            'somos', 'sois', 'sido', 'sea', 'sean', 'siendo', 'no', 'ni', 'muy', 'mucho', 'poco', 'todo', 'nada',
-            'algo', 'alguien', 'nadie', 'donde', 'quien', 'cual', 'cuyo', 'cuya', 'cuyos', 'cuyas', 'le', 'les',
-            'me', 'te', 'nos', 'os', 'ya', 'ha', 'han', 'he', 'has', 'hemos', 'habeis', 'haya', 'hayan', 'hay',
-            'pero', 'sino', 'tambien', 'también', 'porque', 'pues', 'cuando', 'mientras', 'aunque', 'siempre',
-            'nunca', 'tal', 'vez', 'asi', 'así', 'bien', 'mal', 'desde', 'hasta', 'entre', 'contra', 'hacia',
-            'ante', 'bajo', 'cabe', 'con', 'de', 'en', 'por', 'segun', 'sin', 'so', 'tras', 'durante', 'mediante',
-            'versus', 'vía', 'yo', 'tu', 'el', 'ella', 'ello', 'nosotros', 'nosotras', 'vosotros', 'vosotras',
-            'ellos', 'ellas', 'usted', 'ustedes', 'bueno', 'buena', 'productos', 'mercado', 'gracias', 'calidad',
-            'entrega', 'recibido', 'atencion', 'gracias', 'servicio', 'grano', 'frijol', 'lenteja', 'arroz' # Añadir palabras comunes específicas del contexto
-        ]
-        word_counts = Counter(w for w in words if w not in stopwords_es and len(w) > 2) # Palabras > 2 letras
-        frequent_terms = word_counts.most_common(15) # Obtener las 15 más comunes
-
-        return fig, frequent_terms
+        return wordcloud_png, frequent_terms
 
     except Exception as e_wc:
         print(f"ERROR create_wordcloud: {e_wc}")
         return None, f"Error al generar nube de palabras: {e_wc}"
 
 
-def plot_geographic_satisfaction(df, region_col):
+def plot_geographic_satisfaction(df, region_col, geo_aggregates=None):
     """
     Crea un gráfico de barras para la satisfacción promedio por región geográfica.
+    geo_aggregates: agregados con el formato de build_geographic_aggregates (p. ej. del archivo
+    histórico); por defecto, los de df.
     """
-    if region_col not in df.columns:
+    import plotly.express as px
+
+    if geo_aggregates is None and region_col not in df.columns:
         print(f"ERROR plot_geographic_satisfaction: Columna de región '{region_col}' no encontrada.")
         return None
 
-    # Obtener columnas de satisfacción ya procesadas a numéricas
-    satisfaction_cols = get_satisfaction_columns(df)
-    if not satisfaction_cols:
+    # Consultar los agregados geográficos precalculados (no modifica el DataFrame de entrada)
+    if geo_aggregates is None:
+        geo_aggregates = get_geographic_aggregates(df)
+    region_stats = geo_aggregates.get((region_col, GENERAL_CATEGORY))
+    if region_stats is None:
         print("INFO plot_geographic_satisfaction: No hay columnas de satisfacción válidas.")
         return None
-
-    # Asegurar que las columnas de satisfacción sean numéricas (por si acaso)
-    for col in satisfaction_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
-    # Calcular el promedio de satisfacción para cada fila (encuesta)
-    # Usar skipna=True es importante
-    df['satisfaccion_promedio_fila'] = df[satisfaction_cols].mean(axis=1, skipna=True)
-
-    # Verificar si se pudo calcular algún promedio por fila
-    if df['satisfaccion_promedio_fila'].isna().all():
-         print(f"INFO plot_geographic_satisfaction: No se pudo calcular 'satisfaccion_promedio_fila' para ninguna fila (quizás todas las columnas de satisfacción son NaN).")
-         return None
-
-    # Agrupar por la columna de región y calcular la media y el conteo
-    # Asegurarse de tratar la columna de región como string para agrupar correctamente
-    region_col_str = df[region_col].astype(str)
-    region_stats = df.groupby(region_col_str)['satisfaccion_promedio_fila'].agg(['mean', 'count']).reset_index()
-    region_stats.columns = [region_col, 'Satisfacción Promedio', 'Conteo']
+    region_stats = region_stats.rename(columns={'Cantidad de Encuestas': 'Conteo'})
 
     # Filtrar regiones con conteo muy bajo si se desea (opcional)
     # min_count = 3
@@ -388,6 +468,8 @@ def plot_yes_no_questions(df):
     """
     Crea un gráfico de barras agrupadas para las preguntas de Sí/No.
     """
+    import plotly.express as px
+
     valid_cols = {k: v for k, v in YES_NO_COLS.items() if k in df.columns}
     if not valid_cols:
         print("INFO plot_yes_no_questions: No se encontraron columnas Sí/No válidas.")
@@ -443,6 +525,8 @@ def plot_complexity_analysis(df):
     """
     Crea un gráfico circular para la percepción de complejidad del proceso.
     """
+    import plotly.express as px
+
     complexity_col = '31pasos_recepcion_mercado'
     if complexity_col not in df.columns:
          print(f"INFO plot_complexity_analysis: Columna '{complexity_col}' no encontrada.")
@@ -483,21 +567,14 @@ def plot_complexity_analysis(df):
     return fig
 
 
-def identify_problem_areas(df):
+def identify_problem_areas(df, distribution=None):
     """
     Identifica las áreas (preguntas de satisfacción) con menor satisfacción promedio.
+    distribution: como en calculate_category_satisfaction.
     """
-    satisfaction_cols = get_satisfaction_columns(df)
-    if not satisfaction_cols:
-        return pd.DataFrame() # Retornar df vacío si no hay columnas
-
-    # Calcular promedio para cada columna válida
-    col_means = {}
-    for col in satisfaction_cols:
-        # Asegurar que la columna es numérica antes de calcular la media
-        numeric_data = pd.to_numeric(df[col], errors='coerce')
-        if numeric_data.notna().any():
-             col_means[col] = numeric_data.mean()
+    # Promedios por pregunta a partir de la distribución de respuestas precalculada
+    answer_distribution = get_answer_distribution(df) if distribution is None else distribution
+    col_means = answer_distribution['Promedio'].dropna().to_dict() if not answer_distribution.empty else {}
 
     if not col_means:
          return pd.DataFrame() # Retornar df vacío si no se calcularon medias
@@ -514,78 +591,781 @@ def identify_problem_areas(df):
     return problem_df[['Aspecto', 'Satisfacción Media']].head(5)
 
 
-def plot_satisfaction_trend(df):
+def plot_satisfaction_trend(df, frequency_label='Mes', columns=None, title=None, trend=None):
     """
-    Crea un gráfico de líneas para la tendencia de satisfacción promedio por mes y categoría.
+    Crea un gráfico de líneas de la satisfacción promedio por periodo ('Semana', 'Mes' o 'Trimestre').
+    columns: preguntas, categorías o GENERAL_CATEGORY a graficar (por defecto, las categorías).
+    Los promedios salen del rollup diario incremental de utils.trends; df no se modifica.
+    trend: (promedios, conteos) ya calculados (p. ej. del archivo histórico); si se da, df no se usa.
     """
-    if 'fecha' not in df.columns:
+    from utils.trends import get_trend
+
+    chart_title = title or f"Tendencia de Satisfacción Promedio por {frequency_label}"
+    if trend is None and 'fecha' not in df.columns:
         print("WARN plot_satisfaction_trend: Columna 'fecha' no encontrada.")
         return None
 
-    # Asegurar que la fecha esté en formato datetime y eliminar NaNs
-    df['fecha'] = pd.to_datetime(df['fecha'], errors='coerce')
-    df_trend = df.dropna(subset=['fecha']).copy()
+    means, counts = trend if trend is not None else get_trend(df, frequency_label)
+    columns = [col for col in (columns or list(CATEGORIES)) if col in means.columns]
+    if means.empty or not columns:
+        print("INFO plot_satisfaction_trend: No hay datos con fechas y puntajes válidos.")
+        return None
+
+    periods = [str(period) for period in means.index]
+    traces = []
+    for col in columns:
+        traces.append(go.Scatter(
+            x=periods,
+            y=means[col].round(2),
+            customdata=counts[col].astype(int),
+            name=COL_DESCRIPTIONS.get(col, col),
+            mode='lines+markers',
+            line={'shape': 'spline'},
+            connectgaps=True,
+            hovertemplate="%{x}: %{y:.2f} (n = %{customdata})"
+        ))
+
+    layout = go.Layout(
+        template=CHART_TEMPLATE,
+        title={'text': chart_title},
+        height=500,
+        xaxis={'title': {'text': frequency_label}, 'type': 'category'},
+        yaxis={'title': {'text': "Promedio (1=Muy Insatisfecho, 5=Muy Satisfecho)"}, 'range': [1, 5]}
+    )
+    return go.Figure(data=traces, layout=layout)
+
+
+def plot_visit_change_summary(summary, title="Comedores que mejoraron o empeoraron"):
+    """
+    Barras horizontales apiladas con cuántos comedores mejoraron, se mantuvieron o empeoraron en cada
+    pregunta o categoría (tabla de utils.cohorts.summarize_changes, indexada por columna).
+    """
+    labels = [COL_DESCRIPTIONS.get(col, col) for col in summary.index]
+    outcomes = [('Empeoraron', SATISFACTION_COLOR_MAP["MUY INSATISFECHO/A"]),
+                ('Sin cambio', '#BDBDBD'),
+                ('Mejoraron', SATISFACTION_COLOR_MAP["SATISFECHO/A"])]
+    traces = [go.Bar(x=summary[outcome], y=labels, name=outcome, orientation='h', marker_color=color,
+                     text=summary[outcome], textposition='inside')
+              for outcome, color in outcomes]
+    layout = go.Layout(
+        template=CHART_TEMPLATE,
+        title={'text': title},
+        barmode='stack',
+        height=max(350, 32 * len(labels) + 150),
+        xaxis={'title': {'text': "Comedores"}},
+        yaxis={'autorange': 'reversed'}
+    )
+    return go.Figure(data=traces, layout=layout)
+
+
+def plot_scores_by_visit(by_visit, by_visit_counts, columns, max_visits=None):
+    """
+    Líneas del puntaje promedio según el número de visita del comedor (1ª, 2ª, ...), para ver si la
+    satisfacción sube o baja a medida que se repiten las entregas. max_visits recorta la cola con pocos comedores.
+    """
+    if max_visits is not None:
+        by_visit, by_visit_counts = by_visit.loc[:max_visits], by_visit_counts.loc[:max_visits]
+    traces = [go.Scatter(
+        x=by_visit.index,
+        y=by_visit[col].round(2),
+        customdata=by_visit_counts[col],
+        name=COL_DESCRIPTIONS.get(col, col),
+        mode='lines+markers',
+        hovertemplate="Visita %{x}: %{y:.2f} (n = %{customdata})"
+    ) for col in columns if col in by_visit.columns]
+    layout = go.Layout(
+        template=CHART_TEMPLATE,
+        title={'text': "Satisfacción promedio por número de visita"},
+        height=450,
+        xaxis={'title': {'text': "Número de visita"}, 'dtick': 1},
+        yaxis={'title': {'text': "Promedio (1=Muy Insatisfecho, 5=Muy Satisfecho)"}, 'range': [1, 5]}
+    )
+    return go.Figure(data=traces, layout=layout)
+
+
+def get_comedor_column(df):
+    """
+    Devuelve el nombre de la columna que identifica al comedor, o None si no existe.
+    """
+    return next((col for col in COMEDOR_COL_CANDIDATES if col in df.columns), None)
+
+
+def build_comedor_scorecard(df):
+    """
+    Construye la tabla resumen (scorecard) por comedor, indexada por el nombre del comedor.
+    Incluye número de encuestas, promedio por pregunta y por categoría, conteos de
+    insatisfacción (puntaje <= 2), primera y última fecha y ubicación geográfica.
+    """
+    id_comedor_col = get_comedor_column(df)
+    if id_comedor_col is None:
+        print("INFO build_comedor_scorecard: No se encontró columna de identificación del comedor.")
+        return pd.DataFrame()
+
+    # Claves del comedor normalizadas; las filas sin comedor no se agrupan
+    comedor_keys = df[id_comedor_col].where(df[id_comedor_col].notna()).astype(str).str.strip()
+    comedor_keys = comedor_keys.where(df[id_comedor_col].notna() & (comedor_keys != ''))
+    comedor_keys.name = id_comedor_col
+
+    satisfaction_cols = get_satisfaction_columns(df)
+    scores = df[satisfaction_cols].apply(pd.to_numeric, errors='coerce')
+    grouped_scores = scores.groupby(comedor_keys, sort=True)
+
+    scorecard = grouped_scores.size().to_frame('encuestas')
+
+    # Promedio por pregunta y por categoría (promedio de los promedios, como calculate_category_satisfaction)
+    question_means = grouped_scores.mean()
+    scorecard = scorecard.join(question_means)
+    for category, category_cols in CATEGORIES.items():
+        valid_category_cols = [col for col in category_cols if col in question_means.columns]
+        if valid_category_cols:
+            scorecard[category] = question_means[valid_category_cols].mean(axis=1)
+    if satisfaction_cols:
+        scorecard['satisfaccion_general'] = question_means.mean(axis=1)
+
+    # Conteos de insatisfacción por pregunta, por categoría y totales
+    dissatisfied = scores <= DISSATISFACTION_THRESHOLD
+    grouped_dissatisfied = dissatisfied.groupby(comedor_keys, sort=True)
+    scorecard = scorecard.join(grouped_dissatisfied.sum().add_suffix('_insatisfecho'))
+    scorecard['total_insatisfacciones'] = grouped_dissatisfied.sum().sum(axis=1)
+    scorecard['encuestas_con_insatisfaccion'] = dissatisfied.any(axis=1).groupby(comedor_keys, sort=True).sum()
+    for category, category_cols in CATEGORIES.items():
+        valid_category_cols = [col for col in category_cols if col in dissatisfied.columns]
+        if valid_category_cols:
+            category_mask = dissatisfied[valid_category_cols].any(axis=1)
+            scorecard[f'{category}_encuestas_insatisfechas'] = category_mask.groupby(comedor_keys, sort=True).sum()
+
+    # Rango de fechas de las encuestas del comedor
+    if 'fecha' in df.columns:
+        fechas = pd.to_datetime(df['fecha'], errors='coerce').groupby(comedor_keys, sort=True)
+        scorecard['primera_fecha'] = fechas.min()
+        scorecard['ultima_fecha'] = fechas.max()
+
+    # Ubicación geográfica (primer valor no nulo registrado para el comedor)
+    geo_cols = [col for col in GEO_COLS if col in df.columns]
+    if geo_cols:
+        scorecard = scorecard.join(df[geo_cols].groupby(comedor_keys, sort=True).first())
+
+    return scorecard
+
+
+@st.cache_data(show_spinner=False)
+def _cached_comedor_scorecard(_df, dataset_version):
+    print(f"INFO: Construyendo scorecard por comedor (versión {dataset_version})")
+    return build_comedor_scorecard(_df)
+
+
+def get_comedor_scorecard(df):
+    """
+    Devuelve el scorecard por comedor, materializado una sola vez por versión de datos.
+    """
+    if df is None or df.empty:
+        return pd.DataFrame()
+    return _cached_comedor_scorecard(df, get_dataset_version(df))
+
+
+def _cluster_leaf_order(values):
+    """
+    Orden de las filas según un agrupamiento jerárquico (scipy, enlace promedio, distancia euclidiana):
+    filas con perfiles parecidos quedan contiguas. Los NaN se reemplazan por el promedio de la columna.
+    """
+    from scipy.cluster import hierarchy
+
+    if len(values) < 3:
+        return np.arange(len(values))
+    column_means = np.nanmean(values, axis=0)
+    filled = np.where(np.isnan(values), np.nan_to_num(column_means, nan=0.0), values)
+    return hierarchy.leaves_list(hierarchy.linkage(filled, method=HEATMAP_LINKAGE_METHOD, metric='euclidean'))
+
+
+def build_comedor_heatmap(df):
+    """
+    Matriz comedor x pregunta (puntaje promedio, tomada del scorecard) con filas y columnas
+    ordenadas por agrupamiento jerárquico, para el mapa de calor por comedor.
+    Devuelve un dict con 'matrix' (DataFrame ordenado) y 'geo' (ubicación de cada comedor, mismo orden).
+    """
+    scorecard = get_comedor_scorecard(df)
+    question_cols = [col for col in get_satisfaction_columns(df) if col in scorecard.columns]
+    if scorecard.empty or not question_cols:
+        return {'matrix': pd.DataFrame(), 'geo': pd.DataFrame()}
+
+    matrix = scorecard[question_cols]
+    matrix = matrix[matrix.notna().any(axis=1)]
+    values = matrix.to_numpy(dtype=float)
+    row_order = _cluster_leaf_order(values)
+    column_order = _cluster_leaf_order(values.T)
+    ordered = matrix.iloc[row_order, column_order]
+
+    geo_cols = [col for col in GEO_COLS if col in scorecard.columns]
+    return {'matrix': ordered, 'geo': scorecard.loc[ordered.index, geo_cols + ['satisfaccion_general']]}
+
 
-    if df_trend.empty:
-        print("INFO plot_satisfaction_trend: No hay datos con fechas válidas.")
+@st.cache_data(show_spinner=False)
+def _cached_comedor_heatmap(_df, dataset_version):
+    print(f"INFO: Calculando orden jerárquico del mapa de calor por comedor (versión {dataset_version})")
+    return build_comedor_heatmap(_df)
+
+
+def get_comedor_heatmap(df):
+    """
+    Matriz comedor x pregunta ordenada por agrupamiento jerárquico, calculada una vez por versión de datos.
+    Los filtros de la página seleccionan filas de esta matriz sin recalcular el agrupamiento.
+    """
+    if df is None or df.empty:
+        return {'matrix': pd.DataFrame(), 'geo': pd.DataFrame()}
+    with page_spinner("Ordenando comedores por similitud..."):
+        return _cached_comedor_heatmap(df, get_dataset_version(df))
+
+
+def comedor_dissatisfaction_table(scorecard, question_descriptions):
+    """
+    Arma la tabla de comedores con insatisfacción a partir del scorecard.
+    question_descriptions: dict {columna_pregunta: descripción a mostrar}.
+    """
+    count_cols = {f'{col}_insatisfecho': description for col, description in question_descriptions.items()
+                  if f'{col}_insatisfecho' in scorecard.columns}
+    if not count_cols:
+        return pd.DataFrame()
+
+    resultado_df = scorecard[list(count_cols)].rename(columns=count_cols)
+    # Solo aspectos y comedores con al menos un reporte de insatisfacción
+    resultado_df = resultado_df.loc[:, resultado_df.sum() > 0]
+    resultado_df['📊 Total Insatisfacciones'] = resultado_df.sum(axis=1)
+    resultado_df = resultado_df[resultado_df['📊 Total Insatisfacciones'] > 0]
+    return resultado_df.sort_values('📊 Total Insatisfacciones', ascending=False)
+
+
+def normalize_text(text):
+    """
+    Normaliza un texto para búsquedas: minúsculas, sin tildes y con espacios simples.
+    """
+    if text is None or (not isinstance(text, str) and pd.isna(text)):
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(text).lower())
+    without_accents = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(without_accents.split())
+
+
+def build_comedor_index(df):
+    """
+    Construye el índice de búsqueda de comedores:
+    - 'names' / 'display': nombres normalizados (ordenados) y, para cada uno, la lista de formas originales
+      (variantes como "Comedor Ñandú" y "comedor nandu" comparten el nombre normalizado pero no sus encuestas).
+    - 'tokens': pares (palabra, posición en names) ordenados, para búsqueda por prefijo de palabra.
+    - 'rows': posiciones de fila (iloc) de las encuestas de cada comedor, para carga diferida.
+    """
+    id_comedor_col = get_comedor_column(df)
+    if id_comedor_col is None:
+        return {'names': [], 'display': [], 'tokens': [], 'rows': {}}
+
+    comedor_keys = df[id_comedor_col].where(df[id_comedor_col].notna()).astype(str).str.strip()
+    comedor_keys = comedor_keys.where(df[id_comedor_col].notna() & (comedor_keys != ''))
+    # groupby(...).indices devuelve directamente las posiciones de fila de cada grupo
+    row_positions = pd.Series(np.arange(len(df))).groupby(comedor_keys.values).indices
+
+    display_by_normalized = {}
+    for name in row_positions:
+        display_by_normalized.setdefault(normalize_text(name), []).append(name)
+    names = sorted(display_by_normalized)
+    display = [display_by_normalized[name] for name in names]
+    tokens = sorted((token, i) for i, name in enumerate(names) for token in name.split())
+
+    return {'names': names, 'display': display, 'tokens': tokens, 'rows': dict(row_positions)}
+
+
+@st.cache_data(show_spinner=False)
+def _cached_comedor_index(_df, dataset_version):
+    print(f"INFO: Construyendo índice de búsqueda de comedores (versión {dataset_version})")
+    return build_comedor_index(_df)
+
+
+def get_comedor_index(df):
+    """
+    Devuelve el índice de búsqueda de comedores, construido una sola vez por versión de datos.
+    """
+    if df is None or df.empty:
+        return build_comedor_index(pd.DataFrame())
+    return _cached_comedor_index(df, get_dataset_version(df))
+
+
+def search_comedores(index, query, limit=20):
+    """
+    Busca comedores por prefijo del nombre, por prefijo de cualquiera de sus palabras y,
+    si no hay suficientes coincidencias, por similitud aproximada (difflib).
+    Devuelve los nombres originales (todas las variantes de cada nombre encontrado) en orden de relevancia.
+    """
+    names = index['names']
+    normalized_query = normalize_text(query)
+    if not normalized_query:
+        return [display for variants in index['display'][:limit] for display in variants][:limit]
+
+    matches = []
+    seen = set()
+
+    def add_match(position):
+        if position not in seen:
+            seen.add(position)
+            matches.append(position)
+
+    # 1. Prefijo del nombre completo (búsqueda binaria sobre la lista ordenada)
+    position = bisect_left(names, normalized_query)
+    while position < len(names) and names[position].startswith(normalized_query) and len(matches) < limit:
+        add_match(position)
+        position += 1
+
+    # 2. Prefijo de alguna palabra del nombre (usa la primera palabra de la consulta)
+    query_tokens = normalized_query.split()
+    tokens = index['tokens']
+    position = bisect_left(tokens, (query_tokens[0],))
+    while position < len(tokens) and tokens[position][0].startswith(query_tokens[0]) and len(matches) < limit:
+        name_position = tokens[position][1]
+        if all(token in names[name_position] for token in query_tokens[1:]):
+            add_match(name_position)
+        position += 1
+
+    # 3. Coincidencias aproximadas (errores de digitación)
+    if len(matches) < limit:
+        close_names = difflib.get_close_matches(normalized_query, names, n=limit - len(matches), cutoff=0.6)
+        for close_name in close_names:
+            add_match(bisect_left(names, close_name))
+
+    return [display for position in matches[:limit] for display in index['display'][position]][:limit]
+
+
+def get_comedor_rows(df, index, comedor):
+    """
+    Devuelve las encuestas de un comedor usando las posiciones de fila del índice (sin recorrer el DataFrame).
+    """
+    positions = index['rows'].get(comedor)
+    if positions is None:
+        return df.iloc[0:0]
+    return df.iloc[positions]
+
+
+def build_geographic_aggregates(df):
+    """
+    Calcula en una sola pasada el promedio y el conteo de encuestas para cada par
+    (nivel geográfico, categoría), incluyendo la categoría GENERAL_CATEGORY (todas las preguntas).
+    Devuelve un dict {(nivel, categoría): DataFrame[nivel, 'Satisfacción Promedio', 'Cantidad de Encuestas']}.
+    No modifica el DataFrame de entrada.
+    """
+    geo_cols = [col for col in GEO_COLS if col in df.columns]
+    satisfaction_cols = get_satisfaction_columns(df)
+    if not geo_cols or not satisfaction_cols:
+        return {}
+
+    # Promedio por encuesta (fila) de cada categoría, calculado una sola vez
+    scores = df[satisfaction_cols].apply(pd.to_numeric, errors='coerce')
+    row_means = {}
+    for category, category_cols in CATEGORIES.items():
+        valid_category_cols = [col for col in category_cols if col in scores.columns]
+        if valid_category_cols:
+            row_means[category] = scores[valid_category_cols].mean(axis=1)
+    row_means[GENERAL_CATEGORY] = scores.mean(axis=1)
+    row_means = pd.DataFrame(row_means)
+
+    aggregates = {}
+    for geo_col in geo_cols:
+        # Un solo groupby por nivel para todas las categorías a la vez
+        geo_stats = row_means.groupby(df[geo_col]).agg(['mean', 'count'])
+        for category in row_means.columns:
+            category_stats = geo_stats[category].reset_index()
+            category_stats.columns = [geo_col, 'Satisfacción Promedio', 'Cantidad de Encuestas']
+            aggregates[(geo_col, category)] = category_stats[category_stats['Cantidad de Encuestas'] > 0]
+
+    return aggregates
+
+
+@st.cache_data(show_spinner=False)
+def _cached_geographic_aggregates(_df, dataset_version):
+    print(f"INFO: Calculando agregados geográficos (versión {dataset_version})")
+    return build_geographic_aggregates(_df)
+
+
+def get_geographic_aggregates(df):
+    """
+    Devuelve los agregados geográficos (ver build_geographic_aggregates), calculados una vez por versión de datos.
+    """
+    if df is None or df.empty:
+        return {}
+    return _cached_geographic_aggregates(df, get_dataset_version(df))
+
+
+def build_hierarchy_rollup(df, levels=None):
+    """
+    Calcula el rollup jerárquico (comuna → barrio → nodo → comedor) al estilo GROUPING SETS:
+    una sola pasada sobre las encuestas al nivel más fino (suma y conteo del promedio por encuesta)
+    y luego cada nivel superior se obtiene sumando sus hijos, por lo que los padres son exactos.
+    Devuelve un DataFrame con columnas id, parent, label, nivel, suma, conteo, promedio.
+    """
+    if levels is None:
+        levels = [col for col in HIERARCHY_LEVELS if col in df.columns]
+        id_comedor_col = get_comedor_column(df)
+        if id_comedor_col:
+            levels.append(id_comedor_col)
+    satisfaction_cols = get_satisfaction_columns(df)
+    if not levels or not satisfaction_cols:
+        return pd.DataFrame(columns=['id', 'parent', 'label', 'nivel', 'suma', 'conteo', 'promedio'])
+
+    # Promedio de satisfacción por encuesta y claves de la jerarquía (vacíos como "Sin dato")
+    row_scores = df[satisfaction_cols].apply(pd.to_numeric, errors='coerce').mean(axis=1)
+    valid_rows = row_scores.notna()
+    hierarchy_keys = df.loc[valid_rows, levels].astype(object)
+    hierarchy_keys = hierarchy_keys.where(hierarchy_keys.notna(), 'Sin dato').astype(str).apply(lambda col: col.str.strip())
+
+    # Única pasada sobre las filas: suma y conteo al nivel más fino
+    leaf_stats = row_scores[valid_rows].groupby([hierarchy_keys[level] for level in levels]).agg(['sum', 'count'])
+    if leaf_stats.empty:
+        return pd.DataFrame(columns=['id', 'parent', 'label', 'nivel', 'suma', 'conteo', 'promedio'])
+
+    rollup_parts = []
+    for depth in range(len(levels), 0, -1):
+        # Los niveles superiores se agregan desde la tabla de hojas (pequeña), no desde las encuestas
+        if depth == len(levels):
+            level_stats = leaf_stats
+        else:
+            level_stats = leaf_stats.groupby(level=list(range(depth))).sum()
+        level_keys = level_stats.index.to_frame(index=False)
+
+        ids = level_keys.iloc[:, 0]
+        parents = pd.Series('Total', index=level_keys.index)
+        for key_position in range(1, depth):
+            parents = ids
+            ids = ids + ' / ' + level_keys.iloc[:, key_position]
+
+        rollup_parts.append(pd.DataFrame({
+            'id': ids.values,
+            'parent': parents.values,
+            'label': level_keys.iloc[:, depth - 1].values,
+            'nivel': levels[depth - 1],
+            'suma': level_stats['sum'].values,
+            'conteo': level_stats['count'].values
+        }))
+
+    rollup_parts.append(pd.DataFrame({
+        'id': ['Total'], 'parent': [''], 'label': ['Total'], 'nivel': ['total'],
+        'suma': [leaf_stats['sum'].sum()], 'conteo': [leaf_stats['count'].sum()]
+    }))
+    rollup = pd.concat(rollup_parts[::-1], ignore_index=True)
+    rollup['promedio'] = rollup['suma'] / rollup['conteo']
+    return rollup
+
+
+@st.cache_data(show_spinner=False)
+def _cached_hierarchy_rollup(_df, dataset_version):
+    print(f"INFO: Calculando rollup jerárquico (versión {dataset_version})")
+    return build_hierarchy_rollup(_df)
+
+
+def get_hierarchy_rollup(df):
+    """
+    Devuelve el rollup jerárquico (ver build_hierarchy_rollup), calculado una vez por versión de datos.
+    """
+    if df is None or df.empty:
+        return build_hierarchy_rollup(pd.DataFrame())
+    return _cached_hierarchy_rollup(df, get_dataset_version(df))
+
+
+def plot_hierarchy_rollup(rollup, chart_type='sunburst', max_depth=3):
+    """
+    Crea un gráfico sunburst o treemap a partir del rollup jerárquico.
+    El tamaño es el número de encuestas y el color la satisfacción promedio.
+    max_depth limita los niveles visibles a la vez para mantenerlo fluido con miles de comedores.
+    """
+    if rollup is None or rollup.empty:
         return None
 
-    # Crear columna de mes (Periodo)
-    df_trend['mes'] = df_trend['fecha'].dt.to_period('M')
+    trace_class = go.Sunburst if chart_type == 'sunburst' else go.Treemap
+    fig = go.Figure(trace_class(
+        ids=rollup['id'],
+        parents=rollup['parent'],
+        labels=rollup['label'],
+        values=rollup['conteo'],
+        branchvalues='total',  # El conteo del padre es exactamente la suma de sus hijos
+        maxdepth=max_depth,
+        marker=dict(
+            colors=rollup['promedio'],
+            colorscale='RdYlGn',
+            cmin=1,
+            cmax=5,
+            colorbar=dict(title="Satisfacción")
+        ),
+        customdata=rollup[['promedio', 'nivel']].values,
+        hovertemplate="<b>%{label}</b><br>Nivel: %{customdata[1]}<br>Encuestas: %{value}<br>Satisfacción promedio: %{customdata[0]:.2f}<extra></extra>"
+    ))
+    fig.update_layout(
+        title="Satisfacción por Jerarquía Geográfica (Comuna → Barrio → Nodo → Comedor)",
+        margin=dict(t=50, l=0, r=0, b=0),
+        height=650
+    )
+    return fig
+
+
+@st.cache_data(show_spinner=False, max_entries=512)
+def _cached_figure_json(figure_name, dataset_version, args, kwargs_items, _plot_function, _df):
+    print(f"INFO: Construyendo figura '{figure_name}' (versión {dataset_version}, args {args})")
+    fig = _plot_function(_df, *args, **dict(kwargs_items))
+    return None if fig is None else fig.to_json()
 
-    # Obtener columnas de satisfacción válidas
-    satisfaction_cols = get_satisfaction_columns(df_trend)
+
+def get_cached_figure(plot_function, df, *args, **kwargs):
+    """
+    Devuelve la figura de plot_function(df, *args, **kwargs) usando una caché de especificaciones
+    serializadas (JSON) con clave (versión de datos, función, argumentos).
+    En las repeticiones no se recalcula el procesamiento de pandas ni se reconstruye px.bar:
+    solo se deserializa la figura, que el llamador puede modificar libremente.
+    """
+    figure_name = f"{plot_function.__module__}.{plot_function.__name__}"
+    figure_json = _cached_figure_json(
+        figure_name,
+        get_dataset_version(df),
+        args,
+        tuple(sorted(kwargs.items())),
+        plot_function,
+        df
+    )
+    return None if figure_json is None else pio.from_json(figure_json)
+
+
+def build_answer_distribution(df):
+    """
+    Cuenta las respuestas (1 a 5) de todas las preguntas de satisfacción en una sola pasada:
+    los puntajes se codifican como enteros y se cuentan con un único np.bincount.
+    Devuelve un DataFrame indexado por pregunta con una columna por etiqueta (SATISFACTION_ORDER),
+    más 'Total' y 'Promedio'.
+    """
+    satisfaction_cols = get_satisfaction_columns(df)
     if not satisfaction_cols:
-        print("INFO plot_satisfaction_trend: No hay columnas de satisfacción válidas.")
-        return None
+        return pd.DataFrame(columns=SATISFACTION_ORDER + ['Total', 'Promedio'])
 
-    # Calcular promedio por categoría y mes
-    trends_data = []
-    for category, cols_in_category in CATEGORIES.items():
-        # Usar solo las columnas de satisfacción válidas que pertenecen a esta categoría
-        valid_category_cols = [col for col in cols_in_category if col in satisfaction_cols]
-        if not valid_category_cols:
-            continue # Saltar si no hay columnas válidas para esta categoría
-
-        # Calcular promedio por fila para esta categoría
-        # Asegurar que las columnas sean numéricas aquí
-        for col in valid_category_cols:
-             df_trend[col] = pd.to_numeric(df_trend[col], errors='coerce')
-        df_trend[f'{category}_avg'] = df_trend[valid_category_cols].mean(axis=1, skipna=True)
-
-        # Agrupar por mes y calcular el promedio mensual de la categoría
-        # Usar dropna() antes de groupby para evitar error con tipos mixtos si hay NaNs en la columna de promedio
-        monthly_avg = df_trend.dropna(subset=['mes', f'{category}_avg']).groupby('mes')[f'{category}_avg'].mean().reset_index()
-        monthly_avg['Mes'] = monthly_avg['mes'].astype(str) # Convertir periodo a string para el eje X
-        monthly_avg['Categoría'] = category
-        monthly_avg.rename(columns={f'{category}_avg': 'Satisfacción Promedio'}, inplace=True)
-
-        trends_data.append(monthly_avg[['Mes', 'Satisfacción Promedio', 'Categoría']])
-
-    if not trends_data:
-        print("INFO plot_satisfaction_trend: No se pudieron calcular datos de tendencia.")
-        return None
+    scores = df[satisfaction_cols].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    # Código 0 = sin respuesta válida; 1..5 = puntaje
+    codes = np.where(np.isin(scores, [1, 2, 3, 4, 5]), scores, 0).astype(np.int64)
+    n_levels = len(SATISFACTION_ORDER) + 1
+    flat_codes = codes + n_levels * np.arange(len(satisfaction_cols))
+    counts = np.bincount(flat_codes.ravel(), minlength=n_levels * len(satisfaction_cols))
+    counts = counts.reshape(len(satisfaction_cols), n_levels)[:, 1:]
 
-    trends_df = pd.concat(trends_data)
+    distribution = pd.DataFrame(counts, index=pd.Index(satisfaction_cols, name='pregunta'), columns=SATISFACTION_ORDER)
+    distribution['Total'] = counts.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        distribution['Promedio'] = (counts @ np.arange(1, n_levels)) / distribution['Total'].to_numpy()
+    return distribution
 
-    # Crear gráfico de líneas
-    fig = px.line(
-        trends_df,
-        x='Mes',
-        y='Satisfacción Promedio',
-        color='Categoría',
-        title="Tendencia de Satisfacción Promedio por Mes",
-        markers=True, # Añadir marcadores a los puntos
-        line_shape='spline', # Línea suavizada (opcional, puedes usar 'linear')
-        height=500
+
+@st.cache_data(show_spinner=False)
+def _cached_answer_distribution(_df, dataset_version):
+    print(f"INFO: Calculando distribución de respuestas (versión {dataset_version})")
+    return build_answer_distribution(_df)
+
+
+def get_answer_distribution(df):
+    """
+    Devuelve la distribución de respuestas de todas las preguntas (ver build_answer_distribution),
+    calculada una sola vez por versión de datos.
+    """
+    if df is None or df.empty:
+        return build_answer_distribution(pd.DataFrame())
+    return _cached_answer_distribution(df, get_dataset_version(df))
+
+
+def get_section_result(section_key, df, compute_function, variant=None):
+    """
+    Devuelve compute_function(df) para una sección de página, guardado en st.session_state
+    con clave (sección, versión de datos). La sección se calcula solo cuando se abre por
+    primera vez; los reruns provocados por otros widgets reutilizan el resultado guardado.
+    variant distingue resultados de la misma sección con otra fuente (p. ej. la versión del archivo histórico).
+    """
+    dataset_version = (get_dataset_version(df), variant)
+    section_results = st.session_state.setdefault(SECTION_STATE_KEY, {})
+    stored = section_results.get(section_key)
+    if stored is not None and stored[0] == dataset_version:
+        return stored[1]
+
+    print(f"INFO get_section_result: Calculando sección '{section_key}'.")
+    result = compute_function(df)
+    # Solo se conserva la última versión de datos de cada sección
+    section_results[section_key] = (dataset_version, result)
+    return result
+
+
+def _table_search_mask(table, query):
+    """
+    Filas de la tabla cuyo texto (columnas no numéricas) contiene la consulta normalizada.
+    La comparación se hace sobre los valores únicos de cada columna (pd.factorize),
+    no fila por fila.
+    """
+    normalized_query = normalize_text(query)
+    mask = np.zeros(len(table), dtype=bool)
+    if not normalized_query:
+        return ~mask
+
+    for col in table.columns:
+        if pd.api.types.is_numeric_dtype(table[col]) or pd.api.types.is_datetime64_any_dtype(table[col]):
+            continue
+        codes, uniques = pd.factorize(table[col])
+        if len(uniques) == 0:
+            continue
+        unique_matches = np.array([normalized_query in normalize_text(value) for value in uniques])
+        mask |= (codes >= 0) & unique_matches[np.maximum(codes, 0)]
+    return mask
+
+
+def paginate_table(table, search='', sort_by=None, ascending=True, page=1, page_size=25, columns=None):
+    """
+    Filtra, ordena y recorta una tabla en el servidor.
+    Solo se materializan las filas de la página pedida y las columnas visibles (columns).
+    Devuelve (tabla_de_la_página, total_de_filas_filtradas).
+    """
+    positions = np.arange(len(table))
+    if search:
+        positions = positions[_table_search_mask(table, search)]
+
+    if sort_by is not None and sort_by in table.columns:
+        sort_values = pd.Series(table[sort_by].to_numpy()[positions])
+        order = sort_values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+        positions = positions[order]
+
+    total_rows = len(positions)
+    start = max(page - 1, 0) * page_size
+    visible_cols = [col for col in (columns or table.columns) if col in table.columns]
+    col_positions = [table.columns.get_loc(col) for col in visible_cols]
+    return table.iloc[positions[start:start + page_size], col_positions], total_rows
+
+
+@st.fragment
+def show_paginated_table(table, key, default_columns=None, page_size=25):
+    """
+    Muestra una tabla con búsqueda, ordenamiento y paginación resueltos en el servidor:
+    al navegador solo se envían la página y las columnas visibles.
+    Se ejecuta como fragmento, así que cambiar de página no vuelve a ejecutar toda la página.
+    """
+    if table is None or table.empty:
+        st.info("No hay datos para mostrar.")
+        return
+
+    # Un índice con nombre (p. ej. el comedor) se muestra como columna para poder buscar y ordenar
+    table = table.reset_index(drop=all(name is None for name in table.index.names))
+    all_columns = [str(col) for col in table.columns]
+    table.columns = all_columns
+
+    search_col, sort_col, order_col, size_col = st.columns([3, 3, 1, 1])
+    search = search_col.text_input("🔎 Buscar", key=f"{key}_buscar")
+    sort_by = sort_col.selectbox("Ordenar por", ["(orden original)"] + all_columns, key=f"{key}_orden")
+    descending = order_col.toggle("Desc.", key=f"{key}_desc")
+    page_size = size_col.selectbox(
+        "Filas", TABLE_PAGE_SIZES,
+        index=TABLE_PAGE_SIZES.index(page_size) if page_size in TABLE_PAGE_SIZES else 0,
+        key=f"{key}_tamano"
     )
 
-    fig.update_layout(
-        xaxis_title="Mes",
-        yaxis_title="Promedio (1=Muy Insatisfecho, 5=Muy Satisfecho)",
-        yaxis_range=[1, 5] # Rango fijo para comparación
+    if len(all_columns) > 6:
+        visible_default = [col for col in (default_columns or all_columns) if col in all_columns]
+        columns = st.multiselect("Columnas visibles", all_columns, default=visible_default, key=f"{key}_columnas")
+    else:
+        columns = all_columns
+
+    # Primero se cuenta el total filtrado para acotar el número de página
+    _, total_rows = paginate_table(table, search=search, page_size=0, columns=[])
+    total_pages = max(1, -(-total_rows // page_size))
+    page_key = f"{key}_pagina"
+    if st.session_state.get(page_key, 1) > total_pages:
+        st.session_state[page_key] = total_pages
+    page = st.number_input("Página", min_value=1, max_value=total_pages, step=1, key=page_key)
+
+    page_table, total_rows = paginate_table(
+        table,
+        search=search,
+        sort_by=None if sort_by == "(orden original)" else sort_by,
+        ascending=not descending,
+        page=page,
+        page_size=page_size,
+        columns=columns
     )
+    st.dataframe(page_table, width="stretch", hide_index=True)
 
-    return fig
+    first_row = (page - 1) * page_size + 1 if total_rows else 0
+    last_row = min(page * page_size, total_rows)
+    filter_text = f" (filtradas de {len(table)})" if search else ""
+    st.caption(f"Filas {first_row}–{last_row} de {total_rows}{filter_text} · Página {page} de {total_pages}")
+
+
+def period_comparison_controls(df, key):
+    """
+    Controles de la barra lateral del modo comparación: un interruptor y dos rangos de fechas
+    (por defecto, los últimos 30 días con datos frente a los 30 anteriores). Devuelve
+    ((inicio_a, fin_a), (inicio_b, fin_b)) o None si el modo está apagado o los rangos están incompletos.
+    """
+    if 'fecha' not in df.columns:
+        return None
+    if not st.sidebar.toggle("🔀 Comparar dos periodos", key=f'{key}_comparar'):
+        return None
+    from utils.trends import get_daily_rollup
+    days = get_daily_rollup(df)['count'].index
+    if len(days) == 0:
+        st.sidebar.info("No hay encuestas con fecha para comparar.")
+        return None
+    first_day, last_day = days.min().date(), days.max().date()
+    default_b = (max(first_day, last_day - pd.Timedelta(days=29)), last_day)
+    default_a = (max(first_day, default_b[0] - pd.Timedelta(days=30)), max(first_day, default_b[0] - pd.Timedelta(days=1)))
+    period_a = st.sidebar.date_input("Periodo A (referencia)", value=default_a, min_value=first_day,
+                                     max_value=last_day, key=f'{key}_periodo_a')
+    period_b = st.sidebar.date_input("Periodo B (a comparar)", value=default_b, min_value=first_day,
+                                     max_value=last_day, key=f'{key}_periodo_b')
+    if len(period_a) != 2 or len(period_b) != 2:
+        st.sidebar.info("Seleccione fecha inicial y final en ambos periodos.")
+        return None
+    return tuple(period_a), tuple(period_b)
+
+
+def show_period_comparison(df, key, metric_columns, table_columns=None):
+    """
+    Modo comparación de periodos: si está activo en la barra lateral, muestra cada columna de
+    metric_columns con el promedio del periodo B, la diferencia frente al periodo A y su significancia
+    (prueba de Welch sobre los acumulados diarios, sin volver a filtrar las encuestas), y una tabla
+    con table_columns (por defecto, las mismas). Devuelve True si el modo está activo.
+    """
+    periods = period_comparison_controls(df, key)
+    if periods is None:
+        return False
+    from utils.trends import compare_periods
+    from utils.significance import SIGNIFICANCE_ALPHA
+    comparison = compare_periods(df, *periods)
+    (start_a, end_a), (start_b, end_b) = periods
+    label_a = f"{start_a:%d/%m/%Y}–{end_a:%d/%m/%Y}"
+    label_b = f"{start_b:%d/%m/%Y}–{end_b:%d/%m/%Y}"
+
+    st.header("🔀 Comparación de Periodos")
+    st.caption(f"Periodo A: {label_a} · Periodo B: {label_b}. La diferencia es B − A; "
+               f"✱ indica una diferencia significativa (prueba t de Welch, α = {SIGNIFICANCE_ALPHA}).")
+    metric_columns = [col for col in metric_columns if col in comparison.index]
+    for start in range(0, len(metric_columns), 4):
+        for metric_col, col in zip(st.columns(4), metric_columns[start:start + 4]):
+            row = comparison.loc[col]
+            label = COL_DESCRIPTIONS.get(col, col) + (" ✱" if row['significativo'] else "")
+            p_text = f"p = {row['p_valor']:.4f}" if pd.notna(row['p_valor']) else "p no disponible"
+            metric_col.metric(
+                label,
+                f"{row['promedio_b']:.2f}/5" if pd.notna(row['promedio_b']) else "N/A",
+                delta=f"{row['diferencia']:+.2f}" if pd.notna(row['diferencia']) else None,
+                help=(f"Periodo A: {row['promedio_a']:.2f} (n = {row['n_a']}) · "
+                      f"Periodo B: {row['promedio_b']:.2f} (n = {row['n_b']}) · {p_text}")
+            )
+
+    table_columns = [col for col in (table_columns or metric_columns) if col in comparison.index]
+    table = comparison.loc[table_columns].rename(index=COL_DESCRIPTIONS)
+    table['significativo'] = table['significativo'].map({True: "✱ Sí", False: "No"})
+    table = table.rename(columns={
+        'promedio_a': 'Periodo A', 'n_a': 'Encuestas A', 'promedio_b': 'Periodo B', 'n_b': 'Encuestas B',
+        'diferencia': 'Diferencia', 'p_valor': 'p-valor', 'significativo': 'Significativo'
+    })
+    table.index.name = 'Aspecto'
+    with st.expander("Detalle de la comparación"):
+        st.dataframe(
+            table[['Periodo A', 'Encuestas A', 'Periodo B', 'Encuestas B', 'Diferencia', 'p-valor', 'Significativo']]
+            .style.format({'Periodo A': '{:.2f}', 'Periodo B': '{:.2f}', 'Diferencia': '{:+.2f}', 'p-valor': '{:.4f}'},
+                          na_rep='-'),
+            width="stretch"
+        )
+    return True
 
 # --- FIN FUNCIONES ---
\ No newline at end of file
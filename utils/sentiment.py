@@ -0,0 +1,194 @@
+import re
+import threading
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.data_loader import get_dataset_version
+from utils.data_processing import (
+    normalize_text,
+    get_satisfaction_columns,
+    get_comedor_column,
+    COMMENT_COLS,
+    GEO_COLS
+)
+
+# Léxico de polaridad en español (palabras normalizadas: minúsculas y sin tildes), de -2 a +2
+SENTIMENT_LEXICON_ES = {
+    # Positivas
+    'excelente': 2, 'excelentes': 2, 'perfecto': 2, 'perfecta': 2, 'maravilloso': 2, 'maravillosa': 2,
+    'encanta': 2, 'encantan': 2, 'feliz': 2, 'felices': 2, 'agradecido': 2, 'agradecida': 2,
+    'agradecidos': 2, 'agradecidas': 2, 'gracias': 1, 'bueno': 1, 'buena': 1, 'buenos': 1, 'buenas': 1,
+    'bien': 1, 'mejor': 1, 'satisfecho': 1, 'satisfecha': 1, 'satisfechos': 1, 'contento': 1,
+    'contenta': 1, 'contentos': 1, 'fresco': 1, 'fresca': 1, 'frescos': 1, 'frescas': 1, 'puntual': 1,
+    'puntuales': 1, 'puntualidad': 1, 'rapido': 1, 'rapida': 1, 'rapidos': 1, 'amable': 1, 'amables': 1,
+    'oportuno': 1, 'oportuna': 1, 'oportunamente': 1, 'completo': 1, 'completa': 1, 'completos': 1,
+    'suficiente': 1, 'suficientes': 1, 'organizado': 1, 'organizada': 1, 'ordenado': 1, 'ordenada': 1,
+    'limpio': 1, 'limpia': 1, 'adecuado': 1, 'adecuada': 1, 'cumplido': 1, 'cumplen': 1, 'cumple': 1,
+    'agradable': 1, 'facil': 1, 'sencillo': 1, 'util': 1,
+    # Negativas
+    'mal': -1, 'mala': -1, 'malo': -1, 'malos': -1, 'malas': -1, 'tarde': -1, 'demora': -1,
+    'demoras': -1, 'demorado': -1, 'retraso': -1, 'retrasos': -1, 'retrasado': -1, 'lento': -1,
+    'lenta': -1, 'incompleto': -1, 'incompleta': -1, 'incompletos': -1, 'falta': -1, 'faltan': -1,
+    'faltaron': -1, 'faltante': -1, 'faltantes': -1, 'poco': -1, 'poca': -1, 'pocos': -1, 'pocas': -1,
+    'insuficiente': -1, 'insuficientes': -1, 'problema': -1, 'problemas': -1, 'queja': -1,
+    'quejas': -1, 'dificil': -1, 'complicado': -1, 'complicada': -1, 'desorden': -1,
+    'desorganizado': -1, 'desorganizada': -1, 'sucio': -1, 'sucia': -1, 'maduras': -1, 'maduros': -1,
+    'golpeado': -1, 'golpeada': -1, 'golpeados': -1, 'golpeadas': -1, 'caro': -1, 'grosero': -2,
+    'grosera': -2, 'groseros': -2, 'pesimo': -2, 'pesima': -2, 'horrible': -2, 'terrible': -2,
+    'podrido': -2, 'podrida': -2, 'podridos': -2, 'podridas': -2, 'danado': -2, 'danada': -2,
+    'danados': -2, 'danadas': -2, 'roto': -2, 'rota': -2, 'rotos': -2, 'rotas': -2, 'vencido': -2,
+    'vencida': -2, 'vencidos': -2, 'vencidas': -2, 'insatisfecho': -2, 'insatisfecha': -2,
+}
+
+# Palabras que invierten la polaridad de las SENTIMENT_NEGATION_WINDOW palabras siguientes ("no llegó tarde")
+SENTIMENT_NEGATORS = frozenset(['no', 'ni', 'sin', 'tampoco', 'jamas', 'nunca'])
+SENTIMENT_NEGATION_WINDOW = 3
+# Palabras que intensifican la polaridad de la palabra siguiente ("muy buena")
+SENTIMENT_INTENSIFIERS = {'muy': 1.5, 'super': 1.5, 'bastante': 1.3, 'demasiado': 1.5, 'totalmente': 1.5}
+
+# Umbral para clasificar un puntaje (-1 a 1) como positivo o negativo
+SENTIMENT_LABEL_THRESHOLD = 0.1
+SENTIMENT_PREFIX = 'sentimiento_'
+
+WORD_PATTERN = re.compile(r'\b\w+\b')
+
+# --- INICIO FUNCIONES ---
+
+def sentiment_column(comment_col):
+    """Nombre de la columna de sentimiento de una columna de comentarios."""
+    return f"{SENTIMENT_PREFIX}{comment_col}"
+
+
+def score_texts(normalized_texts):
+    """
+    Puntaje de sentimiento (-1 a 1) de una lista de textos normalizados, vectorizado con numpy:
+    los textos se convierten en pares (texto, palabra), la polaridad se busca una vez por palabra
+    distinta, se aplican negaciones e intensificadores por posición y se suma con np.bincount.
+    El puntaje es el promedio de las palabras con polaridad dividido por 2; 0 si no hay ninguna.
+    """
+    n_texts = len(normalized_texts)
+    token_lists = [WORD_PATTERN.findall(text) for text in normalized_texts]
+    lengths = np.array([len(tokens) for tokens in token_lists], dtype=np.int64)
+    if lengths.sum() == 0:
+        return np.zeros(n_texts)
+
+    text_ids = np.repeat(np.arange(n_texts), lengths)
+    vocabulary, token_ids = np.unique(np.concatenate([np.array(tokens, dtype=object) for tokens in token_lists]),
+                                      return_inverse=True)
+    polarity = np.array([SENTIMENT_LEXICON_ES.get(word, 0) for word in vocabulary], dtype=float)[token_ids]
+    is_negator = np.isin(vocabulary, list(SENTIMENT_NEGATORS))[token_ids]
+    boost = np.array([SENTIMENT_INTENSIFIERS.get(word, 1.0) for word in vocabulary])[token_ids]
+
+    # Negación e intensificación miran las palabras anteriores del mismo texto
+    weights = np.ones(len(token_ids))
+    negated = np.zeros(len(token_ids), dtype=bool)
+    for shift in range(1, SENTIMENT_NEGATION_WINDOW + 1):
+        same_text = text_ids[shift:] == text_ids[:-shift]
+        negated[shift:] ^= is_negator[:-shift] & same_text
+        if shift == 1:
+            weights[1:] = np.where(same_text, boost[:-1], 1.0)
+    adjusted = np.where(negated, -polarity, polarity) * weights
+
+    totals = np.bincount(text_ids, weights=adjusted, minlength=n_texts)
+    hits = np.bincount(text_ids, weights=(polarity != 0), minlength=n_texts)
+    return np.clip(totals / np.maximum(hits, 1) / 2, -1, 1)
+
+
+@st.cache_resource(show_spinner=False)
+def _sentiment_memo():
+    """
+    Puntajes ya calculados por texto normalizado (compartidos entre recargas y sesiones). Solo se
+    conservan los textos de la última carga, de modo que la memoria no crece con el tiempo.
+    """
+    return {'lock': threading.Lock(), 'scores': {}}
+
+
+def add_sentiment_columns(df, comment_cols=None):
+    """
+    Agrega una columna 'sentimiento_<columna>' (-1 a 1, NaN sin comentario) por cada columna de
+    comentarios. Es incremental: solo se puntúan los textos que no estaban en la carga anterior.
+    """
+    comment_cols = [col for col in (comment_cols or COMMENT_COLS) if col in df.columns]
+    normalized_cols = {col: df[col].map(normalize_text) for col in comment_cols}
+    if not normalized_cols:
+        return df
+    all_texts = pd.concat(list(normalized_cols.values()), ignore_index=True)
+    unique_texts = pd.unique(all_texts[all_texts != ''])
+
+    memo = _sentiment_memo()
+    with memo['lock']:
+        previous = memo['scores']
+        new_texts = [text for text in unique_texts if text not in previous]
+        scores = {text: previous[text] for text in unique_texts if text in previous}
+        if new_texts:
+            scores.update(zip(new_texts, score_texts(new_texts)))
+        memo['scores'] = scores
+    print(f"INFO add_sentiment_columns: {len(new_texts)} textos nuevos de {len(unique_texts)}.")
+
+    for col, normalized in normalized_cols.items():
+        df[sentiment_column(col)] = normalized.map(scores).astype(float)
+    return df
+
+
+def sentiment_label(scores):
+    """Etiqueta (Positivo / Neutral / Negativo) de una serie de puntajes."""
+    labels = np.select([scores > SENTIMENT_LABEL_THRESHOLD, scores < -SENTIMENT_LABEL_THRESHOLD],
+                       ['Positivo', 'Negativo'], 'Neutral')
+    return pd.Series(labels, index=scores.index).where(scores.notna())
+
+
+def build_sentiment_summary(df, group_col):
+    """
+    Resumen de sentimiento por grupo (columna geográfica o comedor): comentarios, sentimiento
+    promedio, % positivos y % negativos, junto al puntaje promedio de satisfacción (1-5).
+    """
+    if group_col not in df.columns:
+        return pd.DataFrame()
+    sentiment_cols = [sentiment_column(col) for col in COMMENT_COLS if col in df.columns]
+    if not all(col in df.columns for col in sentiment_cols):
+        # Datos de una copia anterior a las columnas de sentimiento: se calculan aquí
+        df = add_sentiment_columns(df.copy())
+
+    satisfaction_cols = get_satisfaction_columns(df)
+    scores = pd.DataFrame({
+        'grupo': df[group_col].astype(str).str.strip(),
+        'sentimiento': df[sentiment_cols].mean(axis=1) if sentiment_cols else np.nan,
+        'satisfaccion': (df[satisfaction_cols].apply(pd.to_numeric, errors='coerce').mean(axis=1)
+                         if satisfaction_cols else np.nan),
+    }, index=df.index)
+    scores['positivo'] = (scores['sentimiento'] > SENTIMENT_LABEL_THRESHOLD).where(scores['sentimiento'].notna())
+    scores['negativo'] = (scores['sentimiento'] < -SENTIMENT_LABEL_THRESHOLD).where(scores['sentimiento'].notna())
+
+    grouped = scores.groupby('grupo', sort=True)
+    summary = pd.DataFrame({
+        'Encuestas': grouped.size(),
+        'Comentarios': grouped['sentimiento'].count(),
+        'Sentimiento promedio': grouped['sentimiento'].mean().round(3),
+        '% Positivos': (grouped['positivo'].mean() * 100).round(1),
+        '% Negativos': (grouped['negativo'].mean() * 100).round(1),
+        'Satisfacción promedio (1-5)': grouped['satisfaccion'].mean().round(2),
+    })
+    summary.index.name = group_col
+    return summary.sort_values('Sentimiento promedio', kind='stable')
+
+
+@st.cache_data(show_spinner=False)
+def _cached_sentiment_summary(_df, dataset_version, group_col):
+    print(f"INFO: Construyendo resumen de sentimiento por '{group_col}' (versión {dataset_version})")
+    return build_sentiment_summary(_df, group_col)
+
+
+def get_sentiment_summary(df, group_col):
+    """
+    Resumen de sentimiento por grupo, calculado una vez por (versión de datos, columna de grupo).
+    """
+    if df is None or df.empty:
+        return pd.DataFrame()
+    return _cached_sentiment_summary(df, get_dataset_version(df), group_col)
+
+
+def sentiment_group_options(df):
+    """Columnas disponibles para agrupar el sentimiento: geográficas y comedor."""
+    return [col for col in GEO_COLS + [get_comedor_column(df)] if col and col in df.columns]
+
+# --- FIN FUNCIONES ---
@@ -0,0 +1,472 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.data_loader import get_dataset_version
+from utils.data_processing import (
+    get_satisfaction_columns,
+    page_spinner,
+    CATEGORIES,
+    GEO_COLS,
+    HIERARCHY_LEVELS,
+    GENERAL_CATEGORY
+)
+
+# Parámetros de las pruebas estadísticas
+BOOTSTRAP_SAMPLES = 500
+BOOTSTRAP_BATCH = 100  # Réplicas por lote (limita la memoria del remuestreo)
+CONFIDENCE_LEVEL = 0.95
+SIGNIFICANCE_ALPHA = 0.05
+MIN_CORRELATION_PAIRS = 3  # Observaciones completas mínimas para estimar una correlación
+MISSING_CELL_LABEL = "(sin dato)"
+
+# --- INICIO FUNCIONES ---
+
+def build_score_matrix(df):
+    """
+    Construye la matriz densa de puntajes: una columna por pregunta de satisfacción,
+    más el promedio por encuesta de cada categoría y el promedio general (GENERAL_CATEGORY).
+    Devuelve (matriz DataFrame float, lista de columnas discretas 1-5).
+    """
+    satisfaction_cols = get_satisfaction_columns(df)
+    scores = df[satisfaction_cols].apply(pd.to_numeric, errors='coerce').astype(float)
+
+    derived = {}
+    for category, category_cols in CATEGORIES.items():
+        valid_category_cols = [col for col in category_cols if col in scores.columns]
+        if valid_category_cols:
+            derived[category] = scores[valid_category_cols].mean(axis=1)
+    if satisfaction_cols:
+        derived[GENERAL_CATEGORY] = scores.mean(axis=1)
+
+    matrix = pd.concat([scores, pd.DataFrame(derived, index=df.index)], axis=1)
+    return matrix, satisfaction_cols
+
+
+def _group_sum(values, group_codes, n_groups):
+    """Suma por grupo de cada columna de una matriz (filas con código -1 se ignoran)."""
+    in_group = group_codes >= 0
+    totals = np.zeros((n_groups, values.shape[1]))
+    np.add.at(totals, group_codes[in_group], values[in_group])
+    return totals
+
+
+def kruskal_wallis_batch(values, group_codes, n_groups):
+    """
+    Prueba de Kruskal-Wallis para todas las columnas de la matriz a la vez.
+    Devuelve un dict con H, grados de libertad, p-valor, N, conteos, rangos promedio
+    y el término de empates por columna (usado en las comparaciones por pares).
+    """
+    from scipy import stats
+    valid = ~np.isnan(values) & (group_codes >= 0)[:, None]
+    masked = np.where(valid, values, np.nan)
+
+    # Rangos promedio por columna (los NaN quedan fuera); t = tamaño del empate de cada observación
+    masked_df = pd.DataFrame(masked)
+    ranks = masked_df.rank(method='average').to_numpy()
+    tie_sizes = (masked_df.rank(method='max') - masked_df.rank(method='min') + 1).to_numpy()
+
+    counts = _group_sum(valid.astype(float), group_codes, n_groups)
+    rank_sums = _group_sum(np.nan_to_num(ranks), group_codes, n_groups)
+    total_n = counts.sum(axis=0)
+    # Cada grupo de empate de tamaño t aporta t³ - t = suma de (t² - 1) sobre sus t observaciones
+    ties = np.where(valid, tie_sizes ** 2 - 1, 0.0).sum(axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_ranks = rank_sums / counts
+        h_stat = 12.0 / (total_n * (total_n + 1)) * np.nansum(rank_sums ** 2 / counts, axis=0) - 3 * (total_n + 1)
+        tie_correction = 1 - ties / (total_n ** 3 - total_n)
+        h_stat = h_stat / tie_correction
+
+    dof = (counts > 0).sum(axis=0) - 1
+    invalid = (dof < 1) | (total_n < 3) | ~np.isfinite(h_stat)
+    p_values = np.where(invalid, np.nan, stats.chi2.sf(np.where(invalid, 0, h_stat), np.maximum(dof, 1)))
+
+    return {
+        'H': np.where(invalid, np.nan, h_stat),
+        'dof': dof,
+        'p': p_values,
+        'N': total_n,
+        'counts': counts,
+        'mean_ranks': mean_ranks,
+        'ties': ties
+    }
+
+
+def dunn_pairwise_batch(kruskal_result):
+    """
+    Comparaciones por pares (prueba de Dunn, corrección de Bonferroni) para todas las columnas a la vez.
+    Devuelve arrays (grupo_a, grupo_b, columna, z, p_ajustado) de todos los pares con datos.
+    """
+    from scipy import stats
+    counts = kruskal_result['counts']
+    mean_ranks = kruskal_result['mean_ranks']
+    total_n = kruskal_result['N']
+    ties = kruskal_result['ties']
+    n_groups = counts.shape[0]
+
+    group_a, group_b = np.triu_indices(n_groups, k=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance_base = total_n * (total_n + 1) / 12.0 - ties / (12.0 * (total_n - 1))
+        std_error = np.sqrt(variance_base * (1.0 / counts[group_a] + 1.0 / counts[group_b]))
+        z_scores = (mean_ranks[group_a] - mean_ranks[group_b]) / std_error
+
+    p_raw = 2 * stats.norm.sf(np.abs(z_scores))
+    valid_pairs = np.isfinite(z_scores)
+    n_comparisons = valid_pairs.sum(axis=0)
+    p_adjusted = np.minimum(1.0, p_raw * np.maximum(n_comparisons, 1))
+
+    pair_index, column_index = np.nonzero(valid_pairs)
+    return (group_a[pair_index], group_b[pair_index], column_index,
+            z_scores[pair_index, column_index], p_adjusted[pair_index, column_index])
+
+
+def bootstrap_discrete_means(values, group_codes, n_groups, n_boot, rng):
+    """
+    Bootstrap de la media por (grupo, columna) para puntajes discretos (1-5).
+    Como la media solo depende del conteo de cada nivel, cada réplica es un sorteo multinomial
+    sobre esos conteos: equivalente a remuestrear las encuestas pero sin recorrer filas.
+    Devuelve (límite inferior, límite superior) con forma (grupos, columnas).
+    """
+    levels = np.unique(values[~np.isnan(values)])
+    lower = np.full((n_groups, values.shape[1]), np.nan)
+    upper = np.full_like(lower, np.nan)
+    if len(levels) == 0:
+        return lower, upper
+
+    # Conteo de cada nivel de respuesta por (grupo, columna)
+    level_counts = np.stack([_group_sum((values == level).astype(float), group_codes, n_groups) for level in levels], axis=-1)
+    cell_n = level_counts.sum(axis=-1)
+    cells = np.argwhere(cell_n > 0)
+    if len(cells) == 0:
+        return lower, upper
+
+    n_cells = cell_n[cells[:, 0], cells[:, 1]].astype(np.int64)
+    p_cells = level_counts[cells[:, 0], cells[:, 1]] / n_cells[:, None]
+
+    boot_means = []
+    for start in range(0, n_boot, BOOTSTRAP_BATCH):
+        batch = min(BOOTSTRAP_BATCH, n_boot - start)
+        draws = rng.multinomial(n_cells, p_cells, size=(batch, len(n_cells)))
+        boot_means.append(draws @ levels / n_cells)
+    boot_means = np.concatenate(boot_means)
+
+    alpha = 1 - CONFIDENCE_LEVEL
+    lower[cells[:, 0], cells[:, 1]] = np.quantile(boot_means, alpha / 2, axis=0)
+    upper[cells[:, 0], cells[:, 1]] = np.quantile(boot_means, 1 - alpha / 2, axis=0)
+    return lower, upper
+
+
+def bootstrap_continuous_means(values, group_codes, n_groups, n_boot, rng):
+    """
+    Bootstrap de la media por (grupo, columna) para columnas continuas (promedios por encuesta).
+    Las filas se ordenan por grupo una vez; cada lote de réplicas remuestrea encuestas dentro de
+    cada grupo (el mismo índice para todas las columnas) y suma con np.add.reduceat,
+    sin bucles sobre grupos ni filas. Los NaN se excluyen de la suma y del conteo.
+    """
+    lower = np.full((n_groups, values.shape[1]), np.nan)
+    upper = np.full_like(lower, np.nan)
+    in_group = group_codes >= 0
+    if values.shape[1] == 0 or not in_group.any():
+        return lower, upper
+
+    order = np.argsort(group_codes[in_group], kind='stable')
+    sorted_codes = group_codes[in_group][order]
+    sorted_values = values[in_group][order]
+    sorted_valid = ~np.isnan(sorted_values)
+    sorted_values = np.where(sorted_valid, sorted_values, 0.0)
+
+    sizes = np.bincount(sorted_codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    present = np.flatnonzero(sizes)
+    row_starts = starts[sorted_codes]
+    row_sizes = sizes[sorted_codes].astype(np.float32)
+
+    # Lotes más pequeños: cada réplica reúne todas las columnas a la vez
+    batch_size = max(1, BOOTSTRAP_BATCH // 5)
+    boot_means = []
+    for start in range(0, n_boot, batch_size):
+        batch = min(batch_size, n_boot - start)
+        offsets = (rng.random((batch, len(sorted_codes)), dtype=np.float32) * row_sizes).astype(np.int64)
+        sample_index = row_starts + np.minimum(offsets, sizes[sorted_codes] - 1)
+        sums = np.add.reduceat(sorted_values[sample_index], starts[present], axis=1)
+        counts = np.add.reduceat(sorted_valid[sample_index].astype(np.int32), starts[present], axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            boot_means.append(sums / counts)
+    boot_means = np.concatenate(boot_means)
+
+    alpha = 1 - CONFIDENCE_LEVEL
+    lower[present] = np.nanquantile(boot_means, alpha / 2, axis=0)
+    upper[present] = np.nanquantile(boot_means, 1 - alpha / 2, axis=0)
+    return lower, upper
+
+
+def build_geo_statistics(df, n_boot=BOOTSTRAP_SAMPLES, seed=0):
+    """
+    Calcula, para cada nivel geográfico y cada pregunta/categoría, en lote:
+    - 'kruskal': prueba de Kruskal-Wallis (H, gl, p-valor, N) por pregunta.
+    - 'groups': n, media e intervalo de confianza bootstrap por ubicación y pregunta.
+    - 'pairwise': pares de ubicaciones con diferencia significativa (Dunn + Bonferroni).
+    Devuelve un dict {nivel: {'kruskal': DataFrame, 'groups': DataFrame, 'pairwise': DataFrame}}.
+    """
+    geo_cols = [col for col in GEO_COLS if col in df.columns]
+    matrix, discrete_cols = build_score_matrix(df)
+    if not geo_cols or matrix.empty:
+        return {}
+
+    values = matrix.to_numpy(dtype=float)
+    columns = list(matrix.columns)
+    discrete_mask = np.array([col in discrete_cols for col in columns])
+    rng = np.random.default_rng(seed)
+
+    results = {}
+    for geo_col in geo_cols:
+        group_codes, group_names = pd.factorize(df[geo_col])
+        n_groups = len(group_names)
+        if n_groups == 0:
+            continue
+
+        kruskal = kruskal_wallis_batch(values, group_codes, n_groups)
+        kruskal_df = pd.DataFrame({
+            'pregunta': columns,
+            'H': kruskal['H'],
+            'gl': kruskal['dof'],
+            'p_valor': kruskal['p'],
+            'N': kruskal['N'].astype(int)
+        })
+
+        lower = np.full((n_groups, len(columns)), np.nan)
+        upper = np.full_like(lower, np.nan)
+        lower[:, discrete_mask], upper[:, discrete_mask] = bootstrap_discrete_means(
+            values[:, discrete_mask], group_codes, n_groups, n_boot, rng)
+        lower[:, ~discrete_mask], upper[:, ~discrete_mask] = bootstrap_continuous_means(
+            values[:, ~discrete_mask], group_codes, n_groups, n_boot, rng)
+
+        counts = kruskal['counts']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = _group_sum(np.nan_to_num(values), group_codes, n_groups) / counts
+        group_index, column_index = np.nonzero(counts > 0)
+        groups_df = pd.DataFrame({
+            geo_col: group_names[group_index],
+            'pregunta': np.array(columns, dtype=object)[column_index],
+            'n': counts[group_index, column_index].astype(int),
+            'promedio': means[group_index, column_index],
+            'ic_inferior': lower[group_index, column_index],
+            'ic_superior': upper[group_index, column_index]
+        })
+
+        group_a, group_b, pair_columns, z_scores, p_adjusted = dunn_pairwise_batch(kruskal)
+        significant = p_adjusted < SIGNIFICANCE_ALPHA
+        pairwise_df = pd.DataFrame({
+            'pregunta': np.array(columns, dtype=object)[pair_columns[significant]],
+            'ubicacion_a': group_names[group_a[significant]],
+            'ubicacion_b': group_names[group_b[significant]],
+            'z': z_scores[significant],
+            'p_ajustado': p_adjusted[significant]
+        })
+
+        results[geo_col] = {'kruskal': kruskal_df, 'groups': groups_df, 'pairwise': pairwise_df}
+
+    return results
+
+
+@st.cache_data(show_spinner=False)
+def _cached_geo_statistics(_df, dataset_version):
+    print(f"INFO: Calculando pruebas estadísticas geográficas (versión {dataset_version})")
+    return build_geo_statistics(_df)
+
+
+def get_geo_statistics(df):
+    """
+    Devuelve las pruebas estadísticas por nivel geográfico (ver build_geo_statistics),
+    calculadas una sola vez por versión de datos.
+    """
+    if df is None or df.empty:
+        return {}
+    with page_spinner("Calculando pruebas estadísticas..."):
+        return _cached_geo_statistics(df, get_dataset_version(df))
+
+
+def build_correlation_statistics(df):
+    """
+    Estadísticos suficientes de la correlación por pares (observaciones completas por par), separados
+    por celda geográfica (combinación de HIERARCHY_LEVELS) para que cualquier filtro geográfico se
+    resuelva sumando celdas, sin volver a recorrer las encuestas. Para cada celda y par (i, j), sobre
+    las filas con ambas respuestas: n, suma de x_i, suma de x_i² y suma de x_i·x_j.
+    Las columnas son las preguntas de satisfacción más el promedio general (GENERAL_CATEGORY).
+    """
+    matrix, satisfaction_cols = build_score_matrix(df)
+    if not satisfaction_cols:
+        return {}
+    columns = satisfaction_cols + [GENERAL_CATEGORY]
+    values = matrix[columns].to_numpy(dtype=float)
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    present = present.astype(float)
+
+    levels = [col for col in HIERARCHY_LEVELS if col in df.columns]
+    if levels:
+        cell_keys = df[levels].astype('string').fillna(MISSING_CELL_LABEL)
+        cell_codes, cell_index = pd.MultiIndex.from_frame(cell_keys).factorize()
+        cells = pd.DataFrame(cell_index.tolist(), columns=levels)
+    else:
+        cell_codes = np.zeros(len(df), dtype=np.int64)
+        cells = pd.DataFrame(index=[0])
+
+    n_cells, n_columns = len(cells), len(columns)
+    shape = (n_cells, n_columns, n_columns)
+    statistics = {'n': np.zeros(shape), 'sum_x': np.zeros(shape), 'sum_xx': np.zeros(shape), 'sum_xy': np.zeros(shape)}
+    order = np.argsort(cell_codes, kind='stable')
+    boundaries = np.searchsorted(cell_codes[order], np.arange(n_cells + 1))
+    for cell in range(n_cells):
+        rows = order[boundaries[cell]:boundaries[cell + 1]]
+        cell_present, cell_filled = present[rows], filled[rows]
+        # [i, j]: sumas de la columna i sobre las filas donde también respondieron j
+        statistics['n'][cell] = cell_present.T @ cell_present
+        statistics['sum_x'][cell] = cell_filled.T @ cell_present
+        statistics['sum_xx'][cell] = (cell_filled ** 2).T @ cell_present
+        statistics['sum_xy'][cell] = cell_filled.T @ cell_filled
+
+    return {'columns': columns, 'cells': cells, **statistics}
+
+
+@st.cache_data(show_spinner=False)
+def _cached_correlation_statistics(_df, dataset_version):
+    print(f"INFO: Calculando estadísticos de correlación por celda geográfica (versión {dataset_version})")
+    return build_correlation_statistics(_df)
+
+
+def get_correlation_statistics(df):
+    """
+    Estadísticos suficientes de la correlación por celda geográfica (ver build_correlation_statistics),
+    calculados una sola vez por versión de datos.
+    """
+    if df is None or df.empty:
+        return {}
+    with page_spinner("Calculando estadísticos de correlación..."):
+        return _cached_correlation_statistics(df, get_dataset_version(df))
+
+
+def combine_correlation_statistics(statistics, cell_mask=None):
+    """Suma los estadísticos de las celdas seleccionadas (todas si cell_mask es None)."""
+    selected = slice(None) if cell_mask is None else np.asarray(cell_mask, dtype=bool)
+    return {key: statistics[key][selected].sum(axis=0) for key in ('n', 'sum_x', 'sum_xx', 'sum_xy')}
+
+
+def correlation_from_statistics(totals, columns):
+    """
+    Matriz de correlación de Pearson por pares a partir de los estadísticos sumados.
+    Los pares con menos de MIN_CORRELATION_PAIRS observaciones o sin varianza quedan en NaN.
+    """
+    n, sum_x, sum_xx, sum_xy = totals['n'], totals['sum_x'], totals['sum_xx'], totals['sum_xy']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = n * sum_xy - sum_x * sum_x.T
+        variance_i = n * sum_xx - sum_x ** 2
+        correlation = covariance / np.sqrt(variance_i * variance_i.T)
+    correlation[(n < MIN_CORRELATION_PAIRS) | ~np.isfinite(correlation)] = np.nan
+    return pd.DataFrame(np.clip(correlation, -1, 1), index=columns, columns=columns)
+
+
+def driver_ranking(totals, columns):
+    """
+    Ranking de factores clave: para cada pregunta, regresión simple del promedio general
+    (GENERAL_CATEGORY) sobre la pregunta, con observaciones completas del par.
+    Devuelve n, promedio de la pregunta, correlación, pendiente y R², ordenado por correlación.
+    """
+    general = columns.index(GENERAL_CATEGORY)
+    questions = [i for i in range(len(columns)) if i != general]
+    n = totals['n'][questions, general]
+    sum_q = totals['sum_x'][questions, general]
+    sum_qq = totals['sum_xx'][questions, general]
+    sum_g = totals['sum_x'][general, questions]
+    sum_gg = totals['sum_xx'][general, questions]
+    sum_qg = totals['sum_xy'][questions, general]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = n * sum_qg - sum_q * sum_g
+        variance_q = n * sum_qq - sum_q ** 2
+        variance_g = n * sum_gg - sum_g ** 2
+        slope = covariance / variance_q
+        correlation = covariance / np.sqrt(variance_q * variance_g)
+        mean_q = sum_q / n
+    invalid = (n < MIN_CORRELATION_PAIRS) | ~np.isfinite(correlation)
+    ranking = pd.DataFrame({
+        'pregunta': [columns[i] for i in questions],
+        'n': n.astype(int),
+        'promedio': np.where(n > 0, mean_q, np.nan),
+        'correlacion': np.where(invalid, np.nan, correlation),
+        'pendiente': np.where(invalid, np.nan, slope),
+        'r2': np.where(invalid, np.nan, correlation ** 2),
+    })
+    return ranking.sort_values('correlacion', ascending=False, na_position='last', kind='stable').reset_index(drop=True)
+
+
+def geographic_cell_mask(statistics, selections):
+    """
+    Máscara de celdas que cumplen los filtros {nivel: [valores]} (listas vacías = sin filtro).
+    """
+    cells = statistics['cells']
+    mask = np.ones(len(cells), dtype=bool)
+    for level, values in selections.items():
+        if values and level in cells.columns:
+            mask &= cells[level].isin([str(value) for value in values]).to_numpy()
+    return mask
+
+
+def welch_test_from_sums(n_a, sum_a, sumsq_a, n_b, sum_b, sumsq_b):
+    """
+    Prueba t de Welch (dos colas) a partir de estadísticos suficientes (n, suma, suma de cuadrados)
+    de dos muestras, vectorizada por columna. Devuelve (media_a, media_b, t, p-valor);
+    NaN donde alguna muestra tiene menos de 2 observaciones.
+    """
+    from scipy import stats
+    n_a, n_b = np.asarray(n_a, dtype=float), np.asarray(n_b, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_a, mean_b = sum_a / n_a, sum_b / n_b
+        var_a = (sumsq_a - n_a * mean_a ** 2) / (n_a - 1)
+        var_b = (sumsq_b - n_b * mean_b ** 2) / (n_b - 1)
+        se_a, se_b = np.maximum(var_a, 0) / n_a, np.maximum(var_b, 0) / n_b
+        t_stat = (mean_b - mean_a) / np.sqrt(se_a + se_b)
+        dof = (se_a + se_b) ** 2 / (se_a ** 2 / (n_a - 1) + se_b ** 2 / (n_b - 1))
+    invalid = (n_a < 2) | (n_b < 2) | ~np.isfinite(t_stat) | ~np.isfinite(dof)
+    p_values = np.where(invalid, np.nan, 2 * stats.t.sf(np.abs(np.where(invalid, 0, t_stat)), np.where(invalid, 1, dof)))
+    return mean_a, mean_b, np.where(invalid, np.nan, t_stat), p_values
+
+
+def attach_confidence_intervals(table, geo_statistics, geo_col, question):
+    """
+    Agrega a una tabla de ranking (una fila por ubicación) las columnas del intervalo de confianza
+    bootstrap de la pregunta/categoría indicada.
+    """
+    level_stats = geo_statistics.get(geo_col)
+    if level_stats is None or table is None or table.empty:
+        return table
+
+    confidence_pct = int(CONFIDENCE_LEVEL * 100)
+    groups = level_stats['groups']
+    intervals = groups.loc[groups['pregunta'] == question, [geo_col, 'ic_inferior', 'ic_superior']]
+    intervals = intervals.rename(columns={
+        'ic_inferior': f'IC {confidence_pct}% Inferior',
+        'ic_superior': f'IC {confidence_pct}% Superior'
+    })
+    return table.merge(intervals, on=geo_col, how='left')
+
+
+def describe_kruskal_result(geo_statistics, geo_col, question):
+    """
+    Devuelve un texto con el resultado de la prueba de Kruskal-Wallis para la pregunta y nivel indicados.
+    """
+    level_stats = geo_statistics.get(geo_col)
+    if level_stats is None:
+        return None
+    kruskal = level_stats['kruskal']
+    row = kruskal[kruskal['pregunta'] == question]
+    if row.empty or pd.isna(row['p_valor'].iloc[0]):
+        return None
+
+    h_stat, dof, p_value = row['H'].iloc[0], int(row['gl'].iloc[0]), row['p_valor'].iloc[0]
+    if p_value < SIGNIFICANCE_ALPHA:
+        conclusion = "las diferencias entre ubicaciones **son estadísticamente significativas**"
+    else:
+        conclusion = "las diferencias entre ubicaciones **no son estadísticamente significativas**"
+    return f"Prueba de Kruskal-Wallis: H = {h_stat:.2f}, gl = {dof}, p = {p_value:.4f} → {conclusion} (α = {SIGNIFICANCE_ALPHA})."
+
+# --- FIN FUNCIONES ---
@@ -0,0 +1,545 @@
+import io
+import re
+import zlib
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.data_loader import get_dataset_version
+from utils.data_processing import (
+    normalize_text,
+    get_comedor_column,
+    get_satisfaction_columns,
+    page_spinner,
+    COMMENT_COLS,
+    DISSATISFACTION_THRESHOLD
+)
+
+# Tokens de los comentarios: palabras en minúsculas (se conservan las tildes para mostrarlas)
+TOKEN_PATTERN = re.compile(r'\b\w+\b')
+MIN_TOKEN_LENGTH = 3
+
+# Palabras vacías en español y términos del contexto que no aportan (conjunto: búsqueda O(1))
+STOPWORDS_ES = frozenset([
+    'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'y', 'o', 'u', 'de', 'del', 'a', 'al', 'en',
+    'con', 'por', 'para', 'se', 'su', 'sus', 'lo', 'que', 'como', 'pero', 'mas', 'más', 'mi', 'si', 'sin',
+    'sobre', 'este', 'esta', 'esto', 'estos', 'estas', 'es', 'son', 'fue', 'fueron', 'ser', 'soy', 'eres',
+    'somos', 'sois', 'sido', 'sea', 'sean', 'siendo', 'no', 'ni', 'muy', 'mucho', 'poco', 'todo', 'nada',
+    'algo', 'alguien', 'nadie', 'donde', 'quien', 'cual', 'cuyo', 'cuya', 'cuyos', 'cuyas', 'le', 'les',
+    'me', 'te', 'nos', 'os', 'ya', 'ha', 'han', 'he', 'has', 'hemos', 'habeis', 'haya', 'hayan', 'hay',
+    'sino', 'tambien', 'también', 'porque', 'pues', 'cuando', 'mientras', 'aunque', 'siempre',
+    'nunca', 'tal', 'vez', 'asi', 'así', 'bien', 'mal', 'desde', 'hasta', 'entre', 'contra', 'hacia',
+    'ante', 'bajo', 'cabe', 'segun', 'so', 'tras', 'durante', 'mediante',
+    'versus', 'vía', 'yo', 'tu', 'ella', 'ello', 'nosotros', 'nosotras', 'vosotros', 'vosotras',
+    'ellos', 'ellas', 'usted', 'ustedes', 'bueno', 'buena', 'productos', 'mercado', 'gracias', 'calidad',
+    'entrega', 'recibido', 'atencion', 'servicio', 'grano', 'frijol', 'lenteja', 'arroz'  # Palabras comunes específicas del contexto
+])
+
+# Parámetros de la imagen de la nube de palabras
+WORDCLOUD_OPTIONS = {
+    'width': 800,
+    'height': 400,
+    'background_color': 'white',
+    'colormap': 'viridis',
+    'max_words': 100,
+}
+
+# Frases entre comillas en una consulta de búsqueda ("llegar a tiempo")
+PHRASE_PATTERN = re.compile(r'"([^"]+)"')
+
+# Agrupación de sugerencias casi duplicadas (MinHash/LSH)
+SHINGLE_SIZE = 4            # Shingles de 4 caracteres sobre el texto sin palabras vacías
+MINHASH_PERMUTATIONS = 64   # Largo de la firma MinHash
+LSH_BANDS = 16              # 16 bandas de 4 filas: candidatos desde ~50% de similitud
+CLUSTER_SIMILARITY = 0.5    # Similitud de Jaccard estimada mínima para unir dos sugerencias
+MINHASH_PRIME = (1 << 31) - 1
+MINHASH_CHUNK_SIZE = 2000   # Textos por bloque al calcular las firmas (acota la memoria)
+MEDOID_SAMPLE_SIZE = 200    # Textos comparados al elegir la sugerencia representativa de un grupo
+
+# Número de bigramas y pares de términos que se muestran
+TOP_TERM_PAIRS = 20
+
+# --- INICIO FUNCIONES ---
+
+def tokenize_comment(text):
+    """
+    Divide un comentario en términos: minúsculas, al menos MIN_TOKEN_LENGTH letras y sin palabras vacías.
+    """
+    return [word for word in TOKEN_PATTERN.findall(str(text).lower())
+            if len(word) >= MIN_TOKEN_LENGTH and word not in STOPWORDS_ES]
+
+
+def build_term_index(df, comment_col):
+    """
+    Tokeniza cada comentario de la columna una sola vez (los textos repetidos se tokenizan una vez)
+    y arma un índice de términos en forma de pares (fila, término):
+    - 'terms': vocabulario (lista de términos, el id es la posición)
+    - 'row_ids' / 'term_ids': arreglos paralelos, una entrada por aparición de un término
+    - 'n_rows': filas del DataFrame; 'n_comments': filas con comentario
+    """
+    index = {'terms': [], 'row_ids': np.array([], dtype=np.int64), 'term_ids': np.array([], dtype=np.int64),
+             'n_rows': len(df), 'n_comments': 0}
+    if comment_col not in df.columns:
+        return index
+
+    comments = df[comment_col]
+    comment_text = comments.astype(str).str.strip()
+    valid = (comments.notna() & (comment_text != '')).to_numpy()
+    index['n_comments'] = int(valid.sum())
+
+    vocabulary = {}
+    token_ids_by_text = {}
+    row_ids = []
+    term_ids = []
+    for position, text in zip(np.flatnonzero(valid), comment_text[valid]):
+        token_ids = token_ids_by_text.get(text)
+        if token_ids is None:
+            token_ids = [vocabulary.setdefault(token, len(vocabulary)) for token in tokenize_comment(text)]
+            token_ids_by_text[text] = token_ids
+        term_ids.extend(token_ids)
+        row_ids.extend([position] * len(token_ids))
+
+    index['terms'] = list(vocabulary)
+    index['row_ids'] = np.array(row_ids, dtype=np.int64)
+    index['term_ids'] = np.array(term_ids, dtype=np.int64)
+    return index
+
+
+@st.cache_data(show_spinner=False)
+def _cached_term_index(_df, dataset_version, comment_col):
+    print(f"INFO: Construyendo índice de términos de '{comment_col}' (versión {dataset_version})")
+    return build_term_index(_df, comment_col)
+
+
+def get_term_index(df, comment_col):
+    """
+    Índice de términos de una columna de comentarios, calculado una vez por versión de datos.
+    """
+    if df is None or df.empty:
+        return build_term_index(pd.DataFrame(), comment_col)
+    return _cached_term_index(df, get_dataset_version(df), comment_col)
+
+
+def _filter_row_mask(df, filter_col, filter_value):
+    """Máscara de filas para el filtro (columna, valor); None si no hay filtro."""
+    if filter_col is None or filter_value is None or filter_col not in df.columns:
+        return None
+    return (df[filter_col].astype(str).str.strip() == str(filter_value).strip()).to_numpy()
+
+
+def term_frequencies(term_index, row_mask=None):
+    """
+    Frecuencia de cada término (Serie ordenada de mayor a menor), opcionalmente solo en las filas de row_mask.
+    """
+    term_ids = term_index['term_ids']
+    if row_mask is not None:
+        term_ids = term_ids[row_mask[term_index['row_ids']]]
+    counts = np.bincount(term_ids, minlength=len(term_index['terms']))
+    frequencies = pd.Series(counts, index=pd.Index(term_index['terms'], dtype=object), name='frecuencia')
+    return frequencies[frequencies > 0].sort_values(ascending=False, kind='stable')
+
+
+def get_term_frequencies(df, comment_col, filter_col=None, filter_value=None):
+    """
+    Frecuencias de términos de una columna de comentarios, opcionalmente filtradas por (columna, valor),
+    p. ej. ('comuna', '5'). Usa el índice de términos en caché: no se vuelve a tokenizar.
+    """
+    term_index = get_term_index(df, comment_col)
+    return term_frequencies(term_index, _filter_row_mask(df, filter_col, filter_value))
+
+
+def render_wordcloud_png(frequencies):
+    """
+    Dibuja la nube de palabras a partir de frecuencias ya calculadas y la devuelve como bytes PNG.
+    """
+    from wordcloud import WordCloud
+
+    if frequencies.empty:
+        return None
+    wordcloud = WordCloud(**WORDCLOUD_OPTIONS).generate_from_frequencies(frequencies.to_dict())
+    buffer = io.BytesIO()
+    wordcloud.to_image().save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@st.cache_data(show_spinner="Generando nube de palabras...")
+def _cached_wordcloud_png(_df, dataset_version, comment_col, filter_col, filter_value):
+    print(f"INFO: Generando nube de palabras de '{comment_col}' con filtro {filter_col}={filter_value} (versión {dataset_version})")
+    return render_wordcloud_png(get_term_frequencies(_df, comment_col, filter_col, filter_value))
+
+
+def get_wordcloud_png(df, comment_col, filter_col=None, filter_value=None):
+    """
+    Imagen PNG (bytes) de la nube de palabras de la columna, en caché por
+    (versión de datos, columna, filtro). Devuelve None si no hay términos.
+    """
+    if df is None or df.empty:
+        return None
+    return _cached_wordcloud_png(df, get_dataset_version(df), comment_col, filter_col, filter_value)
+
+
+def build_inverted_index(df, comment_cols=None):
+    """
+    Índice invertido sobre las columnas de comentarios y sugerencias (COMMENT_COLS).
+    Cada documento es un comentario no vacío (fila, columna); el texto se normaliza con
+    normalize_text (minúsculas, sin tildes) para que la búsqueda no dependa de los acentos.
+    Devuelve un dict con:
+    - 'postings': {término: arreglo ordenado de ids de documento}
+    - 'doc_rows', 'doc_cols': posición de fila y columna de cada documento
+    - 'doc_texts': secuencia de términos separados por un espacio (para verificar frases sin
+      depender de la puntuación); 'doc_originals': texto original
+    - 'doc_comunas', 'doc_comedores': valores de filtro de cada documento
+    """
+    comment_cols = [col for col in (comment_cols or COMMENT_COLS) if col in df.columns]
+    comedor_col = get_comedor_column(df)
+
+    doc_rows, doc_cols, doc_texts, doc_originals = [], [], [], []
+    postings = {}
+    normalized_by_text = {}  # Los textos repetidos se normalizan y tokenizan una sola vez
+    for col in comment_cols:
+        comments = df[col]
+        comment_text = comments.astype(str).str.strip()
+        valid = (comments.notna() & (comment_text != '')).to_numpy()
+        for position, text in zip(np.flatnonzero(valid), comment_text[valid]):
+            doc_id = len(doc_rows)
+            if text not in normalized_by_text:
+                tokens = TOKEN_PATTERN.findall(normalize_text(text))
+                normalized_by_text[text] = (' '.join(tokens), set(tokens))
+            normalized, terms = normalized_by_text[text]
+            doc_rows.append(position)
+            doc_cols.append(col)
+            doc_texts.append(normalized)
+            doc_originals.append(text)
+            for term in terms:
+                postings.setdefault(term, []).append(doc_id)
+
+    doc_rows = np.array(doc_rows, dtype=np.int64)
+
+    def doc_values(col):
+        if col is None or col not in df.columns:
+            return np.full(len(doc_rows), None, dtype=object)
+        return df[col].astype(str).str.strip().to_numpy()[doc_rows]
+
+    return {
+        'postings': {term: np.array(doc_ids, dtype=np.int64) for term, doc_ids in postings.items()},
+        'doc_rows': doc_rows,
+        'doc_cols': np.array(doc_cols, dtype=object),
+        'doc_texts': doc_texts,
+        'doc_originals': doc_originals,
+        'doc_comunas': doc_values('comuna'),
+        'doc_comedores': doc_values(comedor_col),
+    }
+
+
+@st.cache_data(show_spinner=False)
+def _cached_inverted_index(_df, dataset_version):
+    print(f"INFO: Construyendo índice invertido de comentarios (versión {dataset_version})")
+    return build_inverted_index(_df)
+
+
+def get_inverted_index(df):
+    """
+    Índice invertido de comentarios y sugerencias, calculado una vez por versión de datos.
+    """
+    if df is None or df.empty:
+        return build_inverted_index(pd.DataFrame())
+    return _cached_inverted_index(df, get_dataset_version(df))
+
+
+def parse_search_query(query):
+    """
+    Separa una consulta en frases (entre comillas) y términos sueltos, ya normalizados.
+    Devuelve (frases, términos); los términos incluyen también las palabras de cada frase.
+    """
+    phrases = [' '.join(TOKEN_PATTERN.findall(normalize_text(phrase)))
+               for phrase in PHRASE_PATTERN.findall(query or '')]
+    phrases = [phrase for phrase in phrases if phrase]
+    terms = TOKEN_PATTERN.findall(normalize_text(query or ''))
+    return phrases, list(dict.fromkeys(terms))
+
+
+def search_comments(index, query, comuna=None, comedor=None, comment_cols=None):
+    """
+    Busca comentarios que contengan todos los términos de la consulta (y las frases entre comillas,
+    en ese orden), opcionalmente solo de una comuna o un comedor y de ciertas columnas.
+    Devuelve el arreglo de ids de documento encontrados, en orden de aparición.
+    """
+    phrases, terms = parse_search_query(query)
+    if not terms:
+        return np.array([], dtype=np.int64)
+
+    # Intersección de las listas de documentos, empezando por la más corta
+    postings = [index['postings'].get(term) for term in terms]
+    if any(doc_ids is None for doc_ids in postings):
+        return np.array([], dtype=np.int64)
+    postings.sort(key=len)
+    doc_ids = postings[0]
+    for other_doc_ids in postings[1:]:
+        doc_ids = np.intersect1d(doc_ids, other_doc_ids, assume_unique=True)
+        if len(doc_ids) == 0:
+            return doc_ids
+
+    if comuna is not None:
+        doc_ids = doc_ids[index['doc_comunas'][doc_ids] == str(comuna).strip()]
+    if comedor is not None:
+        doc_ids = doc_ids[index['doc_comedores'][doc_ids] == str(comedor).strip()]
+    if comment_cols is not None:
+        doc_ids = doc_ids[np.isin(index['doc_cols'][doc_ids], list(comment_cols))]
+
+    # Las frases se verifican sobre la secuencia de términos solo de los candidatos
+    if phrases:
+        doc_texts = index['doc_texts']
+        doc_ids = np.array([doc_id for doc_id in doc_ids
+                            if all(f' {phrase} ' in f' {doc_texts[doc_id]} ' for phrase in phrases)],
+                           dtype=np.int64)
+    return doc_ids
+
+
+def search_results_table(df, index, doc_ids, limit=None):
+    """
+    Arma la tabla de resultados de search_comments: comedor, comuna, fecha, campo y comentario.
+    """
+    doc_ids = doc_ids[:limit] if limit else doc_ids
+    rows = index['doc_rows'][doc_ids]
+    results = pd.DataFrame({
+        'Comedor': index['doc_comedores'][doc_ids],
+        'Comuna': index['doc_comunas'][doc_ids],
+        'Campo': [COMMENT_COLS.get(col, col) for col in index['doc_cols'][doc_ids]],
+        'Comentario': [index['doc_originals'][doc_id] for doc_id in doc_ids],
+    })
+    if 'fecha' in df.columns:
+        results.insert(2, 'Fecha', df['fecha'].to_numpy()[rows])
+    return results
+
+
+def _shingle_text(text):
+    """Shingles de SHINGLE_SIZE caracteres del texto normalizado, sin palabras vacías."""
+    words = [word for word in TOKEN_PATTERN.findall(text) if word not in STOPWORDS_ES]
+    joined = ' '.join(words) if words else text
+    if len(joined) <= SHINGLE_SIZE:
+        return {joined}
+    return {joined[i:i + SHINGLE_SIZE] for i in range(len(joined) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signatures(shingle_sets):
+    """
+    Firmas MinHash (matriz textos x MINHASH_PERMUTATIONS) de una lista de conjuntos de shingles.
+    Cada shingle distinto se convierte en entero (crc32) y se permuta una sola vez con
+    (a * x + b) mod p; la firma de cada texto es el mínimo por permutación (np.minimum.reduceat).
+    """
+    rng = np.random.default_rng(0)
+    coef_a = rng.integers(1, MINHASH_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+    coef_b = rng.integers(0, MINHASH_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+    vocabulary = {}
+    shingle_ids = [[vocabulary.setdefault(shingle, len(vocabulary)) for shingle in shingles]
+                   for shingles in shingle_sets]
+    shingle_values = np.array([zlib.crc32(shingle.encode('utf-8')) for shingle in vocabulary], dtype=np.uint64)
+    # Valores permutados de cada shingle distinto: (a * x + b) mod p cabe en uint64 (a, x < 2^32)
+    permuted = ((shingle_values[:, None] % MINHASH_PRIME) * coef_a + coef_b) % MINHASH_PRIME
+    permuted = permuted.astype(np.uint32)
+
+    signatures = np.empty((len(shingle_sets), MINHASH_PERMUTATIONS), dtype=np.uint32)
+    for start in range(0, len(shingle_sets), MINHASH_CHUNK_SIZE):
+        chunk = shingle_ids[start:start + MINHASH_CHUNK_SIZE]
+        lengths = np.array([len(ids) for ids in chunk])
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        flat_ids = np.fromiter((shingle_id for ids in chunk for shingle_id in ids), dtype=np.int64, count=lengths.sum())
+        signatures[start:start + len(chunk)] = np.minimum.reduceat(permuted[flat_ids], offsets, axis=0)
+    return signatures
+
+
+def lsh_clusters(signatures, threshold=CLUSTER_SIMILARITY):
+    """
+    Agrupa las firmas con LSH: en cada banda, los textos con las mismas filas de firma caen en el
+    mismo cubo y se unen (union-find) si su similitud estimada es >= threshold.
+    Devuelve el id de grupo de cada texto (la raíz de su conjunto).
+    """
+    n_texts = len(signatures)
+    parent = np.arange(n_texts)
+
+    def find(item):
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    rows_per_band = MINHASH_PERMUTATIONS // LSH_BANDS
+    for band in range(LSH_BANDS):
+        band_rows = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        _, bucket_ids = np.unique(band_rows, axis=0, return_inverse=True)
+        # Cada texto se compara con el primero de su cubo (solo cubos con más de un texto)
+        order = np.argsort(bucket_ids.ravel(), kind='stable')
+        sorted_buckets = bucket_ids.ravel()[order]
+        bucket_starts = np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]]
+        heads = order[np.maximum.accumulate(np.where(bucket_starts, np.arange(n_texts), 0))]
+        for head, member in zip(heads[~bucket_starts], order[~bucket_starts]):
+            root_head, root_member = find(head), find(member)
+            if root_head != root_member and (signatures[head] == signatures[member]).mean() >= threshold:
+                parent[root_member] = root_head
+    return np.array([find(item) for item in range(n_texts)])
+
+
+def build_suggestion_clusters(df, comment_col='32aspectos_de_mejora'):
+    """
+    Agrupa las sugerencias casi duplicadas (shingles + MinHash/LSH, tiempo aproximadamente lineal).
+    Los textos idénticos (tras normalize_text) se procesan una sola vez. Devuelve un DataFrame
+    ordenado por número de sugerencias con: sugerencia representativa (el texto más repetido del
+    grupo; a igualdad, el más parecido al resto), número de sugerencias y de variantes distintas.
+    """
+    columns = ['Sugerencia representativa', 'Sugerencias', 'Variantes']
+    if comment_col not in df.columns:
+        return pd.DataFrame(columns=columns)
+
+    comments = df[comment_col]
+    comment_text = comments.astype(str).str.strip()
+    comment_text = comment_text[(comments.notna() & (comment_text != '')).to_numpy()]
+    if comment_text.empty:
+        return pd.DataFrame(columns=columns)
+
+    # Un documento por texto normalizado distinto; se conserva el original más frecuente para mostrar
+    normalized = comment_text.map(normalize_text)
+    pair_counts = pd.DataFrame({'normalizado': normalized, 'original': comment_text}).value_counts().reset_index()
+    text_counts = pair_counts.drop_duplicates('normalizado').set_index('normalizado')[['original']]
+    text_counts['n'] = pair_counts.groupby('normalizado', sort=False)['count'].sum()
+
+    signatures = minhash_signatures([_shingle_text(text) for text in text_counts.index])
+    text_counts['grupo'] = lsh_clusters(signatures)
+
+    clusters = []
+    for _, members in text_counts.groupby('grupo', sort=False):
+        member_counts = members['n'].to_numpy()
+        candidates = np.flatnonzero(member_counts == member_counts.max())[:MEDOID_SAMPLE_SIZE]
+        if len(candidates) > 1:
+            # Medoide entre los textos más repetidos: mayor similitud estimada (ponderada) con el resto
+            positions = text_counts.index.get_indexer(members.index)
+            reference = np.argsort(-member_counts, kind='stable')[:MEDOID_SAMPLE_SIZE]
+            similarity = (signatures[positions[candidates]][:, None, :]
+                          == signatures[positions[reference]][None, :, :]).mean(axis=2)
+            representative = candidates[np.argmax(similarity @ member_counts[reference])]
+        else:
+            representative = candidates[0]
+        clusters.append((members['original'].iat[representative], int(member_counts.sum()), len(members)))
+
+    result = pd.DataFrame(clusters, columns=columns)
+    return result.sort_values(['Sugerencias', 'Variantes'], ascending=False, kind='stable').reset_index(drop=True)
+
+
+@st.cache_data(show_spinner=False)
+def _cached_suggestion_clusters(_df, dataset_version, comment_col):
+    print(f"INFO: Agrupando sugerencias de '{comment_col}' (versión {dataset_version})")
+    return build_suggestion_clusters(_df, comment_col)
+
+
+def get_suggestion_clusters(df, comment_col='32aspectos_de_mejora'):
+    """
+    Grupos de sugerencias casi duplicadas, calculados una vez por versión de datos.
+    """
+    if df is None or df.empty:
+        return build_suggestion_clusters(pd.DataFrame(), comment_col)
+    with page_spinner("Agrupando sugerencias similares..."):
+        return _cached_suggestion_clusters(df, get_dataset_version(df), comment_col)
+
+
+def build_document_term_matrix(df, comment_col):
+    """
+    Matrices dispersas (scipy.sparse CSR) a partir del índice de términos, sin volver a tokenizar:
+    - 'matrix': filas x términos, 1 si el término aparece en el comentario de la fila
+    - 'bigram_matrix': filas x bigramas, conteo de cada par de términos consecutivos
+      (consecutivos después de quitar las palabras vacías: "huevos llegan rotos" -> "huevos llegan", "llegan rotos")
+    - 'terms', 'bigrams': etiquetas de las columnas
+    """
+    from scipy import sparse
+
+    term_index = get_term_index(df, comment_col)
+    terms = term_index['terms']
+    row_ids, term_ids = term_index['row_ids'], term_index['term_ids']
+    n_rows = term_index['n_rows']
+
+    matrix = sparse.csr_matrix((np.ones(len(row_ids), dtype=np.int32), (row_ids, term_ids)),
+                               shape=(n_rows, len(terms)))
+    matrix.data[:] = 1  # Presencia: los términos repetidos en un comentario cuentan una vez
+
+    # Bigramas: términos consecutivos de la misma fila (term_ids está en orden de aparición)
+    same_row = row_ids[1:] == row_ids[:-1]
+    pair_codes = term_ids[:-1][same_row] * max(len(terms), 1) + term_ids[1:][same_row]
+    bigram_codes, bigram_ids = np.unique(pair_codes, return_inverse=True)
+    bigram_matrix = sparse.csr_matrix((np.ones(len(bigram_ids), dtype=np.int32), (row_ids[1:][same_row], bigram_ids)),
+                                      shape=(n_rows, len(bigram_codes)))
+    bigrams = [f"{terms[code // len(terms)]} {terms[code % len(terms)]}" for code in bigram_codes]
+    return {'terms': terms, 'matrix': matrix, 'bigrams': bigrams, 'bigram_matrix': bigram_matrix}
+
+
+@st.cache_data(show_spinner=False)
+def _cached_document_term_matrix(_df, dataset_version, comment_col):
+    print(f"INFO: Construyendo matriz documento-término de '{comment_col}' (versión {dataset_version})")
+    return build_document_term_matrix(_df, comment_col)
+
+
+def get_document_term_matrix(df, comment_col):
+    """
+    Matriz documento-término dispersa de una columna de comentarios, calculada una vez por versión de datos.
+    """
+    return _cached_document_term_matrix(df, get_dataset_version(df), comment_col)
+
+
+def low_score_row_mask(df):
+    """Filas con al menos un puntaje de satisfacción <= DISSATISFACTION_THRESHOLD."""
+    satisfaction_cols = get_satisfaction_columns(df)
+    if not satisfaction_cols:
+        return np.zeros(len(df), dtype=bool)
+    scores = df[satisfaction_cols].apply(pd.to_numeric, errors='coerce')
+    return (scores <= DISSATISFACTION_THRESHOLD).any(axis=1).to_numpy()
+
+
+def top_bigrams(dtm, row_mask=None, top_n=TOP_TERM_PAIRS):
+    """Bigramas más frecuentes (DataFrame Bigrama, Frecuencia) en las filas de row_mask."""
+    bigram_matrix = dtm['bigram_matrix'] if row_mask is None else dtm['bigram_matrix'][row_mask]
+    counts = np.asarray(bigram_matrix.sum(axis=0)).ravel()
+    top = np.argsort(-counts, kind='stable')[:top_n]
+    top = top[counts[top] > 0]
+    return pd.DataFrame({'Bigrama': [dtm['bigrams'][i] for i in top], 'Frecuencia': counts[top]})
+
+
+def top_cooccurrences(dtm, row_mask=None, top_n=TOP_TERM_PAIRS):
+    """
+    Pares de términos que más aparecen en el mismo comentario, con el producto disperso X^T X
+    (matriz de co-ocurrencia término x término) restringido a las filas de row_mask.
+    """
+    from scipy import sparse
+
+    matrix = dtm['matrix'] if row_mask is None else dtm['matrix'][row_mask]
+    cooccurrence = sparse.triu(matrix.T @ matrix, k=1).tocoo()
+    top = np.argsort(-cooccurrence.data, kind='stable')[:top_n]
+    terms = dtm['terms']
+    return pd.DataFrame({
+        'Término 1': [terms[i] for i in cooccurrence.row[top]],
+        'Término 2': [terms[i] for i in cooccurrence.col[top]],
+        'Comentarios': cooccurrence.data[top],
+    })
+
+
+@st.cache_data(show_spinner=False)
+def _cached_term_pairs(_df, dataset_version, comment_col, filter_col, filter_value, low_scores_only, top_n):
+    print(f"INFO: Calculando bigramas y co-ocurrencias de '{comment_col}' con filtro {filter_col}={filter_value}, "
+          f"solo insatisfacción={low_scores_only} (versión {dataset_version})")
+    dtm = get_document_term_matrix(_df, comment_col)
+    row_mask = _filter_row_mask(_df, filter_col, filter_value)
+    if low_scores_only:
+        low_mask = low_score_row_mask(_df)
+        row_mask = low_mask if row_mask is None else row_mask & low_mask
+    return top_bigrams(dtm, row_mask, top_n), top_cooccurrences(dtm, row_mask, top_n)
+
+
+def get_term_pairs(df, comment_col, filter_col=None, filter_value=None, low_scores_only=False, top_n=TOP_TERM_PAIRS):
+    """
+    (bigramas, co-ocurrencias) más frecuentes de una columna de comentarios, opcionalmente
+    filtrados por (columna, valor) y/o solo en respuestas con insatisfacción. Usa la matriz
+    documento-término en caché: los filtros solo seleccionan filas, no se vuelve a tokenizar.
+    """
+    if df is None or df.empty or comment_col not in df.columns:
+        empty = pd.DataFrame()
+        return empty, empty
+    return _cached_term_pairs(df, get_dataset_version(df), comment_col, filter_col, filter_value,
+                              low_scores_only, top_n)
+
+# --- FIN FUNCIONES ---
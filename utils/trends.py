@@ -0,0 +1,205 @@
+import threading
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.data_loader import get_dataset_version
+from utils.significance import build_score_matrix, welch_test_from_sums, SIGNIFICANCE_ALPHA
+
+# Granularidades de las tendencias: etiqueta -> frecuencia de pandas (periodos)
+TREND_FREQUENCIES = {
+    'Semana': 'W',
+    'Mes': 'M',
+    'Trimestre': 'Q',
+}
+DEFAULT_TREND_FREQUENCY = 'Mes'
+
+# Estadísticos que se acumulan por (día, pregunta)
+ROLLUP_STATISTICS = ('sum', 'sumsq', 'count')
+
+# Constante para distinguir filas idénticas repetidas en la huella de cada fila
+DUPLICATE_ROW_SALT = np.uint64(0x9E3779B97F4A7C15)
+
+# --- INICIO FUNCIONES ---
+
+def row_fingerprints(df):
+    """
+    Huella (uint64) de cada fila por su contenido; las filas idénticas repetidas reciben huellas
+    distintas (se combina con el número de aparición), de modo que sirven para detectar filas nuevas.
+    """
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    occurrence = pd.Series(hashes).groupby(hashes).cumcount().to_numpy().astype(np.uint64)
+    return pd.Index(hashes + occurrence * DUPLICATE_ROW_SALT)
+
+
+def build_daily_rollup(df):
+    """
+    Suma, suma de cuadrados y conteo por (día, pregunta) de la matriz de puntajes
+    (preguntas, promedios por categoría y general por encuesta, ver build_score_matrix).
+    Devuelve un dict {'sum', 'sumsq', 'count'} de DataFrames indexados por día.
+    """
+    matrix, _ = build_score_matrix(df)
+    days = pd.to_datetime(df['fecha'], errors='coerce').dt.normalize() if 'fecha' in df.columns else None
+    if days is None or matrix.empty or days.isna().all():
+        # Sin días válidos: mismo índice (DatetimeIndex 'dia') que un rollup con datos, para poder agregarlo por periodo
+        empty_days = pd.DatetimeIndex([], name='dia')
+        return {statistic: pd.DataFrame(index=empty_days, columns=matrix.columns, dtype=float)
+                for statistic in ROLLUP_STATISTICS}
+
+    valid = days.notna().to_numpy()
+    matrix, days = matrix[valid], days[valid].rename('dia')
+    grouped_values = matrix.groupby(days, sort=True)
+    return {
+        'sum': grouped_values.sum(),
+        'sumsq': (matrix ** 2).groupby(days, sort=True).sum(),
+        'count': matrix.notna().groupby(days, sort=True).sum().astype(float),
+    }
+
+
+def _add_rollups(rollup, new_rollup):
+    """Suma dos rollups diarios (días y columnas que falten en uno se toman como 0)."""
+    return {statistic: rollup[statistic].add(new_rollup[statistic], fill_value=0).sort_index()
+            for statistic in ROLLUP_STATISTICS}
+
+
+@st.cache_resource(show_spinner=False)
+def _rollup_store():
+    """
+    Estado compartido del ingreso incremental de la copia vigente de los datos (la única que se ingresa,
+    desde utils.data_loader): huellas de las filas ya procesadas, versión, DataFrame y rollup diario
+    acumulado. Las demás etapas incrementales (p. ej. alertas) se registran aquí.
+    """
+    return {'lock': threading.Lock(), 'fingerprints': pd.Index([], dtype='uint64'), 'version': None,
+            'df': None, 'rollup': None, 'listeners': {}}
+
+
+def register_ingestion_listener(name, on_new_rows, on_reset):
+    """
+    Registra una etapa incremental adicional: on_new_rows(df_nuevas) recibe solo las filas nuevas;
+    on_reset() se llama cuando hay que reconstruir desde cero (filas editadas o borradas).
+    Si ya se ingresaron datos, la etapa nueva los recibe completos al registrarse.
+    """
+    store = _rollup_store()
+    with store['lock']:
+        if name in store['listeners']:
+            return
+        store['listeners'][name] = (on_new_rows, on_reset)
+        if store['df'] is not None:
+            on_reset()
+            on_new_rows(store['df'])
+
+
+def ingest_rows(df):
+    """
+    Actualiza el rollup diario con las filas de df que no se habían procesado (comparando huellas).
+    Solo se llama con la copia vigente de los datos (save_data_snapshot y la lectura de la copia en disco),
+    de modo que cada versión sucede a la anterior. Si df es la misma versión ya procesada no hace nada;
+    si desaparecieron filas (edición o borrado en la hoja) reconstruye desde cero.
+    Devuelve el número de filas nuevas procesadas.
+    """
+    if df is None or df.empty:
+        return 0
+    store = _rollup_store()
+    dataset_version = get_dataset_version(df)
+    with store['lock']:
+        if store['version'] == dataset_version:
+            return 0
+
+        fingerprints = row_fingerprints(df)
+        rebuild = store['rollup'] is None or not store['fingerprints'].isin(fingerprints).all()
+        if rebuild:
+            for _, on_reset in store['listeners'].values():
+                on_reset()
+            new_rows = np.ones(len(df), dtype=bool)
+        else:
+            new_rows = ~fingerprints.isin(store['fingerprints'])
+
+        if new_rows.any():
+            new_df = df[new_rows]
+            new_rollup = build_daily_rollup(new_df)
+            store['rollup'] = new_rollup if rebuild else _add_rollups(store['rollup'], new_rollup)
+            for on_new_rows, _ in store['listeners'].values():
+                on_new_rows(new_df)
+
+        store['fingerprints'] = fingerprints
+        store['version'] = dataset_version
+        store['df'] = df
+        print(f"INFO ingest_rows: {int(new_rows.sum())} filas nuevas de {len(df)}"
+              f"{' (reconstrucción completa)' if rebuild else ''}.")
+        return int(new_rows.sum())
+
+
+@st.cache_data(show_spinner=False)
+def _cached_daily_rollup(_df, dataset_version):
+    print(f"INFO: Calculando rollup diario completo (versión {dataset_version})")
+    return build_daily_rollup(_df)
+
+
+def get_daily_rollup(df):
+    """
+    Rollup diario (sum, sumsq, count por día y pregunta) de df. Si df es la copia vigente se usa el rollup
+    incremental; cualquier otra versión (p. ej. un subconjunto) se calcula completa y en caché por versión,
+    sin tocar el estado incremental.
+    """
+    if df is None or df.empty:
+        return build_daily_rollup(pd.DataFrame())
+    store = _rollup_store()
+    dataset_version = get_dataset_version(df)
+    with store['lock']:
+        if store['version'] == dataset_version and store['rollup'] is not None:
+            return store['rollup']
+    return _cached_daily_rollup(df, dataset_version)
+
+
+def rollup_by_period(rollup, frequency):
+    """
+    Agrega el rollup diario a periodos (frecuencia de pandas: 'W', 'M', 'Q'), sin tocar las filas originales.
+    """
+    periods = rollup['count'].index.to_period(frequency)
+    return {statistic: rollup[statistic].groupby(periods, sort=True).sum() for statistic in ROLLUP_STATISTICS}
+
+
+def period_means(period_rollup):
+    """Promedio por periodo y pregunta (NaN donde no hay respuestas)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return period_rollup['sum'] / period_rollup['count'].where(period_rollup['count'] > 0)
+
+
+def get_trend(df, frequency_label=DEFAULT_TREND_FREQUENCY):
+    """
+    Tendencia por periodo ('Semana', 'Mes' o 'Trimestre'): devuelve (promedios, conteos), DataFrames
+    con un periodo por fila y una columna por pregunta, categoría y promedio general.
+    """
+    period_rollup = rollup_by_period(get_daily_rollup(df), TREND_FREQUENCIES[frequency_label])
+    return period_means(period_rollup), period_rollup['count']
+
+
+def window_totals(rollup, start, end):
+    """Sumas de cada estadístico del rollup diario entre dos fechas (incluidas)."""
+    days = rollup['count'].index
+    in_window = (days >= pd.Timestamp(start)) & (days <= pd.Timestamp(end))
+    return {statistic: rollup[statistic][in_window].sum() for statistic in ROLLUP_STATISTICS}
+
+
+def compare_periods(df, period_a, period_b):
+    """
+    Compara dos ventanas de fechas ((inicio, fin) cada una) por pregunta, categoría y promedio general,
+    a partir del rollup diario: n y promedio de cada periodo, diferencia (B - A) y p-valor de Welch.
+    """
+    rollup = get_daily_rollup(df)
+    totals_a, totals_b = window_totals(rollup, *period_a), window_totals(rollup, *period_b)
+    mean_a, mean_b, _, p_values = welch_test_from_sums(
+        totals_a['count'], totals_a['sum'], totals_a['sumsq'],
+        totals_b['count'], totals_b['sum'], totals_b['sumsq']
+    )
+    comparison = pd.DataFrame({
+        'n_a': totals_a['count'].astype(int),
+        'promedio_a': mean_a,
+        'n_b': totals_b['count'].astype(int),
+        'promedio_b': mean_b,
+        'diferencia': mean_b - mean_a,
+        'p_valor': p_values,
+    }, index=rollup['count'].columns)
+    comparison['significativo'] = comparison['p_valor'] < SIGNIFICANCE_ALPHA
+    return comparison
+
+# --- FIN FUNCIONES ---
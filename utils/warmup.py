@@ -0,0 +1,108 @@
+import threading
+import time
+import streamlit as st
+from utils.data_loader import start_initial_load, wait_for_snapshot
+from utils.data_processing import (
+    plot_satisfaction_by_category,
+    plot_question_satisfaction,
+    plot_yes_no_questions,
+    get_cached_figure,
+    get_answer_distribution,
+    get_comedor_scorecard,
+    get_comedor_index,
+    get_geographic_aggregates,
+    get_hierarchy_rollup,
+    get_comedor_heatmap,
+    QUESTION_DETAILS
+)
+from utils.significance import get_geo_statistics, get_correlation_statistics
+from utils.text_analysis import get_suggestion_clusters
+
+# --- INICIO FUNCIONES ---
+
+def load_warmup_data():
+    """
+    Datos para precalentar: la copia compartida que leen las páginas, esperando la carga inicial lanzada
+    por start_warmup (sin elementos de Streamlit, el hilo no tiene contexto de página). Así el
+    precalentamiento y las páginas comparten una sola consulta a Google Sheets y las mismas claves de caché.
+    """
+    return wait_for_snapshot()
+
+
+def prerender_default_figures(df):
+    """
+    Construye en la caché de figuras los gráficos por defecto de las páginas, con los mismos
+    argumentos que usan las páginas (si cambian, la clave de caché deja de coincidir).
+    Devuelve el número de figuras construidas.
+    """
+    figures = [get_cached_figure(plot_satisfaction_by_category, df)]
+    for col, details in QUESTION_DETAILS.items():
+        if col in df.columns:
+            figures.append(get_cached_figure(plot_question_satisfaction, df, col, details['description'],
+                                             orientation='h', title=details['title_with_icon']))
+    figures.append(get_cached_figure(plot_yes_no_questions, df))
+    return sum(fig is not None for fig in figures)
+
+
+# Etapas del precalentamiento, en orden: (nombre, función que recibe el DataFrame)
+WARMUP_STAGES = [
+    ("distribucion_respuestas", get_answer_distribution),
+    ("scorecard_comedores", get_comedor_scorecard),
+    ("indice_comedores", get_comedor_index),
+    ("agregados_geograficos", get_geographic_aggregates),
+    ("jerarquia_geografica", get_hierarchy_rollup),
+    ("mapa_comedores", get_comedor_heatmap),
+    ("estadisticas_geograficas", get_geo_statistics),
+    ("estadisticas_correlacion", get_correlation_statistics),
+    ("grupos_sugerencias", get_suggestion_clusters),
+    ("figuras_por_defecto", prerender_default_figures),
+]
+
+
+def _run_stage(status, stage_name, stage_function):
+    """Ejecuta una etapa y registra su duración (segundos) en status['etapas']."""
+    start = time.perf_counter()
+    result = stage_function()
+    status['etapas'][stage_name] = time.perf_counter() - start
+    print(f"INFO warmup: Etapa '{stage_name}' completada en {status['etapas'][stage_name]:.2f}s.")
+    return result
+
+
+def run_warmup(status=None):
+    """
+    Carga los datos, construye los agregados en caché y pre-renderiza las figuras por defecto.
+    status: dict que se actualiza durante la ejecución ('estado', 'etapas', 'total').
+    """
+    status = status if status is not None else {'estado': 'en curso', 'etapas': {}, 'total': None}
+    start = time.perf_counter()
+    try:
+        df = _run_stage(status, "carga_datos", load_warmup_data)
+        if df is None or df.empty:
+            status['estado'] = 'sin datos'
+            print("WARN warmup: La carga inicial no devolvió datos; no se precalientan los agregados.")
+        else:
+            for stage_name, stage_function in WARMUP_STAGES:
+                _run_stage(status, stage_name, lambda: stage_function(df))
+            status['estado'] = 'completado'
+    except Exception as e_warmup:
+        status['estado'] = 'error'
+        print(f"ERROR warmup: {e_warmup} (Tipo: {type(e_warmup).__name__})")
+    status['total'] = time.perf_counter() - start
+    print(f"INFO warmup: Precalentamiento '{status['estado']}' en {status['total']:.2f}s.")
+    return status
+
+
+@st.cache_resource(show_spinner=False)
+def start_warmup():
+    """
+    Lanza run_warmup en un hilo de fondo una sola vez por proceso del servidor
+    (la primera ejecución de cualquier página) y devuelve su estado compartido.
+    Las sesiones que piden un valor en cálculo esperan al hilo en vez de repetir el trabajo.
+    """
+    status = {'estado': 'en curso', 'etapas': {}, 'total': None}
+    # La carga inicial se lanza antes del hilo: la página que llamó a start_warmup espera esa misma carga
+    start_initial_load()
+    threading.Thread(target=run_warmup, args=(status,), name="warmup", daemon=True).start()
+    return status
+
+# --- FIN FUNCIONES ---